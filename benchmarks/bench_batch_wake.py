@@ -0,0 +1,95 @@
+"""
+Compare waking N targets through POST /api/wake/batch against N POST /wake calls.
+
+Runs the app in-process (no network between client and server) and sends the
+magic packets to a local UDP sink, so nothing leaves the machine.
+
+    uv run python benchmarks/bench_batch_wake.py --count 1000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+_TMP = Path(tempfile.mkdtemp(prefix="wol-bench-"))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+USERNAME, PASSWORD = "bench", "bench-password"
+os.environ["ADMIN_USERNAME"] = USERNAME
+os.environ["ADMIN_PASSWORD"] = PASSWORD
+os.environ.setdefault("USERS_PATH", str(_TMP / "users.json"))
+os.environ.setdefault("WOL_HOSTS_PATH", str(_TMP / "hosts.json"))
+
+import httpx  # noqa: E402
+
+from wol_service.app import app  # noqa: E402
+
+
+class _Sink(asyncio.DatagramProtocol):
+    def datagram_received(self, data, addr):
+        pass
+
+
+async def main(count: int) -> None:
+    loop = asyncio.get_running_loop()
+    sink_transport, _ = await loop.create_datagram_endpoint(
+        _Sink, local_addr=("127.0.0.1", 0)
+    )
+    port = sink_transport.get_extra_info("sockname")[1]
+    macs = [
+        f"02:00:00:{i >> 16 & 0xFF:02x}:{i >> 8 & 0xFF:02x}:{i & 0xFF:02x}"
+        for i in range(count)
+    ]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await client.post(
+            "/login",
+            data={"username": USERNAME, "password": PASSWORD},
+        )
+        csrf = client.cookies.get("csrf_token") or ""
+
+        start = time.perf_counter()
+        for mac in macs:
+            response = await client.post(
+                "/wake",
+                data={
+                    "mac_address": mac,
+                    "ip_address": "127.0.0.1",
+                    "port_number": str(port),
+                    "csrf_token": csrf,
+                },
+            )
+            response.raise_for_status()
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/wake/batch",
+            json={
+                "targets": [{"mac": m, "ip": "127.0.0.1", "port": port} for m in macs]
+            },
+            headers={"X-CSRF-Token": csrf},
+        )
+        response.raise_for_status()
+        batch = time.perf_counter() - start
+
+    await asyncio.sleep(0.2)
+    sink_transport.close()
+    print(f"{count} x POST /wake:         {single * 1000:9.1f} ms")
+    print(
+        f"1 x POST /api/wake/batch:   {batch * 1000:9.1f} ms ({single / batch:.1f}x faster)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=1000)
+    asyncio.run(main(parser.parse_args().count))
@@ -0,0 +1,152 @@
+"""
+Measure POST /wake latency while a storm of failing logins is running.
+
+Runs the app in-process (no network between client and server) and sends the
+magic packets to a local UDP sink, so nothing leaves the machine. Each login
+costs a full Argon2 verify; with --inline it runs on the event loop, as it
+did before verifies moved to the password verifier pool. The login throttle
+is turned off, so every failing login reaches the verifier instead of being
+answered 429 after the first few.
+
+    uv run python benchmarks/bench_login_storm.py --logins 8 --wakes 200
+    uv run python benchmarks/bench_login_storm.py --logins 8 --wakes 200 --inline
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+_TMP = Path(tempfile.mkdtemp(prefix="wol-bench-"))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("WOL_WAKE_MAC_RATE", "0")
+os.environ.setdefault("WOL_WAKE_MAX_PPS", "0")
+os.environ["WOL_LOGIN_MAX_FAILURES"] = "0"
+USERNAME, PASSWORD = "bench", "bench-password"
+WAKE_INTERVAL = 0.01  # seconds between wakes
+os.environ["ADMIN_USERNAME"] = USERNAME
+os.environ["ADMIN_PASSWORD"] = PASSWORD
+os.environ.setdefault("USERS_PATH", str(_TMP / "users.json"))
+os.environ.setdefault("WOL_HOSTS_PATH", str(_TMP / "hosts.json"))
+
+import httpx  # noqa: E402
+
+from wol_service import ui  # noqa: E402
+from wol_service.app import app  # noqa: E402
+from wol_service.auth import authenticate_user  # noqa: E402
+
+
+class _Sink(asyncio.DatagramProtocol):
+    def datagram_received(self, data, addr):
+        pass
+
+
+async def _inline_authenticate(users_db, username: str, password: str):
+    return authenticate_user(users_db, username, password)
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def _wake_latencies(
+    client: httpx.AsyncClient, csrf: str, port: int, count: int, seconds: float
+) -> list[float]:
+    """
+    Send wakes at a fixed rate; latency is counted from each wake's slot.
+
+    Counting from the slot rather than from when the request actually went
+    out includes the time a blocked event loop held it back.
+    """
+    latencies: list[float] = []
+    start = time.perf_counter()
+    for i in range(count):
+        slot = start + i * WAKE_INTERVAL
+        now = time.perf_counter()
+        if now - start > seconds:
+            break
+        await asyncio.sleep(max(0.0, slot - now))
+        response = await client.post(
+            "/wake",
+            data={
+                "mac_address": f"02:00:00:00:{i >> 8 & 0xFF:02x}:{i & 0xFF:02x}",
+                "ip_address": "127.0.0.1",
+                "port_number": str(port),
+                "csrf_token": csrf,
+            },
+        )
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - slot)
+    return latencies
+
+
+async def _login_storm(client: httpx.AsyncClient, stop: asyncio.Event, counts: dict):
+    while not stop.is_set():
+        response = await client.post(
+            "/login", data={"username": USERNAME, "password": "wrong"}
+        )
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        # In-process requests need not suspend; give other clients a turn
+        await asyncio.sleep(0)
+
+
+async def main(logins: int, wakes: int, seconds: float) -> None:
+    loop = asyncio.get_running_loop()
+    sink_transport, _ = await loop.create_datagram_endpoint(
+        _Sink, local_addr=("127.0.0.1", 0)
+    )
+    port = sink_transport.get_extra_info("sockname")[1]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await client.post("/login", data={"username": USERNAME, "password": PASSWORD})
+        csrf = client.cookies.get("csrf_token") or ""
+
+        async def storm_client() -> httpx.AsyncClient:
+            return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+        for label in ("idle", "login storm"):
+            stop = asyncio.Event()
+            counts: dict[int, int] = {}
+            attackers = [
+                await storm_client() for _ in range(logins if label != "idle" else 0)
+            ]
+            storm = [
+                asyncio.create_task(_login_storm(c, stop, counts)) for c in attackers
+            ]
+            await asyncio.sleep(0.1)
+            latencies = await _wake_latencies(client, csrf, port, wakes, seconds)
+            stop.set()
+            await asyncio.gather(*storm)
+            for attacker in attackers:
+                await attacker.aclose()
+            print(
+                f"{label:12} {len(latencies):4} x POST /wake p50 {statistics.median(latencies) * 1000:7.1f} ms"
+                f"  p99 {_percentile(latencies, 99) * 1000:7.1f} ms"
+                f"  logins by status {dict(sorted(counts.items()))}"
+            )
+    sink_transport.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=8, help="concurrent attackers")
+    parser.add_argument("--wakes", type=int, default=200)
+    parser.add_argument(
+        "--seconds", type=float, default=30, help="time limit for each phase"
+    )
+    parser.add_argument(
+        "--inline", action="store_true", help="verify passwords on the event loop"
+    )
+    args = parser.parse_args()
+    if args.inline:
+        setattr(ui, "authenticate_user_async", _inline_authenticate)
+    asyncio.run(main(args.logins, args.wakes, args.seconds))
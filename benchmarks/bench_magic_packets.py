@@ -0,0 +1,98 @@
+"""
+Compare building N magic packets one at a time against the batch builder.
+
+Times create_magic_packet() per MAC against macs_to_bytes() plus
+build_magic_packets() into one buffer, with and without NumPy (when it is
+installed), then sends every packet of the buffer as a zero-copy slice to a
+local UDP sink so nothing leaves the machine.
+
+    uv run python benchmarks/bench_magic_packets.py --count 10000 100000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from wol_service import wol  # noqa: E402
+from wol_service.wol import (  # noqa: E402
+    PACKET_SIZE,
+    WakeEngine,
+    build_magic_packets,
+    create_magic_packet,
+    macs_to_bytes,
+)
+
+
+def _best_of(runs: int, fn) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class _Sink(asyncio.DatagramProtocol):
+    def datagram_received(self, data, addr):
+        pass
+
+
+async def _send_all(buffer: memoryview, count: int) -> float:
+    loop = asyncio.get_running_loop()
+    sink, _ = await loop.create_datagram_endpoint(_Sink, local_addr=("127.0.0.1", 0))
+    address = sink.get_extra_info("sockname")
+    engine = WakeEngine()
+    await engine.start()
+    start = time.perf_counter()
+    await engine.send_packets(
+        [
+            (buffer[PACKET_SIZE * i : PACKET_SIZE * (i + 1)], address)
+            for i in range(count)
+        ]
+    )
+    elapsed = time.perf_counter() - start
+    engine.close()
+    sink.close()
+    return elapsed
+
+
+def main(counts: list[int], runs: int) -> None:
+    numpy = wol.np
+    for count in counts:
+        macs = [
+            f"02:00:00:{i >> 16 & 0xFF:02x}:{i >> 8 & 0xFF:02x}:{i & 0xFF:02x}"
+            for i in range(count)
+        ]
+        single = _best_of(runs, lambda: [create_magic_packet(m) for m in macs])
+        timings = []
+        for label, module in (("numpy", numpy), ("pure python", None)):
+            if label == "numpy" and module is None:
+                continue
+            setattr(wol, "np", module)
+            batch = _best_of(runs, lambda: build_magic_packets(macs_to_bytes(macs)))
+            timings.append((label, batch))
+        setattr(wol, "np", numpy)
+        buffer = build_magic_packets(macs_to_bytes(macs))
+        assert buffer[-PACKET_SIZE:] == create_magic_packet(macs[-1])
+        send = asyncio.run(_send_all(buffer, count))
+
+        print(f"{count} MACs")
+        print(f"  {'create_magic_packet per MAC:':36}{single * 1000:9.1f} ms")
+        for label, batch in timings:
+            print(
+                f"  {f'build_magic_packets ({label}):':36}{batch * 1000:9.1f} ms"
+                f" ({single / batch:.1f}x faster)"
+            )
+        print(f"  {'send as zero-copy slices:':36}{send * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    main(args.count, args.runs)
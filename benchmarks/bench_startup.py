@@ -0,0 +1,122 @@
+"""
+Measure the time from starting the service to its first served request.
+
+Starts uvicorn in a fresh interpreter, as a container restart does, and polls
+GET /login on a local port until it answers. Each scenario runs against its own
+data directory:
+
+    first boot      the env admin is hashed and written to users.json
+    restart         the env admin already exists in users.json
+    auth disabled   ADMIN_USERNAME and ADMIN_PASSWORD set to empty strings
+
+    uv run python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def _start_to_first_request(env: dict[str, str], timeout: float) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "wol_service.app:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - start < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"server exited with {server.returncode}")
+                try:
+                    client.get("/login")
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                return time.perf_counter() - start
+        raise TimeoutError(f"no response within {timeout} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _env(data: Path, admin: tuple[str, str]) -> dict[str, str]:
+    return {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(SRC), os.environ.get("PYTHONPATH", "")]),
+        "SECRET_KEY": "bench-secret",
+        "LOG_LEVEL": "WARNING",
+        "ADMIN_USERNAME": admin[0],
+        "ADMIN_PASSWORD": admin[1],
+        "USERS_PATH": str(data / "users.json"),
+        "WOL_HOSTS_PATH": str(data / "hosts.json"),
+    }
+
+
+def main(runs: int, timeout: float) -> None:
+    scenarios: dict[str, list[float]] = {
+        "first boot": [],
+        "restart": [],
+        "auth disabled": [],
+    }
+    for _ in range(runs):
+        data = Path(tempfile.mkdtemp(prefix="wol-bench-"))
+        try:
+            admin_env = _env(data, ("bench", "bench-password"))
+            scenarios["first boot"].append(_start_to_first_request(admin_env, timeout))
+            scenarios["restart"].append(_start_to_first_request(admin_env, timeout))
+        finally:
+            shutil.rmtree(data, ignore_errors=True)
+        data = Path(tempfile.mkdtemp(prefix="wol-bench-"))
+        try:
+            scenarios["auth disabled"].append(
+                _start_to_first_request(_env(data, ("", "")), timeout)
+            )
+        finally:
+            shutil.rmtree(data, ignore_errors=True)
+
+    for label, samples in scenarios.items():
+        print(
+            f"{label:14} start -> first request"
+            f"  median {statistics.median(samples) * 1000:7.1f} ms"
+            f"  min {min(samples) * 1000:7.1f} ms  ({len(samples)} runs)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--timeout", type=float, default=30, help="seconds to wait for each start"
+    )
+    args = parser.parse_args()
+    main(args.runs, args.timeout)
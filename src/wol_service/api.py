@@ -1,75 +1,790 @@
+import csv
+import hashlib
+import io
+import json
+import time
+from collections.abc import AsyncIterator, Iterator
 from typing import List
 
-from fastapi import APIRouter, Depends, Form, HTTPException, Request
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 
+from wol_service.apikeys import (
+    SCOPES,
+    api_keys,
+    require_read,
+    require_wake,
+    require_write,
+)
 from wol_service.auth import require_user_from_cookie, validate_csrf
-from wol_service.models import Host
-from wol_service.storage import load_hosts, save_hosts
+from wol_service.env import GROUP_WAKE_CONCURRENCY, GROUP_WAKE_STAGGER
+from wol_service.events import event_stream
+from wol_service.groups import GroupWake, get_run, group_wake_stream
+from wol_service.jobs import JobQueueFullError, JobTarget, WakeJob, jobs
+from wol_service.models import ApiKey, Host, HostMutation, PreparedHost, Schedule
+from wol_service.monitor import monitor
+from wol_service.probe import parse_ports, probe_address, verify_stream, wake_and_verify
+from wol_service.ratelimit import RateLimitedError, wake_limiter
+from wol_service.registry import HostConflictError, HostNotFoundError, registry, writer
+from wol_service.scheduler import CronExpression, scheduler
 from wol_service.validators import (
+    normalize_tags,
     validate_ip_address,
     validate_mac_address,
     validate_port,
 )
-from wol_service.env import HOSTS_PATH
+from wol_service.wol import (
+    DEFAULT_SEND_POLICY,
+    SendPolicy,
+    prepare_hosts,
+    wake_engine,
+)
 
 
 router = APIRouter()
 
+HOST_FIELDS = ("name", "mac", "ip", "port", "tags", "probe_ip")
+EXPORT_CHUNK_ROWS = 256
+MAX_WAKE_REPEAT = 20
+MAX_WAKE_INTERVAL_MS = 10_000
+MAX_GROUP_WAKE_CONCURRENCY = 256
+MAX_GROUP_WAKE_STAGGER_MS = 600_000
+
 
 def get_hosts() -> List[Host]:
-    return load_hosts(HOSTS_PATH)
+    return registry.hosts()
+
+
+def _host_field_error(name: str, mac: str, ip: str, port) -> str | None:
+    if not name.strip():
+        return "Host name is required"
+    if not validate_mac_address(mac):
+        return "Invalid MAC address format"
+    if not validate_ip_address(ip):
+        return "Invalid IP/broadcast address"
+    if not validate_port(port):
+        return "Invalid port number"
+    return None
+
+
+def _row_port(value) -> int:
+    """The port of an import row; a missing port means 9."""
+    if value is None or value == "":
+        return 9
+    # int() would turn true into 1 and 9.7 into 9; only exact integers pass
+    if isinstance(value, bool):
+        raise ValueError("Port must be an integer")
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    raise ValueError("Port must be an integer")
+
+
+def _host_from_row(row: dict) -> Host:
+    name, mac, ip = (str(row.get(k) or "") for k in ("name", "mac", "ip"))
+    port = _row_port(row.get("port"))
+    error = _host_field_error(name, mac, ip, port)
+    if error:
+        raise ValueError(error)
+    host = Host(name=name.strip(), mac=mac.strip(), ip=ip.strip(), port=int(port))
+    tags = normalize_tags(row.get("tags"))
+    if tags:
+        host["tags"] = tags
+    probe_ip = str(row.get("probe_ip") or "").strip()
+    if probe_ip:
+        # Validated like a probe address given at wake time
+        host["probe_ip"] = probe_address(probe_ip, ip)
+    return host
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    yield buffer
+
+
+def _parse_row(line: str, fmt: str, header: list[str]) -> dict:
+    if fmt == "csv":
+        return dict(zip(header, next(csv.reader([line]))))
+    row = json.loads(line)
+    if not isinstance(row, dict):
+        raise ValueError("Expected a JSON object")
+    return row
+
 
+def _bulk_format(request: Request, fmt: str | None) -> str:
+    if fmt is None:
+        content_type = request.headers.get("content-type", "")
+        fmt = "csv" if "csv" in content_type else "ndjson"
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(400, "Format must be ndjson or csv")
+    return fmt
 
-def set_hosts(hosts: List[Host]) -> None:
-    save_hosts(HOSTS_PATH, hosts)
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip().removeprefix("W/") for c in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
 
 
 @router.get("/api/hosts")
-def list_hosts(user=Depends(require_user_from_cookie)):
-    return get_hosts()
+def list_hosts(
+    request: Request,
+    user=Depends(require_read),
+    limit: int | None = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    name: str = "",
+    mac: str = "",
+    ip: str = "",
+    tag: str = "",
+    fields: str | None = None,
+    status: bool = False,
+):
+    selected: tuple[str, ...] = HOST_FIELDS
+    if fields:
+        selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = set(selected) - set(HOST_FIELDS)
+        if unknown:
+            raise HTTPException(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+    # The ETag depends only on the stored hosts and the query, so it can be
+    # checked before any filtering or serialization work happens.
+    query = request.url.query
+    fingerprint = registry.fingerprint()
+    if status:
+        fingerprint += f"+{monitor.content_version}"
+    etag = hashlib.sha256(f"{fingerprint}?{query}".encode()).hexdigest()
+    headers = {"ETag": f'"{etag[:32]}"', "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("If-None-Match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    total, page = registry.query(name, mac, ip, limit, offset, tag.strip().lower())
+    rows: List = page
+    if selected != HOST_FIELDS:
+        rows = [
+            {f: h.get(f, [] if f == "tags" else None) for f in selected} for h in page
+        ]
+    if status:
+        # Look status up by the page's hosts; "name" may be projected away
+        rows = [
+            {**row, "status": monitor.status_dict(h["name"])}
+            for row, h in zip(rows, page)
+        ]
+    headers["X-Total-Count"] = str(total)
+    return JSONResponse(rows, headers=headers)
+
+
+def _events_snapshot() -> tuple[str, dict]:
+    status = {name: s._asdict() for name, s in monitor.snapshot().items()}
+    return "snapshot", {"hosts": registry.hosts(), "status": status}
+
+
+@router.get("/api/events")
+def events(user=Depends(require_read)):
+    return StreamingResponse(
+        event_stream(_events_snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/hosts/status")
+def hosts_status(user=Depends(require_read)):
+    return {name: status._asdict() for name, status in monitor.snapshot().items()}
 
 
 @router.post("/api/hosts")
 async def add_host(
     request: Request,
-    user=Depends(require_user_from_cookie),
+    user=Depends(require_write),
     name: str = Form(...),
     mac: str = Form(...),
     ip: str = Form(...),
     port: int = Form(9),
+    tags: str = Form(""),
+    probe_ip: str = Form(""),
     csrf_token: str | None = Form(None),
 ):
     validate_csrf(request, csrf_token)
-    if not name.strip():
-        raise HTTPException(400, "Host name is required")
-    if not validate_mac_address(mac):
-        raise HTTPException(400, "Invalid MAC address format")
-    if not validate_ip_address(ip):
-        raise HTTPException(400, "Invalid IP/broadcast address")
-    if not validate_port(port):
-        raise HTTPException(400, "Invalid port number")
-    hosts = get_hosts()
-    if any(h["name"] == name for h in hosts):
-        raise HTTPException(400, "Host with this name already exists")
-    if any(h["mac"].lower() == mac.strip().lower() for h in hosts):
-        raise HTTPException(400, "Host with this MAC already exists")
-    hosts.append(
-        {"name": name.strip(), "mac": mac.strip(), "ip": ip.strip(), "port": int(port)}
-    )
-    set_hosts(hosts)
+    try:
+        host = _host_from_row(
+            {
+                "name": name,
+                "mac": mac,
+                "ip": ip,
+                "port": port,
+                "tags": tags,
+                "probe_ip": probe_ip,
+            }
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    try:
+        await writer.submit({"op": "add", "host": host})
+    except HostConflictError as e:
+        raise HTTPException(400, str(e))
     return {"ok": True}
 
 
 @router.delete("/api/hosts")
 async def delete_host(
     request: Request,
-    user=Depends(require_user_from_cookie),
+    user=Depends(require_write),
     name: str = Form(...),
     csrf_token: str | None = Form(None),
 ):
     validate_csrf(request, csrf_token)
     if not name.strip():
         raise HTTPException(400, "Host name is required")
-    hosts = [h for h in get_hosts() if h["name"] != name]
-    set_hosts(hosts)
+    try:
+        await writer.submit({"op": "delete", "name": name})
+    except HostNotFoundError:
+        pass
     return {"ok": True}
+
+
+@router.post("/api/hosts/bulk")
+async def bulk_add_hosts(
+    request: Request,
+    user=Depends(require_write),
+    format: str | None = None,
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    fmt = _bulk_format(request, format)
+    lines: list[int] = []
+    mutations: list[HostMutation] = []
+    errors: list[dict] = []
+    header: list[str] | None = None
+    line_number = 0
+    async for raw in _iter_lines(request):
+        line_number += 1
+        try:
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            if fmt == "csv" and header is None:
+                header = [h.strip().lower() for h in next(csv.reader([line]))]
+                continue
+            host = _host_from_row(_parse_row(line, fmt, header or []))
+        except ValueError as e:
+            errors.append({"line": line_number, "error": str(e)})
+            continue
+        mutations.append({"op": "add", "host": host})
+        lines.append(line_number)
+    # All valid rows go to storage as one batch, i.e. a single write
+    results = await writer.submit_many(mutations) if mutations else []
+    for number, result in zip(lines, results):
+        if result is not None:
+            errors.append({"line": number, "error": str(result)})
+    errors.sort(key=lambda e: e["line"])
+    added = sum(1 for result in results if result is None)
+    return {"added": added, "errors": errors}
+
+
+class TagsRequest(BaseModel):
+    tags: List[str]
+
+
+# {name:path}: host names may contain "/"
+@router.put("/api/hosts/{name:path}/tags")
+async def set_host_tags(
+    request: Request,
+    name: str,
+    body: TagsRequest,
+    user=Depends(require_write),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    try:
+        tags = normalize_tags(body.tags)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    host = registry.get(name)
+    if host is None:
+        raise HTTPException(404, "Host not found")
+    updated = Host(**host)
+    updated.pop("tags", None)
+    if tags:
+        updated["tags"] = tags
+    # Replace the host within one batch, i.e. one storage write
+    results = await writer.submit_many(
+        [{"op": "delete", "name": name}, {"op": "add", "host": updated}]
+    )
+    if isinstance(results[0], HostNotFoundError):
+        raise HTTPException(404, "Host not found")
+    for error in results:
+        if error is not None:
+            raise HTTPException(409, str(error))
+    return updated
+
+
+def _export_chunks(hosts: List[Host], fmt: str) -> Iterator[str]:
+    if fmt == "csv":
+        yield ",".join(HOST_FIELDS) + "\n"
+    for start in range(0, len(hosts), EXPORT_CHUNK_ROWS):
+        chunk = hosts[start : start + EXPORT_CHUNK_ROWS]
+        if fmt == "csv":
+            out = io.StringIO()
+            csv.writer(out, lineterminator="\n").writerows(
+                [
+                    h["name"],
+                    h["mac"],
+                    h["ip"],
+                    h["port"],
+                    ",".join(h.get("tags", [])),
+                    h.get("probe_ip", ""),
+                ]
+                for h in chunk
+            )
+            yield out.getvalue()
+        else:
+            yield "".join(json.dumps(h, ensure_ascii=False) + "\n" for h in chunk)
+
+
+@router.get("/api/hosts/export")
+def export_hosts(user=Depends(require_read), format: str = "ndjson"):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(400, "Format must be ndjson or csv")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_chunks(get_hosts(), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="hosts.{format}"'},
+    )
+
+
+class WakeTarget(BaseModel):
+    name: str | None = None
+    mac: str | None = None
+    ip: str = "255.255.255.255"
+    port: int = 9
+
+
+class BatchWakeRequest(BaseModel):
+    targets: List[WakeTarget]
+    repeat: int | None = None
+    interval_ms: int | None = None
+    broadcasts: List[str] | None = None
+    verify: bool = False  # only with async=true
+    probe_ports: str | None = None
+
+
+def _send_policy(
+    repeat: int | None, interval_ms: int | None, broadcasts: List[str] | None
+) -> SendPolicy:
+    """Request overrides on top of the configured send policy."""
+    policy = DEFAULT_SEND_POLICY
+    if repeat is not None:
+        if not 1 <= repeat <= MAX_WAKE_REPEAT:
+            raise HTTPException(400, f"repeat must be between 1 and {MAX_WAKE_REPEAT}")
+        policy = policy._replace(repeat=repeat)
+    if interval_ms is not None:
+        if not 0 <= interval_ms <= MAX_WAKE_INTERVAL_MS:
+            raise HTTPException(
+                400, f"interval_ms must be between 0 and {MAX_WAKE_INTERVAL_MS}"
+            )
+        policy = policy._replace(interval=interval_ms / 1000)
+    if broadcasts:
+        cleaned = tuple(b.strip() for b in broadcasts)
+        if not all(validate_ip_address(b) for b in cleaned):
+            raise HTTPException(400, "Invalid broadcast address")
+        policy = policy._replace(broadcasts=cleaned)
+    return policy
+
+
+def _resolve_wake_target(target: WakeTarget) -> PreparedHost | Host:
+    """The saved host's prepared packet, or a validated ad-hoc host."""
+    if target.name is not None:
+        prepared = registry.prepared(target.name)
+        if prepared is None:
+            raise ValueError("Host not found")
+        return prepared
+    if target.mac is None:
+        raise ValueError("Either name or mac is required")
+    error = _host_field_error("-", target.mac, target.ip, target.port)
+    if error:
+        raise ValueError(error)
+    return Host(name="", mac=target.mac, ip=target.ip.strip(), port=target.port)
+
+
+def _target_result(name: str | None, prepared: PreparedHost) -> dict:
+    ip, port = prepared.address
+    return {"name": name, "mac": prepared.mac.hex(":"), "ip": ip, "port": port}
+
+
+def enqueue_wake(job: WakeJob) -> JSONResponse:
+    """Queue a wake job and answer 202 with where to poll for its outcome."""
+    try:
+        jobs.submit(job)
+    except JobQueueFullError as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "1"})
+    url = f"/api/jobs/{job.id}"
+    return JSONResponse(
+        {"job": job.id, "state": job.state, "url": url},
+        status_code=202,
+        headers={"Location": url},
+    )
+
+
+@router.get("/api/jobs/{job_id}")
+def get_job(job_id: str, user=Depends(require_read)):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job.to_dict()
+
+
+@router.post("/api/wake/batch")
+async def wake_batch(
+    request: Request,
+    body: BatchWakeRequest,
+    async_: bool = Query(False, alias="async"),
+    user=Depends(require_wake),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    policy = _send_policy(body.repeat, body.interval_ms, body.broadcasts)
+    ports = None
+    if body.verify:
+        if not async_:
+            raise HTTPException(400, "verify requires async=true")
+        try:
+            ports = parse_ports(body.probe_ports)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+    results: list[dict] = []
+    resolved: list[tuple[PreparedHost | Host, dict]] = []
+    # Resolve and build everything first, then send in one tight loop
+    for target in body.targets:
+        result: dict = {"name": target.name, "mac": target.mac}
+        try:
+            resolved.append((_resolve_wake_target(target), result))
+        except ValueError as e:
+            result.update(ok=False, error=str(e))
+        results.append(result)
+    # Packets of all ad-hoc targets are built together in one buffer
+    adhoc = iter(prepare_hosts([h for h, _ in resolved if isinstance(h, dict)]))
+    targets: list[tuple[PreparedHost, dict]] = []
+    for host, result in resolved:
+        prepared = next(adhoc) if isinstance(host, dict) else host
+        targets.append((prepared, result))
+        # A queued job reports ok once it has sent to the target
+        result.update(
+            _target_result(result["name"], prepared), ok=None if async_ else True
+        )
+    if async_:
+        job_targets = []
+        for prepared, result in targets:
+            probe_ip = None
+            if ports is not None:
+                try:
+                    probe_ip = probe_address(
+                        registry.probe_ip(result["name"]) if result["name"] else None,
+                        prepared.address[0],
+                    )
+                except ValueError:
+                    pass  # reported as unverified
+            job_targets.append(JobTarget(prepared, result, probe_ip))
+        return enqueue_wake(WakeJob(results, job_targets, policy, ports))
+
+    async def send(admitted: list[int]) -> None:
+        await wake_engine.send_packets(
+            [(targets[i][0].packet, targets[i][0].address) for i in admitted], policy
+        )
+
+    statuses = await wake_limiter.wake_many(
+        [prepared.mac.hex() for prepared, _ in targets],
+        send,
+        [policy.packet_count(prepared.address) for prepared, _ in targets],
+    )
+    for (_, result), status in zip(targets, statuses):
+        if isinstance(status, RateLimitedError):
+            result.update(ok=False, error=str(status), retry_after=status.retry_after)
+        elif status is not None:
+            result["coalesced"] = True
+    return {"sent": statuses.count(None), "results": results}
+
+
+async def _limited_wake(prepared: PreparedHost, policy: SendPolicy) -> bool:
+    """Send to a saved host through the wake limiter; True if coalesced."""
+
+    async def send() -> None:
+        await wake_engine.send_prepared(prepared, policy)
+
+    try:
+        return await wake_limiter.wake(
+            prepared.mac.hex(), send, policy.packet_count(prepared.address)
+        )
+    except RateLimitedError as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": e.retry_after_header})
+
+
+# Registered before /api/hosts/{name:path}/wake, which would also match it
+@router.post("/api/hosts/by-mac/{mac}/wake")
+async def wake_host_by_mac(
+    request: Request,
+    mac: str,
+    repeat: int | None = None,
+    interval_ms: int | None = None,
+    broadcast: List[str] = Query([]),
+    async_: bool = Query(False, alias="async"),
+    user=Depends(require_wake),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    policy = _send_policy(repeat, interval_ms, broadcast)
+    prepared = registry.prepared_by_mac(mac)
+    if prepared is None:
+        raise HTTPException(404, "Host not found")
+    if async_:
+        result = {**_target_result(None, prepared), "ok": None}
+        return enqueue_wake(WakeJob([result], [JobTarget(prepared, result)], policy))
+    mac = prepared.mac.hex(":")
+    if await _limited_wake(prepared, policy):
+        return {"message": f"Wake for {mac} already sent", "coalesced": True}
+    return {"message": f"Magic packet sent to {mac}"}
+
+
+@router.post("/api/hosts/{name:path}/wake")
+async def wake_host(
+    request: Request,
+    name: str,
+    repeat: int | None = None,
+    interval_ms: int | None = None,
+    broadcast: List[str] = Query([]),
+    verify: bool = False,
+    probe_ip: str | None = None,
+    probe_ports: str | None = None,
+    async_: bool = Query(False, alias="async"),
+    user=Depends(require_wake),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    policy = _send_policy(repeat, interval_ms, broadcast)
+    prepared = registry.prepared(name)
+    if prepared is None:
+        raise HTTPException(404, "Host not found")
+    if verify:
+        try:
+            ip = probe_address(probe_ip or registry.probe_ip(name), prepared.address[0])
+            ports = parse_ports(probe_ports)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+    if async_:
+        result = {**_target_result(name, prepared), "ok": None}
+        target = JobTarget(prepared, result, ip if verify else None)
+        return enqueue_wake(
+            WakeJob([result], [target], policy, ports if verify else None)
+        )
+    coalesced = await _limited_wake(prepared, policy)
+    if verify:
+
+        async def send() -> None:
+            await wake_engine.send_prepared(prepared, policy)
+
+        return StreamingResponse(
+            verify_stream(wake_and_verify(send, ip, ports, already_sent=True)),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+    if coalesced:
+        return {"message": f"Wake for {name} already sent", "coalesced": True}
+    return {"message": f"Magic packet sent to {name}"}
+
+
+class ScheduleRequest(BaseModel):
+    host: str
+    cron: str | None = None  # five-field cron expression, local time
+    at: float | None = None  # Unix time of a one-shot wake
+    enabled: bool = True
+
+
+def _validate_schedule(body: ScheduleRequest) -> None:
+    if (body.cron is None) == (body.at is None):
+        raise HTTPException(400, "Exactly one of cron or at is required")
+    if body.cron is not None:
+        try:
+            CronExpression(body.cron)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+    elif body.at is not None and body.at <= time.time():
+        raise HTTPException(400, "at must be in the future")
+    if registry.get(body.host) is None:
+        raise HTTPException(400, "Host not found")
+
+
+def _schedule_out(schedule: Schedule) -> dict:
+    return {**schedule, "next_run": scheduler.next_run(schedule["id"])}
+
+
+@router.get("/api/schedules")
+def list_schedules(user=Depends(require_read)):
+    return [_schedule_out(s) for s in scheduler.list()]
+
+
+@router.post("/api/schedules", status_code=201)
+async def create_schedule(
+    request: Request,
+    body: ScheduleRequest,
+    user=Depends(require_write),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    _validate_schedule(body)
+    schedule = await scheduler.create(body.host, body.cron, body.at, body.enabled)
+    return _schedule_out(schedule)
+
+
+@router.get("/api/schedules/{schedule_id}")
+def get_schedule(schedule_id: str, user=Depends(require_read)):
+    schedule = scheduler.get(schedule_id)
+    if schedule is None:
+        raise HTTPException(404, "Schedule not found")
+    return _schedule_out(schedule)
+
+
+@router.put("/api/schedules/{schedule_id}")
+async def update_schedule(
+    request: Request,
+    schedule_id: str,
+    body: ScheduleRequest,
+    user=Depends(require_write),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    _validate_schedule(body)
+    schedule = await scheduler.update(
+        schedule_id, body.host, body.cron, body.at, body.enabled
+    )
+    if schedule is None:
+        raise HTTPException(404, "Schedule not found")
+    return _schedule_out(schedule)
+
+
+@router.delete("/api/schedules/{schedule_id}")
+async def delete_schedule(
+    request: Request,
+    schedule_id: str,
+    user=Depends(require_write),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    if not await scheduler.delete(schedule_id):
+        raise HTTPException(404, "Schedule not found")
+    return {"message": "Schedule deleted"}
+
+
+@router.get("/api/groups")
+def list_groups(user=Depends(require_read)):
+    return registry.groups()
+
+
+@router.get("/api/groups/{tag}")
+def get_group(tag: str, user=Depends(require_read)):
+    hosts = registry.group(tag.lower())
+    if not hosts:
+        raise HTTPException(404, "Group not found")
+    return hosts
+
+
+@router.post("/api/groups/{tag}/wake")
+async def wake_group(
+    request: Request,
+    tag: str,
+    concurrency: int = GROUP_WAKE_CONCURRENCY,
+    stagger_ms: int | None = None,
+    repeat: int | None = None,
+    interval_ms: int | None = None,
+    broadcast: List[str] = Query([]),
+    verify: bool = False,
+    probe_ports: str | None = None,
+    user=Depends(require_wake),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    policy = _send_policy(repeat, interval_ms, broadcast)
+    if not 1 <= concurrency <= MAX_GROUP_WAKE_CONCURRENCY:
+        raise HTTPException(
+            400, f"concurrency must be between 1 and {MAX_GROUP_WAKE_CONCURRENCY}"
+        )
+    stagger = GROUP_WAKE_STAGGER
+    if stagger_ms is not None:
+        if not 0 <= stagger_ms <= MAX_GROUP_WAKE_STAGGER_MS:
+            raise HTTPException(
+                400, f"stagger_ms must be between 0 and {MAX_GROUP_WAKE_STAGGER_MS}"
+            )
+        stagger = stagger_ms / 1000
+    ports = None
+    if verify:
+        try:
+            ports = parse_ports(probe_ports)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+    targets = registry.prepared_group(tag.lower())
+    if not targets:
+        raise HTTPException(404, "Group not found")
+    run = GroupWake(tag.lower(), targets, concurrency, stagger, policy, ports)
+    run.start()
+    return StreamingResponse(
+        group_wake_stream(run),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Run-Id": run.id},
+    )
+
+
+@router.delete("/api/group-wakes/{run_id}")
+async def cancel_group_wake(
+    request: Request,
+    run_id: str,
+    user=Depends(require_wake),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    run = get_run(run_id)
+    if run is None or not run.cancel():
+        raise HTTPException(404, "Group wake not found")
+    return {"message": "Group wake cancelled"}
+
+
+class ApiKeyRequest(BaseModel):
+    name: str
+    scopes: List[str]  # any of "read", "wake", "write"
+
+
+def _api_key_out(key: ApiKey) -> dict:
+    return {k: v for k, v in key.items() if k != "digest"}
+
+
+# Keys are managed with a login session only; a key cannot mint or revoke keys
+@router.get("/api/keys")
+def list_api_keys(user=Depends(require_user_from_cookie)):
+    return [_api_key_out(k) for k in api_keys.list()]
+
+
+@router.post("/api/keys", status_code=201)
+async def create_api_key(
+    request: Request,
+    body: ApiKeyRequest,
+    user=Depends(require_user_from_cookie),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    if not body.name.strip():
+        raise HTTPException(400, "Key name is required")
+    unknown = sorted(set(body.scopes) - set(SCOPES))
+    if unknown or not body.scopes:
+        raise HTTPException(
+            400, f"Scopes must be a non-empty list of: {', '.join(SCOPES)}"
+        )
+    key, secret = await api_keys.create(body.name.strip(), body.scopes)
+    # The key is shown once; only its digest is stored
+    return {**_api_key_out(key), "key": secret}
+
+
+@router.delete("/api/keys/{key_id}")
+async def revoke_api_key(
+    request: Request,
+    key_id: str,
+    user=Depends(require_user_from_cookie),
+):
+    validate_csrf(request, request.headers.get("X-CSRF-Token"))
+    if not await api_keys.revoke(key_id):
+        raise HTTPException(404, "API key not found")
+    return {"message": "API key revoked"}
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections.abc import Callable, Hashable
+from typing import List
+
+from fastapi import HTTPException, Request
+from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
+
+from wol_service import auth
+from wol_service.env import API_KEYS_PATH
+from wol_service.models import ApiKey
+from wol_service.utils import atomic_write, file_lock, file_signature
+
+# "read": GET endpoints; "wake": wake and cancel wakes; "write": change hosts
+# and schedules. Keys themselves are managed with a login session only.
+SCOPES = ("read", "wake", "write")
+KEY_PREFIX = "wol_"
+
+
+class ApiKeyStore:
+    """
+    Long-lived, scoped API keys for machine clients.
+
+    Only an HMAC-SHA256 of each key, made with the server's SECRET_KEY, is
+    stored, so a leaked key file reveals nothing usable; changing SECRET_KEY
+    invalidates every key. Keys are random 256-bit strings and need no slow
+    hash: verifying one is a single HMAC and a dict lookup by digest. The
+    lookup compares digests an attacker cannot steer, so its timing leaks
+    nothing about stored keys.
+
+    Like the host registry, the store rereads the file whenever its
+    signature changes, so a key revoked by one worker stops working in all
+    of them. Changes are read-modify-writes of the file under a lock shared
+    by every process.
+    """
+
+    def __init__(self, path: str, secret: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._secret = secret.encode()
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._signature: Hashable = None
+        self._keys: dict[str, ApiKey] = {}
+        self._by_digest: dict[str, ApiKey] = {}
+
+    def _digest(self, key: str) -> str:
+        return hmac.new(self._secret, key.encode(), hashlib.sha256).hexdigest()
+
+    def _read(self) -> tuple[Hashable, dict[str, ApiKey]]:
+        # Read the signature first: a write racing with the read only makes
+        # the next refresh() read again, never miss a change.
+        signature = file_signature(self.path)
+        items: list = []
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        keys: dict[str, ApiKey] = {}
+        for item in items:
+            key = ApiKey(
+                id=str(item["id"]),
+                name=str(item["name"]),
+                scopes=[s for s in item.get("scopes", []) if s in SCOPES],
+                created=float(item["created"]),
+                digest=str(item["digest"]),
+            )
+            keys[key["id"]] = key
+        return signature, keys
+
+    def _swap(self, signature: Hashable, keys: dict[str, ApiKey]) -> None:
+        with self._lock:
+            self._keys = keys
+            self._by_digest = {k["digest"]: k for k in keys.values()}
+            self._signature = signature
+            self._loaded = True
+
+    def load(self) -> None:
+        self._swap(*self._read())
+
+    def refresh(self) -> None:
+        if not self._loaded or file_signature(self.path) != self._signature:
+            self.load()
+
+    def _update(self, change: Callable[[dict[str, ApiKey]], bool]) -> bool:
+        """
+        Apply ``change`` to the keys on disk and save them if it returns
+        True. The file lock keeps other workers' changes from being lost.
+        """
+        with file_lock(self.lock_path):
+            signature, keys = self._read()
+            changed = change(keys)
+            if changed:
+                atomic_write(self.path, list(keys.values()))
+                signature = file_signature(self.path)
+            self._swap(signature, keys)
+            return changed
+
+    def verify(self, key: str) -> ApiKey | None:
+        """The stored record of ``key``, or None if it is unknown or revoked."""
+        self.refresh()
+        return self._by_digest.get(self._digest(key))
+
+    def list(self) -> List[ApiKey]:
+        self.refresh()
+        with self._lock:
+            return [ApiKey(**k) for k in self._keys.values()]
+
+    async def create(self, name: str, scopes: List[str]) -> tuple[ApiKey, str]:
+        """Store a new key; returns its record and the key, shown only once."""
+        secret = KEY_PREFIX + secrets.token_urlsafe(32)
+        key = ApiKey(
+            id=secrets.token_hex(8),
+            name=name,
+            scopes=[s for s in SCOPES if s in scopes],
+            created=time.time(),
+            digest=self._digest(secret),
+        )
+
+        def add(keys: dict[str, ApiKey]) -> bool:
+            keys[key["id"]] = key
+            return True
+
+        await asyncio.to_thread(self._update, add)
+        return ApiKey(**key), secret
+
+    async def revoke(self, key_id: str) -> bool:
+        def remove(keys: dict[str, ApiKey]) -> bool:
+            return keys.pop(key_id, None) is not None
+
+        return await asyncio.to_thread(self._update, remove)
+
+
+api_keys = ApiKeyStore(API_KEYS_PATH, auth.SECRET_KEY)
+
+
+def _bearer_token(request: Request) -> str | None:
+    header = request.headers.get("authorization")
+    if not header:
+        return None
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip()
+
+
+def require_scope(scope: str):
+    """
+    A dependency that accepts an API key with ``scope`` as a bearer token,
+    or else a login session cookie.
+
+    Requests made with a key are marked on ``request.state`` and skip the
+    CSRF check: a browser never attaches the header by itself.
+    """
+
+    async def dependency(request: Request):
+        token = _bearer_token(request)
+        if token is None:
+            return await auth.require_user_from_cookie(request)
+        key = api_keys.verify(token)
+        if key is None:
+            raise HTTPException(
+                status_code=HTTP_401_UNAUTHORIZED,
+                detail="Invalid API key",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if scope not in key["scopes"]:
+            raise HTTPException(
+                status_code=HTTP_403_FORBIDDEN,
+                detail=f"API key lacks the {scope} scope",
+            )
+        request.state.api_key = key
+        return f"api-key:{key['name']}"
+
+    return dependency
+
+
+require_read = require_scope("read")
+require_wake = require_scope("wake")
+require_write = require_scope("write")
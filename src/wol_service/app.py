@@ -6,8 +6,16 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
 from wol_service.api import router as api_router
-from wol_service.ui import router as ui_router
+from wol_service.apikeys import api_keys
+from wol_service import ui
+from wol_service.auth import password_verifier, prepare_dummy_hash
+from wol_service.jobs import jobs
+from wol_service.monitor import monitor
+from wol_service.registry import registry
+from wol_service.scheduler import scheduler
+from wol_service.ui import load_auth, router as ui_router
 from wol_service.utils import ensure_parent_dir, get_resource_path
+from wol_service.wol import wake_engine
 from wol_service.env import HOSTS_PATH, CONTAINER, LOG_LEVEL
 
 
@@ -19,7 +27,21 @@ async def lifespan(app: FastAPI):
     ensure_parent_dir(HOSTS_PATH)
     # If file missing, it’ll be created on first save
     _warn_if_ephemeral_storage()
+    load_auth()
+    if ui.AUTH_ENABLED:
+        prepare_dummy_hash()
+    api_keys.load()
+    registry.load()
+    await wake_engine.start()
+    await scheduler.start()
+    await monitor.start()
+    await jobs.start()
     yield
+    await jobs.close()
+    await monitor.close()
+    await scheduler.close()
+    wake_engine.close()
+    password_verifier.close()
 
 
 # Initialize FastAPI app
@@ -1,21 +1,49 @@
+import asyncio
+import functools
+import hashlib
 import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException, Request
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
 from wol_service.env import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM,
+    ARGON2_TIME_COST,
     SECRET_KEY,
     ALGORITHM,
+    PASSWORD_VERIFY_QUEUE,
+    PASSWORD_VERIFY_WORKERS,
     TOKEN_AUDIENCE,
+    TOKEN_CACHE_SIZE,
     TOKEN_ISSUER,
 )
 
 
-# Password hashing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+@functools.cache
+def _pwd_context():
+    """
+    The password hashing context; hashes made with other parameters are
+    upgraded on login.
+
+    passlib (like jose, for tokens) is imported on first use, so a service
+    running with authentication disabled never loads either.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__rounds=ARGON2_TIME_COST,
+        argon2__memory_cost=ARGON2_MEMORY_COST,
+        argon2__parallelism=ARGON2_PARALLELISM,
+    )
+
 
 # JWT settings
 if not SECRET_KEY:
@@ -25,24 +53,191 @@ if not SECRET_KEY:
     )
 
 
+class TokenCache:
+    """
+    Bounded LRU of verified access tokens, so a token is decoded only once.
+
+    Entries are keyed by a SHA-256 of the token and expire at its ``exp``.
+    The cache remembers the key the tokens were verified with and empties
+    itself when asked about a different one. A ``size`` of 0 disables it.
+    """
+
+    def __init__(self, size: int = TOKEN_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._key: str | None = None
+        self._tokens: OrderedDict[bytes, tuple[str, float]] = OrderedDict()
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str, key: str) -> str | None:
+        """The subject of a cached, unexpired token verified with ``key``."""
+        if key != self._key:
+            self.clear()
+            self._key = key
+        digest = self._digest(token)
+        entry = self._tokens.get(digest)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._tokens[digest]
+            self.misses += 1
+            return None
+        self._tokens.move_to_end(digest)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, token: str, subject: str, expires: float) -> None:
+        if self.size <= 0:
+            return
+        self._tokens[self._digest(token)] = (subject, expires)
+        if len(self._tokens) > self.size:
+            self._tokens.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        self._tokens.pop(self._digest(token), None)
+
+    def clear(self) -> None:
+        self._tokens.clear()
+
+
+token_cache = TokenCache()
+
+
+_dummy_hash: str | None = None
+
+
+def prepare_dummy_hash() -> None:
+    """
+    Make the hash that unknown users' passwords are verified against.
+
+    Called at startup when auth is enabled, so the first login for an
+    unknown user does not also pay for a hash and stand out by its timing.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = get_password_hash(secrets.token_urlsafe(16))
+
+
+def _dummy_password_hash() -> str:
+    """A hash to verify against for unknown users, so they take as long."""
+    prepare_dummy_hash()
+    assert _dummy_hash is not None
+    return _dummy_hash
+
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with other parameters than the current ones."""
+    return bool(_pwd_context().needs_update(hashed_password))
 
 
 def authenticate_user(users_db, username: str, password: str):
     user = users_db.get(username)
     if not user:
+        verify_password(password, _dummy_password_hash())
         return None
     if not verify_password(password, user["hashed_password"]):
         return None
     return user
 
 
+class VerifierBusyError(Exception):
+    def __init__(self):
+        super().__init__("Too many logins in progress; try again later")
+
+
+class PasswordVerifier:
+    """
+    Runs password verifies on a small dedicated thread pool.
+
+    An Argon2 verify is tens of milliseconds of CPU (argon2-cffi releases
+    the GIL meanwhile), so it must not run on the event loop. At most
+    ``workers`` verifies run at once and ``queue`` more may wait; beyond
+    that verify() raises VerifierBusyError at once instead of queueing.
+    """
+
+    def __init__(
+        self, workers: int = PASSWORD_VERIFY_WORKERS, queue: int = PASSWORD_VERIFY_QUEUE
+    ):
+        self.workers = max(1, workers)
+        self.queue = max(0, queue)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Called with the lock held
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="wol-password"
+            )
+        return self._executor
+
+    def _run(self, plain_password: str, hashed_password: str | None) -> bool:
+        try:
+            if hashed_password is None:
+                verify_password(plain_password, _dummy_password_hash())
+                return False
+            return bool(verify_password(plain_password, hashed_password))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str | None) -> bool:
+        """Check a password; a hash of None spends a dummy verify and fails."""
+        with self._lock:
+            if self.in_flight >= self.workers + self.queue:
+                raise VerifierBusyError()
+            self.in_flight += 1
+            executor = self._get_executor()
+        try:
+            future = executor.submit(self._run, plain_password, hashed_password)
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        """Hash on the pool too; only done after a successful login."""
+        with self._lock:
+            executor = self._get_executor()
+        return await asyncio.wrap_future(executor.submit(get_password_hash, password))
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+password_verifier = PasswordVerifier()
+
+
+async def authenticate_user_async(users_db, username: str, password: str):
+    """authenticate_user() with the verify run on password_verifier."""
+    user = users_db.get(username)
+    if not user:
+        await password_verifier.verify(password, None)
+        return None
+    if not await password_verifier.verify(password, user["hashed_password"]):
+        return None
+    return user
+
+
 def create_access_token(data: dict):
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update(
@@ -61,8 +256,6 @@ async def get_user_from_cookie(request: Request):
         return await require_user_from_cookie(request)
     except HTTPException:
         return None
-    except JWTError:
-        return None
 
 
 async def require_user_from_cookie(request: Request):
@@ -73,6 +266,11 @@ async def require_user_from_cookie(request: Request):
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    subject = token_cache.get(token, SECRET_KEY)
+    if subject is not None:
+        return subject
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(
             token,
@@ -81,13 +279,16 @@ async def require_user_from_cookie(request: Request):
             audience=TOKEN_AUDIENCE,
             issuer=TOKEN_ISSUER,
         )
-        return payload.get("sub") or "anonymous"
     except JWTError:
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    subject = payload.get("sub") or "anonymous"
+    if isinstance(payload.get("exp"), (int, float)):
+        token_cache.put(token, subject, payload["exp"])
+    return subject
 
 
 def issue_csrf_token() -> str:
@@ -95,6 +296,9 @@ def issue_csrf_token() -> str:
 
 
 def validate_csrf(request: Request, submitted_token: str | None) -> None:
+    if getattr(request.state, "api_key", None) is not None:
+        # Authenticated by an API key header, which no browser sends by itself
+        return
     cookie_token = request.cookies.get("csrf_token")
     if not cookie_token or not submitted_token or cookie_token != submitted_token:
         raise HTTPException(
@@ -0,0 +1,110 @@
+"""
+Suggest Argon2 parameters for a target password verify time on this machine.
+
+    wol-service-calibrate --target-ms 250
+    python -m wol_service.calibrate --target-ms 250 --parallelism 2
+
+Prints the measured verify time for each memory cost it tries and the
+WOL_ARGON2_* settings that come closest to the target without exceeding it.
+"""
+
+import argparse
+import os
+import time
+from collections.abc import Sequence
+from typing import NamedTuple
+
+from argon2 import PasswordHasher
+
+from wol_service.env import ARGON2_MEMORY_COST, ARGON2_PARALLELISM, ARGON2_TIME_COST
+
+# KiB; 19 MiB is the OWASP minimum for Argon2id, larger is harder to crack
+MEMORY_COSTS = (19456, 32768, 65536, 131072, 262144)
+MAX_TIME_COST = 32
+
+
+class Argon2Setting(NamedTuple):
+    time_cost: int
+    memory_cost: int  # KiB
+    parallelism: int
+    seconds: float  # measured verify time
+
+
+def measure(time_cost: int, memory_cost: int, parallelism: int, runs: int = 3) -> float:
+    """Best-of-``runs`` verify time, in seconds."""
+    hasher = PasswordHasher(time_cost, memory_cost, parallelism)
+    hashed = hasher.hash("calibration")
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        hasher.verify(hashed, "calibration")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(
+    target: float,
+    parallelism: int,
+    memory_costs: Sequence[int] = MEMORY_COSTS,
+    runs: int = 3,
+) -> tuple[list[Argon2Setting], Argon2Setting | None]:
+    """
+    Measure every memory cost at the time cost that best fits ``target``.
+
+    Verify time grows about linearly with the time cost, so one measurement
+    at ``time_cost=1`` gives the estimate, which is then measured again.
+    Returns all measurements and the one suggested: the largest memory cost
+    that still fits the target (memory hardness is what resists GPUs).
+    """
+    results: list[Argon2Setting] = []
+    for memory_cost in sorted(memory_costs):
+        single = measure(1, memory_cost, parallelism, runs)
+        if single > target:
+            results.append(Argon2Setting(1, memory_cost, parallelism, single))
+            break
+        time_cost = max(1, min(MAX_TIME_COST, int(target / single)))
+        seconds = measure(time_cost, memory_cost, parallelism, runs)
+        while time_cost > 1 and seconds > target:
+            time_cost -= 1
+            seconds = measure(time_cost, memory_cost, parallelism, runs)
+        results.append(Argon2Setting(time_cost, memory_cost, parallelism, seconds))
+    fitting = [r for r in results if r.seconds <= target]
+    return results, (fitting[-1] if fitting else None)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=min(ARGON2_PARALLELISM, os.cpu_count() or 1),
+        help="lanes; at most the CPUs that verify logins",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    current = measure(ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM)
+    print(
+        f"current: t={ARGON2_TIME_COST} m={ARGON2_MEMORY_COST} KiB"
+        f" p={ARGON2_PARALLELISM} -> {current * 1000:.1f} ms"
+    )
+    results, best = calibrate(
+        args.target_ms / 1000, args.parallelism, MEMORY_COSTS, args.runs
+    )
+    for r in results:
+        print(
+            f"  t={r.time_cost:<3} m={r.memory_cost:<7} KiB p={r.parallelism}"
+            f" -> {r.seconds * 1000:7.1f} ms"
+        )
+    if best is None:
+        print("No setting fits the target; lower the parallelism or raise the target.")
+        return
+    print("Suggested settings:")
+    print(f"WOL_ARGON2_TIME_COST={best.time_cost}")
+    print(f"WOL_ARGON2_MEMORY_KIB={best.memory_cost}")
+    print(f"WOL_ARGON2_PARALLELISM={best.parallelism}")
+
+
+if __name__ == "__main__":
+    main()
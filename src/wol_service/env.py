@@ -14,9 +14,55 @@ COOKIE_SECURE = os.getenv("COOKIE_SECURE", "false").lower() in (
     "on",
 )
 HOSTS_PATH = os.getenv("WOL_HOSTS_PATH", "hosts.json")
+HOSTS_BACKEND = os.getenv("WOL_HOSTS_BACKEND", "json").lower()
+WRITE_BATCH_WINDOW = int(os.getenv("WOL_WRITE_BATCH_WINDOW_MS", "5")) / 1000
+JOURNAL_COMPACT_BYTES = int(os.getenv("WOL_JOURNAL_COMPACT_BYTES", str(1024 * 1024)))
+WAKE_REPEAT = max(1, int(os.getenv("WOL_WAKE_REPEAT", "1")))
+WAKE_INTERVAL = int(os.getenv("WOL_WAKE_INTERVAL_MS", "100")) / 1000
+WAKE_BROADCASTS = tuple(
+    b.strip() for b in os.getenv("WOL_WAKE_BROADCASTS", "").split(",") if b.strip()
+)
+WAKE_COALESCE_WINDOW = int(os.getenv("WOL_WAKE_COALESCE_MS", "2000")) / 1000
+WAKE_MAC_RATE = float(os.getenv("WOL_WAKE_MAC_RATE", "0.2"))
+WAKE_MAC_BURST = int(os.getenv("WOL_WAKE_MAC_BURST", "5"))
+WAKE_MAX_PPS = int(os.getenv("WOL_WAKE_MAX_PPS", "1000"))
+GROUP_WAKE_CONCURRENCY = int(os.getenv("WOL_GROUP_WAKE_CONCURRENCY", "4"))
+GROUP_WAKE_STAGGER = int(os.getenv("WOL_GROUP_WAKE_STAGGER_MS", "1000")) / 1000
+VERIFY_PORTS = tuple(
+    int(p) for p in os.getenv("WOL_VERIFY_PORTS", "22,3389,445,80").split(",") if p
+)
+VERIFY_TIMEOUT = int(os.getenv("WOL_VERIFY_TIMEOUT_S", "120"))
+VERIFY_RESEND = int(os.getenv("WOL_VERIFY_RESEND_S", "5"))
+PROBE_TIMEOUT = int(os.getenv("WOL_PROBE_TIMEOUT_MS", "1000")) / 1000
+PROBE_CONCURRENCY = int(os.getenv("WOL_PROBE_CONCURRENCY", "64"))
+MONITOR_INTERVAL = int(os.getenv("WOL_MONITOR_INTERVAL_S", "30"))
+MONITOR_CONCURRENCY = int(os.getenv("WOL_MONITOR_CONCURRENCY", "32"))
+JOB_WORKERS = int(os.getenv("WOL_JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("WOL_JOB_QUEUE_SIZE", "256"))
+JOB_HISTORY = int(os.getenv("WOL_JOB_HISTORY", "1024"))
+EVENTS_QUEUE_SIZE = int(os.getenv("WOL_EVENTS_QUEUE_SIZE", "1024"))
+SCHEDULES_PATH = os.getenv(
+    "WOL_SCHEDULES_PATH", os.path.join(os.path.dirname(HOSTS_PATH), "schedules.json")
+)
+API_KEYS_PATH = os.getenv(
+    "WOL_API_KEYS_PATH", os.path.join(os.path.dirname(HOSTS_PATH), "api_keys.json")
+)
+SCHEDULE_MISFIRE_GRACE = int(os.getenv("WOL_SCHEDULE_MISFIRE_GRACE_S", "3600"))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 TOKEN_ISSUER = os.getenv("TOKEN_ISSUER", "wol-service")
 TOKEN_AUDIENCE = os.getenv("TOKEN_AUDIENCE", "wol-service-users")
+TOKEN_CACHE_SIZE = int(os.getenv("WOL_TOKEN_CACHE_SIZE", "1024"))
+PASSWORD_VERIFY_WORKERS = int(
+    os.getenv("WOL_PASSWORD_VERIFY_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+PASSWORD_VERIFY_QUEUE = int(os.getenv("WOL_PASSWORD_VERIFY_QUEUE", "16"))
+ARGON2_TIME_COST = int(os.getenv("WOL_ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("WOL_ARGON2_MEMORY_KIB", "65536"))
+ARGON2_PARALLELISM = int(os.getenv("WOL_ARGON2_PARALLELISM", "4"))
+LOGIN_MAX_FAILURES = int(os.getenv("WOL_LOGIN_MAX_FAILURES", "5"))
+LOGIN_WINDOW = int(os.getenv("WOL_LOGIN_WINDOW_S", "300"))
+LOGIN_LOCKOUT = int(os.getenv("WOL_LOGIN_LOCKOUT_S", "30"))
+LOGIN_MAX_LOCKOUT = int(os.getenv("WOL_LOGIN_MAX_LOCKOUT_S", "3600"))
 SECRET_KEY = str(os.getenv("SECRET_KEY"))
 
 _samesite_str = os.getenv("COOKIE_SAMESITE", "lax").lower()
@@ -27,3 +73,10 @@ if _samesite_str not in ("lax", "strict", "none"):
     )
     _samesite_str = "lax"
 COOKIE_SAMESITE: Literal["lax", "strict", "none"] = _samesite_str  # type: ignore
+
+if HOSTS_BACKEND not in ("json", "sqlite", "journal"):
+    logger.warning(
+        "Invalid WOL_HOSTS_BACKEND value '%s', defaulting to 'json'. Must be one of: json, sqlite, journal.",
+        HOSTS_BACKEND,
+    )
+    HOSTS_BACKEND = "json"
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import threading
+from collections.abc import AsyncIterator, Callable
+
+from wol_service.env import EVENTS_QUEUE_SIZE
+from wol_service.models import HostMutation
+from wol_service.probe import format_sse
+from wol_service.ratelimit import wake_limiter
+from wol_service.registry import registry
+from wol_service.validators import normalize_mac_address
+
+logger = logging.getLogger("wol_service")
+
+KEEPALIVE_INTERVAL = 15.0  # seconds between comments on an idle stream
+
+# Queued in place of dropped events when a subscriber falls behind
+_RESYNC: tuple[str, dict] = ("resync", {})
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.loop = loop
+        self.queue: asyncio.Queue[tuple[str, dict]] = asyncio.Queue(maxsize)
+
+    def push(self, item: tuple[str, dict]) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and have it start over
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC)
+
+
+class EventHub:
+    """
+    In-process publish/subscribe for server-push updates.
+
+    publish() may be called from any thread; each subscriber gets events on
+    its own event loop through a bounded queue. A subscriber that lets its
+    queue fill up loses the backlog and receives one ``resync`` event
+    instead, after which it should reload its state.
+    """
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: set[_Subscriber] = set()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.push, (event, data))
+            except RuntimeError:
+                # Its event loop is gone
+                self.unsubscribe(subscriber)
+
+    def subscribe(self) -> _Subscriber:
+        """Start queueing events for the calling event loop."""
+        subscriber = _Subscriber(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+
+hub = EventHub()
+
+
+def publish_wake(mac: str, status: str) -> None:
+    """Announce a wake outcome: sent, coalesced, failed or rate_limited."""
+    key = normalize_mac_address(mac)
+    mac = ":".join(key[i : i + 2] for i in range(0, 12, 2))
+    hub.publish("wake", {"mac": mac, "status": status})
+
+
+def _publish_host_changes(changes: list[HostMutation]) -> None:
+    hub.publish("hosts", {"changes": changes})
+
+
+registry.add_listener(_publish_host_changes)
+wake_limiter.add_listener(publish_wake)
+
+
+async def event_stream(
+    snapshot: Callable[[], tuple[str, dict]],
+    keepalive: float = KEEPALIVE_INTERVAL,
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for one client: a snapshot, then live updates.
+
+    The snapshot is taken after subscribing, so no update between the two
+    is lost; a ``resync`` is answered with a fresh snapshot.
+    """
+    subscriber = hub.subscribe()
+    try:
+        yield format_sse(*snapshot())
+        while True:
+            try:
+                event, data = await asyncio.wait_for(subscriber.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if (event, data) == _RESYNC:
+                yield format_sse(*snapshot())
+            else:
+                yield format_sse(event, data)
+    finally:
+        hub.unsubscribe(subscriber)
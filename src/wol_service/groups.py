@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import secrets
+from collections.abc import AsyncIterator, Sequence
+
+from wol_service.models import PreparedHost
+from wol_service.probe import format_sse, probe_address, wake_and_verify
+from wol_service.ratelimit import wake_limiter
+from wol_service.registry import registry
+from wol_service.wol import SendPolicy, wake_engine
+
+logger = logging.getLogger("wol_service")
+
+# Group wakes in progress, by run id, so they can be cancelled
+_runs: dict[str, "GroupWake"] = {}
+
+
+class GroupWake:
+    """
+    Wakes the hosts of one group a few at a time.
+
+    Hosts start in order, at least ``stagger`` seconds apart, with at most
+    ``concurrency`` of them in progress at once. A host is in progress until
+    its packet is sent or, when ``verify_ports`` is given, until it answers
+    a probe or times out. Progress is queued as events for the client;
+    cancel() stops the run, including hosts that are still being verified.
+    """
+
+    def __init__(
+        self,
+        tag: str,
+        targets: Sequence[tuple[str, PreparedHost]],
+        concurrency: int,
+        stagger: float,
+        policy: SendPolicy,
+        verify_ports: Sequence[int] | None = None,
+    ):
+        self.id = secrets.token_hex(8)
+        self.tag = tag
+        self.targets = list(targets)
+        self.concurrency = concurrency
+        self.stagger = stagger
+        self.policy = policy
+        self.verify_ports = verify_ports
+        self.counts = {"sent": 0, "coalesced": 0, "failed": 0, "up": 0, "timeout": 0}
+        self.started = 0
+        self._events: asyncio.Queue[dict | None] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def _emit(self, event: str, **data) -> None:
+        self._events.put_nowait({"event": event, **data})
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        _runs[self.id] = self
+
+    def cancel(self) -> bool:
+        if self._task is None or self._task.done():
+            return False
+        return self._task.cancel()
+
+    async def events(self) -> AsyncIterator[dict]:
+        while True:
+            event = await self._events.get()
+            if event is None:
+                return
+            yield event
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: list[asyncio.Task] = []
+        self._emit("started", run=self.id, group=self.tag, hosts=len(self.targets))
+        try:
+            next_start = loop.time()
+            for name, prepared in self.targets:
+                await slots.acquire()
+                await asyncio.sleep(max(0.0, next_start - loop.time()))
+                next_start = loop.time() + self.stagger
+                task = loop.create_task(self._wake_one(name, prepared))
+                task.add_done_callback(lambda _: slots.release())
+                tasks.append(task)
+                self.started += 1
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            skipped = len(self.targets) - self.started
+            self._emit("cancelled", skipped=skipped, **self.counts)
+        except Exception as e:
+            logger.exception("Group wake %s failed", self.id)
+            self._emit("error", error=str(e), **self.counts)
+        else:
+            self._emit("done", **self.counts)
+        finally:
+            _runs.pop(self.id, None)
+            self._events.put_nowait(None)
+
+    async def _wake_one(self, name: str, prepared: PreparedHost) -> None:
+        async def send() -> None:
+            await wake_engine.send_prepared(prepared, self.policy)
+
+        self._emit("host", host=name, status="waking")
+        try:
+            coalesced = await wake_limiter.wake(
+                prepared.mac.hex(), send, self.policy.packet_count(prepared.address)
+            )
+        except Exception as e:
+            self.counts["failed"] += 1
+            self._emit("host", host=name, status="failed", error=str(e))
+            return
+        status = "coalesced" if coalesced else "sent"
+        self.counts[status] += 1
+        self._emit("host", host=name, status=status)
+        if self.verify_ports is None:
+            return
+        try:
+            ip = probe_address(registry.probe_ip(name), prepared.address[0])
+        except ValueError as e:
+            self._emit("host", host=name, status="unverified", error=str(e))
+            return
+        async for event in wake_and_verify(
+            send, ip, self.verify_ports, already_sent=True
+        ):
+            if event["event"] in ("up", "timeout"):
+                self.counts[event["event"]] += 1
+                self._emit(
+                    "host", host=name, status=event["event"], elapsed=event["elapsed"]
+                )
+
+
+def get_run(run_id: str) -> GroupWake | None:
+    return _runs.get(run_id)
+
+
+async def group_wake_stream(run: GroupWake) -> AsyncIterator[str]:
+    """Server-Sent Events for a run; the run stops if the client goes away."""
+    try:
+        async for event in run.events():
+            yield format_sse(event.pop("event"), event)
+    finally:
+        run.cancel()
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from typing import NamedTuple
+
+from wol_service.env import JOB_HISTORY, JOB_QUEUE_SIZE, JOB_WORKERS
+from wol_service.models import PreparedHost
+from wol_service.probe import wake_and_verify
+from wol_service.ratelimit import RateLimitedError, wake_limiter
+from wol_service.wol import SendPolicy, wake_engine
+
+logger = logging.getLogger("wol_service")
+
+
+class JobQueueFullError(Exception):
+    def __init__(self):
+        super().__init__("Too many wake jobs queued; try again later")
+
+
+class JobTarget(NamedTuple):
+    prepared: PreparedHost
+    result: dict  # reported as-is; updated while the job runs
+    probe_ip: str | None = None  # probed after the wake when the job verifies
+
+
+class WakeJob:
+    """
+    One queued wake request: any number of targets, one send policy.
+
+    ``results`` holds one entry per requested target, including targets
+    that were rejected before queueing; only ``targets`` are woken. With
+    ``verify_ports`` every target that has a probe address is then probed
+    until it answers or times out. Timings are seconds since the job started.
+    A target's ``ok`` is None until the job sends to it or gives up on it.
+    """
+
+    def __init__(
+        self,
+        results: list[dict],
+        targets: Sequence[JobTarget],
+        policy: SendPolicy,
+        verify_ports: Sequence[int] | None = None,
+    ):
+        self.id = secrets.token_hex(8)
+        self.results = results
+        self.targets = list(targets)
+        self.policy = policy
+        self.verify_ports = verify_ports
+        self.state = "queued"
+        self.error: str | None = None
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    def to_dict(self) -> dict:
+        job = {
+            "id": self.id,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "results": [dict(r) for r in self.results],
+        }
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self.state = "running"
+        self.started = time.time()
+
+        def elapsed() -> float:
+            return round(loop.time() - start, 3)
+
+        async def send(admitted: list[int]) -> None:
+            prepared = [self.targets[i].prepared for i in admitted]
+            await wake_engine.send_packets(
+                [(p.packet, p.address) for p in prepared], self.policy
+            )
+
+        try:
+            statuses = await wake_limiter.wake_many(
+                [t.prepared.mac.hex() for t in self.targets],
+                send,
+                [self.policy.packet_count(t.prepared.address) for t in self.targets],
+            )
+            verify: list[JobTarget] = []
+            for target, status in zip(self.targets, statuses):
+                if isinstance(status, RateLimitedError):
+                    target.result.update(
+                        ok=False,
+                        status="rate_limited",
+                        error=str(status),
+                        retry_after=status.retry_after,
+                    )
+                    continue
+                sent = "sent" if status is None else "coalesced"
+                target.result.update(ok=True, status=sent, elapsed=elapsed())
+                if self.verify_ports is None:
+                    continue
+                if target.probe_ip is None:
+                    # e.g. woken via the limited broadcast address
+                    target.result["status"] = "unverified"
+                else:
+                    verify.append(target)
+            await asyncio.gather(*(self._verify(t, elapsed) for t in verify))
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            for target in self.targets:
+                if target.result.get("ok") is None:
+                    target.result["ok"] = False
+            raise
+        except Exception as e:
+            logger.exception("Wake job %s failed", self.id)
+            self.state = "failed"
+            self.error = str(e)
+            for target in self.targets:
+                target.result["ok"] = False
+        else:
+            self.state = "done"
+        finally:
+            self.finished = time.time()
+
+    async def _verify(self, target: JobTarget, elapsed: Callable[[], float]) -> None:
+        async def send() -> None:
+            await wake_engine.send_prepared(target.prepared, self.policy)
+
+        assert target.probe_ip is not None and self.verify_ports is not None
+        target.result["status"] = "verifying"
+        async for event in wake_and_verify(
+            send, target.probe_ip, self.verify_ports, already_sent=True
+        ):
+            if event["event"] == "sent":
+                target.result["attempts"] = event["attempt"]
+            elif event["event"] in ("up", "timeout"):
+                target.result.update(
+                    status=event["event"],
+                    attempts=event["attempts"],
+                    elapsed=elapsed(),
+                )
+                if "port" in event:
+                    target.result["open_port"] = event["port"]
+
+
+class JobQueue:
+    """
+    Bounded in-process queue of wake jobs, run by a fixed pool of workers.
+
+    At most ``size`` jobs wait at once; submit() raises JobQueueFullError
+    beyond that instead of starting more work. Finished jobs are kept for
+    get() in an LRU of ``history`` entries. Workers start in the app
+    lifespan, or lazily with the first job.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        size: int = JOB_QUEUE_SIZE,
+        history: int = JOB_HISTORY,
+    ):
+        self.workers = max(1, workers)
+        self.size = size
+        self.history = history
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[WakeJob] = asyncio.Queue(size)
+        self._tasks: list[asyncio.Task] = []
+        self._active: dict[str, WakeJob] = {}
+        self._finished: OrderedDict[str, WakeJob] = OrderedDict()
+
+    def _bind_loop(self) -> asyncio.Queue[WakeJob]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # asyncio primitives belong to one loop; start fresh on a new one
+            self._loop = loop
+            self._queue = asyncio.Queue(self.size)
+            self._active = {}
+            self._tasks = [
+                loop.create_task(self._work(self._queue)) for _ in range(self.workers)
+            ]
+        return self._queue
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self) -> None:
+        self._bind_loop()
+
+    async def close(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            job.state = "cancelled"
+            self._finish(job)
+        self._loop = None
+
+    def submit(self, job: WakeJob) -> WakeJob:
+        queue = self._bind_loop()
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError() from None
+        self._active[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> WakeJob | None:
+        job = self._active.get(job_id)
+        if job is None:
+            job = self._finished.get(job_id)
+            if job is not None:
+                self._finished.move_to_end(job_id)
+        return job
+
+    def _finish(self, job: WakeJob) -> None:
+        self._active.pop(job.id, None)
+        self._finished[job.id] = job
+        while len(self._finished) > self.history:
+            self._finished.popitem(last=False)
+
+    async def _work(self, queue: asyncio.Queue[WakeJob]) -> None:
+        while True:
+            job = await queue.get()
+            try:
+                await job.run()
+            finally:
+                self._finish(job)
+                queue.task_done()
+
+    async def join(self) -> None:
+        """Wait until every job submitted so far has finished."""
+        await self._bind_loop().join()
+
+
+jobs = JobQueue()
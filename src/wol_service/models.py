@@ -1,13 +1,54 @@
-from typing import TypedDict
+from typing import NamedTuple, TypedDict
 
 
-class Host(TypedDict):
+class _HostRequired(TypedDict):
     name: str  # "Gaming PC"
     mac: str  # "AA:BB:CC:DD:EE:FF"
     ip: str  # "192.168.1.23" (or broadcast like "192.168.1.255")
     port: int  # usually 9
 
 
+class Host(_HostRequired, total=False):
+    tags: list[str]  # ["lab", "gpu"]; omitted when the host has none
+    probe_ip: str  # unicast address checked for liveness; omitted when unset
+
+
+class PreparedHost(NamedTuple):
+    mac: bytes  # canonical 6-byte MAC
+    packet: bytes | memoryview  # prebuilt 102-byte magic packet
+    address: tuple[str, int]  # (ip, port) the packet is sent to
+
+
+class HostStatus(NamedTuple):
+    up: bool | None  # None: no unicast address to probe, so unknown
+    checked: float  # Unix time of the probe
+    port: int | None  # first port that answered
+
+
+class HostMutation(TypedDict, total=False):
+    op: str  # "add" or "delete"
+    host: Host  # set for "add"
+    name: str  # set for "delete"
+
+
+class Schedule(TypedDict):
+    id: str
+    host: str  # name of the saved host to wake
+    cron: str | None  # "30 6 * * 1-5", or None for a one-shot job
+    at: float | None  # Unix time of a one-shot job
+    enabled: bool
+    created: float  # Unix time; cron runs are counted from here
+    last_run: float | None  # Unix time of the latest run
+
+
 class User(TypedDict):
     username: str
     hashed_password: str
+
+
+class ApiKey(TypedDict):
+    id: str
+    name: str
+    scopes: list[str]  # any of "read", "wake", "write"
+    created: float  # Unix time
+    digest: str  # hex HMAC-SHA256 of the key; the key itself is never stored
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from collections.abc import Sequence
+
+from wol_service.env import (
+    MONITOR_CONCURRENCY,
+    MONITOR_INTERVAL,
+    VERIFY_PORTS,
+)
+from wol_service.events import hub
+from wol_service.models import Host, HostStatus
+from wol_service.probe import Prober, probe_address
+from wol_service.registry import HostRegistry, registry
+
+logger = logging.getLogger("wol_service")
+
+
+class LivenessMonitor:
+    """
+    Probes every saved host on an interval and caches the outcome.
+
+    One background task runs a probe cycle every ``interval`` seconds, with
+    at most ``concurrency`` connects in flight. Readers only look up the
+    cached table, so any number of dashboards costs a single probe cycle.
+    A host is probed at its ``probe_ip`` if it has one, else at its wake
+    address. Hosts woken via a broadcast address and saved without a probe
+    address cannot be probed; their status is unknown (``up`` is None).
+    """
+
+    def __init__(
+        self,
+        hosts: HostRegistry,
+        interval: float = MONITOR_INTERVAL,
+        ports: Sequence[int] = VERIFY_PORTS,
+        concurrency: int = MONITOR_CONCURRENCY,
+    ):
+        self.hosts = hosts
+        self.interval = interval
+        self.ports = tuple(ports)
+        self.prober = Prober(limit=concurrency)
+        self.version = 0  # bumped when a host goes up or down
+        self.content_version = 0  # bumped whenever the table is replaced
+        self._status: dict[str, HostStatus] = {}
+        self._task: asyncio.Task | None = None
+
+    def status(self, name: str) -> HostStatus | None:
+        return self._status.get(name)
+
+    def snapshot(self) -> dict[str, HostStatus]:
+        return dict(self._status)
+
+    def status_dict(self, name: str) -> dict | None:
+        status = self._status.get(name)
+        return status._asdict() if status is not None else None
+
+    async def _check(self, host: Host) -> tuple[str, HostStatus]:
+        try:
+            ip = probe_address(host.get("probe_ip"), host["ip"])
+        except ValueError:
+            return host["name"], HostStatus(None, time.time(), None)
+        port = await self.prober.first_open(ip, self.ports)
+        return host["name"], HostStatus(port is not None, time.time(), port)
+
+    async def run_once(self) -> None:
+        """Probe every host once and replace the table."""
+        results = await asyncio.gather(*(self._check(h) for h in self.hosts.hosts()))
+        status = dict(results)
+        changed = {
+            name
+            for name in status.keys() | self._status.keys()
+            if name not in status
+            or name not in self._status
+            or status[name].up != self._status[name].up
+        }
+        self._status = status
+        # Probe times and ports change every cycle even when no host flips
+        self.content_version += 1
+        if changed:
+            self.version += 1
+            logger.debug("Liveness changed for %d host(s)", len(changed))
+            hub.publish(
+                "status", {"changes": {n: self.status_dict(n) for n in changed}}
+            )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Liveness probe cycle failed")
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self.interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done():
+            if self._task.get_loop() is loop:
+                return
+        self._task = loop.create_task(self._run())
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+monitor = LivenessMonitor(registry)
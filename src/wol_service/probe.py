@@ -0,0 +1,153 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+
+from wol_service.env import (
+    PROBE_CONCURRENCY,
+    PROBE_TIMEOUT,
+    VERIFY_PORTS,
+    VERIFY_RESEND,
+    VERIFY_TIMEOUT,
+)
+from wol_service.validators import validate_ip_address, validate_port
+
+PROBE_INTERVAL = 1.0  # seconds between probe rounds
+
+
+def parse_ports(text: str | None) -> tuple[int, ...]:
+    """Comma-separated TCP ports; empty means the configured defaults."""
+    if not text or not text.strip():
+        return VERIFY_PORTS
+    try:
+        ports = tuple(int(p) for p in text.split(",") if p.strip())
+    except ValueError:
+        raise ValueError("Probe ports must be integers") from None
+    if not ports or not all(validate_port(p) for p in ports):
+        raise ValueError("Invalid probe port")
+    return ports
+
+
+def probe_address(probe_ip: str | None, target_ip: str) -> str:
+    """
+    The address to probe: explicit, else the wake target if it is unicast.
+
+    A target ending in .255 is taken to be a directed broadcast such as
+    192.168.1.255; nothing answers a TCP connect there, so it needs an
+    explicit probe address just like 255.255.255.255. An explicit address
+    is trusted: in a /23 or larger network 10.0.1.255 is an ordinary host.
+    """
+    if probe_ip and probe_ip.strip():
+        ip = probe_ip.strip()
+        if not validate_ip_address(ip) or ip == "255.255.255.255":
+            raise ValueError("Invalid probe address")
+        return ip
+    ip = target_ip.strip()
+    if not validate_ip_address(ip):
+        raise ValueError("Invalid probe address")
+    if ip.endswith(".255"):
+        raise ValueError("probe_ip is required when waking via broadcast")
+    return ip
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Prober:
+    """
+    TCP reachability checks with a process-wide cap on open connects.
+
+    A host counts as up once any of the given ports accepts a connection;
+    a refused or timed-out connect means not (yet) up.
+    """
+
+    def __init__(self, limit: int = PROBE_CONCURRENCY, timeout: float = PROBE_TIMEOUT):
+        self.limit = limit
+        self.timeout = timeout
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._slots = asyncio.Semaphore(limit)
+
+    def _bind_loop(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # asyncio primitives belong to one loop; start fresh on a new one
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.limit)
+        return self._slots
+
+    async def is_open(self, ip: str, port: int, timeout: float | None = None) -> bool:
+        async with self._bind_loop():
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(ip, port), timeout or self.timeout
+                )
+            except (OSError, asyncio.TimeoutError):
+                return False
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return True
+
+    async def first_open(
+        self, ip: str, ports: Sequence[int], timeout: float | None = None
+    ) -> int | None:
+        results = await asyncio.gather(*(self.is_open(ip, p, timeout) for p in ports))
+        return next((p for p, ok in zip(ports, results) if ok), None)
+
+
+prober = Prober()
+
+
+async def wake_and_verify(
+    send: Callable[[], Awaitable[None]],
+    ip: str,
+    ports: Sequence[int] = VERIFY_PORTS,
+    timeout: float = VERIFY_TIMEOUT,
+    resend_after: float = VERIFY_RESEND,
+    interval: float = PROBE_INTERVAL,
+    already_sent: bool = False,
+) -> AsyncIterator[dict]:
+    """
+    Send a magic packet, then probe ``ip`` until it answers or ``timeout``.
+
+    Yields progress events: ``sent`` for every (re)send, ``waiting`` after
+    each failed probe round, and finally ``up`` or ``timeout``. The packet is
+    re-sent after ``resend_after`` seconds, doubling the gap each time.
+    With ``already_sent`` the caller has sent the first packet itself.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = start + timeout
+    attempt = 1
+    if not already_sent:
+        await send()
+    yield {"event": "sent", "attempt": attempt, "elapsed": 0.0}
+    backoff = resend_after
+    next_send = start + backoff
+    while True:
+        probe_timeout = max(0.05, min(prober.timeout, deadline - loop.time()))
+        port = await prober.first_open(ip, ports, probe_timeout)
+        now = loop.time()
+        elapsed = round(now - start, 3)
+        if port is not None:
+            yield {"event": "up", "port": port, "attempts": attempt, "elapsed": elapsed}
+            return
+        if now >= deadline:
+            yield {"event": "timeout", "attempts": attempt, "elapsed": elapsed}
+            return
+        yield {"event": "waiting", "elapsed": elapsed}
+        if now >= next_send:
+            await send()
+            attempt += 1
+            yield {"event": "sent", "attempt": attempt, "elapsed": elapsed}
+            backoff *= 2
+            next_send = now + backoff
+        await asyncio.sleep(min(interval, max(0.0, deadline - now)))
+
+
+async def verify_stream(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Render wake_and_verify() events as Server-Sent Events."""
+    async for event in events:
+        yield format_sse(event.pop("event"), event)
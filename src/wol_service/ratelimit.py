@@ -0,0 +1,236 @@
+import asyncio
+import math
+import time
+from collections.abc import Awaitable, Callable, Sequence
+
+from wol_service.env import (
+    WAKE_COALESCE_WINDOW,
+    WAKE_MAC_BURST,
+    WAKE_MAC_RATE,
+    WAKE_MAX_PPS,
+)
+from wol_service.validators import normalize_mac_address
+
+# Idle buckets and expired results are swept once this many are tracked
+_SWEEP_THRESHOLD = 4096
+
+
+class RateLimitedError(Exception):
+    def __init__(
+        self,
+        retry_after: float,
+        message: str = "Too many wake requests; try again later",
+    ):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Classic token bucket: ``capacity`` tokens, refilled at ``rate``/s."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n: float, now: float) -> float:
+        """Seconds until ``n`` tokens are available; 0 if they are now."""
+        self.refill(now)
+        if self.tokens >= n:
+            return 0.0
+        if n > self.capacity:
+            # Never fits in one go; admit it once the bucket is full
+            n = self.capacity
+        return (n - self.tokens) / self.rate
+
+    def consume(self, n: float) -> None:
+        self.tokens -= n
+
+
+class WakeLimiter:
+    """
+    Throttles wake requests per MAC and packets sent overall.
+
+    A wake for a MAC that is in flight, or finished less than ``window``
+    seconds ago, is coalesced into it instead of sending again. Otherwise it
+    needs a token from the MAC's bucket (``mac_burst`` deep, refilled at
+    ``mac_rate``/s) and enough tokens in the global bucket for every packet
+    it sends (``max_pps``/s, one second of burst). A rate or ``max_pps`` of
+    0 disables that limit.
+    """
+
+    def __init__(
+        self,
+        window: float = WAKE_COALESCE_WINDOW,
+        mac_rate: float = WAKE_MAC_RATE,
+        mac_burst: int = WAKE_MAC_BURST,
+        max_pps: int = WAKE_MAX_PPS,
+    ):
+        self.window = window
+        self.mac_rate = mac_rate
+        self.mac_burst = mac_burst
+        self.max_pps = max_pps
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._listeners: list[Callable[[str, str], None]] = []
+        self.reset()
+
+    def add_listener(self, listener: Callable[[str, str], None]) -> None:
+        """
+        Call ``listener(mac, outcome)`` for every wake request, where the
+        outcome is sent, coalesced, failed or rate_limited.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, keys: Sequence[str], outcome: str) -> None:
+        for listener in self._listeners:
+            for key in keys:
+                listener(key, outcome)
+
+    def reset(self) -> None:
+        self._buckets: dict[str, TokenBucket] = {}
+        self._recent: dict[str, tuple[float, asyncio.Future]] = {}
+        self._global = TokenBucket(self.max_pps, self.max_pps, time.monotonic())
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # asyncio primitives belong to one loop; start fresh on a new one
+            self._loop = loop
+            self._recent = {}
+        return loop
+
+    def _sweep(self, now: float) -> None:
+        if len(self._recent) > _SWEEP_THRESHOLD:
+            self._recent = {
+                k: (at, f)
+                for k, (at, f) in self._recent.items()
+                if not f.done() or now - at < self.window
+            }
+        if len(self._buckets) > _SWEEP_THRESHOLD:
+            for key, bucket in list(self._buckets.items()):
+                bucket.refill(now)
+                if bucket.tokens >= bucket.capacity:
+                    del self._buckets[key]
+
+    def _coalesced(self, key: str, now: float) -> asyncio.Future | None:
+        recent = self._recent.get(key)
+        if recent is None:
+            return None
+        at, future = recent
+        if not future.done() or now - at < self.window:
+            return future
+        return None
+
+    def _admit(self, key: str, packets: int, now: float) -> None:
+        """Take the MAC's and the global tokens, or raise RateLimitedError."""
+        bucket = None
+        wait = 0.0
+        if self.mac_rate > 0:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.mac_rate, self.mac_burst, now)
+                self._buckets[key] = bucket
+            wait = bucket.wait_time(1, now)
+        if self.max_pps > 0:
+            wait = max(wait, self._global.wait_time(packets, now))
+        if wait > 0:
+            raise RateLimitedError(wait)
+        if bucket is not None:
+            bucket.consume(1)
+        if self.max_pps > 0:
+            self._global.consume(packets)
+
+    async def wake(
+        self, mac: str, send: Callable[[], Awaitable[None]], packets: int = 1
+    ) -> bool:
+        """
+        Run ``send`` for ``mac`` unless throttled.
+
+        Returns True if the request was coalesced into a recent or in-flight
+        wake (whose outcome it shares) and False if ``send`` ran.
+        """
+        status = await self.wake_many([mac], lambda _: send(), [packets])
+        if isinstance(status[0], asyncio.Future):
+            await asyncio.shield(status[0])
+            return True
+        if isinstance(status[0], Exception):
+            raise status[0]
+        return False
+
+    async def wake_many(
+        self,
+        macs: Sequence[str],
+        send: Callable[[list[int]], Awaitable[None]],
+        packets: Sequence[int],
+    ) -> list:
+        """
+        Admit a batch of wakes and send the admitted ones with one call.
+
+        ``packets`` is how many datagrams each wake sends; ``send`` receives
+        the indexes of the admitted MACs. Returns one entry per MAC: None if
+        it was sent, the future of the wake it was coalesced into, or the
+        RateLimitedError that rejected it.
+        """
+        loop = self._bind_loop()
+        now = time.monotonic()
+        self._sweep(now)
+        statuses: list = []
+        admitted: list[int] = []
+        keys: list[str] = []
+        future = loop.create_future()
+        for i, mac in enumerate(macs):
+            key = normalize_mac_address(mac)
+            keys.append(key)
+            coalesced = self._coalesced(key, now)
+            if coalesced is not None:
+                statuses.append(coalesced)
+                continue
+            try:
+                self._admit(key, packets[i], now)
+            except RateLimitedError as e:
+                statuses.append(e)
+                continue
+            self._recent[key] = (now, future)
+            statuses.append(None)
+            admitted.append(i)
+        if self._listeners:
+            for key, status in zip(keys, statuses):
+                if status is not None:
+                    outcome = (
+                        "rate_limited"
+                        if isinstance(status, RateLimitedError)
+                        else "coalesced"
+                    )
+                    self._notify([key], outcome)
+        if not admitted:
+            future.cancel()
+            return statuses
+        try:
+            await send(admitted)
+        except BaseException as e:
+            for i in admitted:
+                self._recent.pop(keys[i], None)
+            if not isinstance(e, Exception):
+                # Cancelled sender; coalesced waiters still get an error
+                e = RuntimeError("Wake was interrupted")
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't log it twice
+            self._notify([keys[i] for i in admitted], "failed")
+            raise
+        future.set_result(None)
+        self._notify([keys[i] for i in admitted], "sent")
+        return statuses
+
+
+wake_limiter = WakeLimiter()
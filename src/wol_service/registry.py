@@ -0,0 +1,390 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from collections.abc import Callable, Hashable
+
+from wol_service.env import HOSTS_BACKEND, HOSTS_PATH, WRITE_BATCH_WINDOW
+from wol_service.models import Host, HostMutation, PreparedHost
+from wol_service.storage import (
+    HostConflictError,
+    HostNotFoundError,
+    HostStorage,
+    open_storage,
+)
+from wol_service.utils import file_lock
+from wol_service.validators import normalize_mac_address
+from wol_service.wol import prepare_host, prepare_hosts
+
+logger = logging.getLogger("wol_service")
+
+
+def _prepare(host: Host) -> PreparedHost | None:
+    try:
+        return prepare_host(host)
+    except (TypeError, ValueError):
+        # Only possible for hand-edited files; the host stays listable
+        logger.warning("Saved host %r has an invalid MAC or port", host["name"])
+        return None
+
+
+def _prepare_all(hosts: list[Host]) -> dict[str, PreparedHost]:
+    try:
+        # Every packet in one buffer; this is the common case by far
+        return {h["name"]: p for h, p in zip(hosts, prepare_hosts(hosts))}
+    except (TypeError, ValueError):
+        pass
+    prepared = {}
+    for h in hosts:
+        p = _prepare(h)
+        if p is not None:
+            prepared[h["name"]] = p
+    return prepared
+
+
+def _tag(by_tag: dict[str, dict[str, None]], host: Host) -> None:
+    for tag in host.get("tags", []):
+        by_tag.setdefault(tag, {})[host["name"]] = None
+
+
+def _untag(by_tag: dict[str, dict[str, None]], host: Host) -> None:
+    for tag in host.get("tags", []):
+        members = by_tag.get(tag)
+        if members is not None:
+            members.pop(host["name"], None)
+            if not members:
+                del by_tag[tag]
+
+
+class _Staged:
+    """Copies of the registry indexes that a commit is applied to."""
+
+    def __init__(self, registry: "HostRegistry"):
+        self.by_name = dict(registry._by_name)
+        self.by_mac = dict(registry._by_mac)
+        self.prepared = dict(registry._prepared)
+        self.by_tag = {tag: dict(names) for tag, names in registry._by_tag.items()}
+
+    def apply(self, mutation: HostMutation) -> Exception | None:
+        if mutation["op"] == "add":
+            host = mutation["host"]
+            mac = normalize_mac_address(host["mac"])
+            if host["name"] in self.by_name:
+                return HostConflictError("Host with this name already exists")
+            if mac in self.by_mac:
+                return HostConflictError("Host with this MAC already exists")
+            self.by_name[host["name"]] = host
+            self.by_mac[mac] = host["name"]
+            prepared = _prepare(host)
+            if prepared is not None:
+                self.prepared[host["name"]] = prepared
+            _tag(self.by_tag, host)
+            return None
+        removed = self.by_name.pop(mutation["name"], None)
+        if removed is None:
+            return HostNotFoundError("Host not found")
+        self.by_mac.pop(normalize_mac_address(removed["mac"]), None)
+        _untag(self.by_tag, removed)
+        self.prepared.pop(mutation["name"], None)
+        return None
+
+
+def _diff(old: dict[str, Host], new: dict[str, Host]) -> list[HostMutation]:
+    changes: list[HostMutation] = []
+    for name, host in old.items():
+        if new.get(name) != host:
+            changes.append({"op": "delete", "name": name})
+    for name, host in new.items():
+        if old.get(name) != host:
+            changes.append({"op": "add", "host": host})
+    return changes
+
+
+class HostRegistry:
+    """
+    Process-wide, indexed view of the saved hosts.
+
+    Hosts are read from the storage backend once and kept in memory. Every
+    access compares the backend's change signature with the one seen at load
+    time, so edits made by another process (or by hand) are picked up without
+    re-reading the whole store on every request.
+    """
+
+    def __init__(self, storage: HostStorage):
+        self.storage = storage
+        self.version = 0
+        self._lock = threading.RLock()
+        # Serializes this process's commits; the file lock does the same
+        # across processes (and is a no-op where flock is missing)
+        self._write_lock = threading.Lock()
+        self._committing = False
+        self._loaded = False
+        self._signature: Hashable = None
+        self._by_name: dict[str, Host] = {}
+        self._by_mac: dict[str, str] = {}
+        self._prepared: dict[str, PreparedHost] = {}
+        # tag -> names of its hosts; dict keys keep insertion order
+        self._by_tag: dict[str, dict[str, None]] = {}
+        self._fingerprint = ""
+        self._fingerprint_version = -1
+        self._listeners: list[Callable[[list[HostMutation]], None]] = []
+
+    def add_listener(self, listener: Callable[[list[HostMutation]], None]) -> None:
+        """
+        Call ``listener`` with the changes of every commit or reload.
+
+        A reload after an outside edit reports its diff against the previous
+        view; a changed host shows up as a delete followed by an add.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, changes: list[HostMutation]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(changes)
+            except Exception:
+                logger.exception("Host change listener failed")
+
+    def load(self) -> None:
+        with self._lock:
+            # Read the signature first: a write racing with the load only makes
+            # the next refresh() reload again, never miss a change.
+            signature = self.storage.signature()
+            hosts = self.storage.load()
+            previous = self._by_name if self._loaded else None
+            self._by_name = {h["name"]: h for h in hosts}
+            self._by_mac = {normalize_mac_address(h["mac"]): h["name"] for h in hosts}
+            self._prepared = _prepare_all(hosts)
+            self._by_tag = {}
+            for h in hosts:
+                _tag(self._by_tag, h)
+            self._signature = signature
+            self._loaded = True
+            self.version += 1
+            if previous is not None and self._listeners:
+                changes = _diff(previous, self._by_name)
+                if changes:
+                    self._notify(changes)
+
+    def refresh(self) -> None:
+        with self._lock:
+            if self._committing:
+                # The store is changing under our own commit, which holds the
+                # file lock; keep serving the current view until it lands.
+                return
+            if not self._loaded or self.storage.signature() != self._signature:
+                self.load()
+
+    def hosts(self) -> list[Host]:
+        with self._lock:
+            self.refresh()
+            return list(self._by_name.values())
+
+    def fingerprint(self) -> str:
+        """Content hash of all hosts, recomputed only when they change."""
+        with self._lock:
+            self.refresh()
+            if self._fingerprint_version != self.version:
+                payload = json.dumps(
+                    list(self._by_name.values()), sort_keys=True, ensure_ascii=False
+                )
+                self._fingerprint = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+                self._fingerprint_version = self.version
+            return self._fingerprint
+
+    def query(
+        self,
+        name: str = "",
+        mac: str = "",
+        ip: str = "",
+        limit: int | None = None,
+        offset: int = 0,
+        tag: str = "",
+    ) -> tuple[int, list[Host]]:
+        """
+        Filter by name/MAC/IP prefix and tag; returns the match count and
+        one page.
+        """
+        mac = normalize_mac_address(mac)
+        with self._lock:
+            self.refresh()
+            candidates = (
+                [self._by_name[n] for n in self._by_tag.get(tag, {})]
+                if tag
+                else self._by_name.values()
+            )
+            matches = [
+                h
+                for h in candidates
+                if h["name"].startswith(name)
+                and h["ip"].startswith(ip)
+                and (not mac or normalize_mac_address(h["mac"]).startswith(mac))
+            ]
+        end = None if limit is None else offset + limit
+        return len(matches), matches[offset:end]
+
+    def groups(self) -> dict[str, int]:
+        """Every tag in use and how many hosts carry it."""
+        with self._lock:
+            self.refresh()
+            return {tag: len(names) for tag, names in sorted(self._by_tag.items())}
+
+    def group(self, tag: str) -> list[Host]:
+        with self._lock:
+            self.refresh()
+            return [self._by_name[n] for n in self._by_tag.get(tag, {})]
+
+    def prepared_group(self, tag: str) -> list[tuple[str, PreparedHost]]:
+        """Names and prebuilt packets of the tag's hosts that can be woken."""
+        with self._lock:
+            self.refresh()
+            return [
+                (n, self._prepared[n])
+                for n in self._by_tag.get(tag, {})
+                if n in self._prepared
+            ]
+
+    def get(self, name: str) -> Host | None:
+        with self._lock:
+            self.refresh()
+            return self._by_name.get(name)
+
+    def probe_ip(self, name: str) -> str | None:
+        """The saved host's probe address, if it has one."""
+        host = self.get(name)
+        return host.get("probe_ip") if host is not None else None
+
+    def get_by_mac(self, mac: str) -> Host | None:
+        with self._lock:
+            self.refresh()
+            name = self._by_mac.get(normalize_mac_address(mac))
+            return self._by_name.get(name) if name is not None else None
+
+    def prepared(self, name: str) -> PreparedHost | None:
+        """The saved host's canonical MAC and prebuilt magic packet."""
+        with self._lock:
+            self.refresh()
+            return self._prepared.get(name)
+
+    def prepared_by_mac(self, mac: str) -> PreparedHost | None:
+        with self._lock:
+            self.refresh()
+            name = self._by_mac.get(normalize_mac_address(mac))
+            return self._prepared.get(name) if name is not None else None
+
+    def apply(self, mutations: list[HostMutation]) -> list[Exception | None]:
+        """
+        Validate and commit a batch of mutations with a single storage write.
+
+        The batch runs under an advisory lock shared by every process using
+        the same store and starts from a refreshed view, so concurrent writers
+        never overwrite each other. It is staged on copies of the indexes and
+        the storage write runs without the registry lock, so readers keep
+        the previous view, and never wait for disk I/O, until the new indexes
+        are swapped in. Returns one entry per mutation: None if it was
+        applied, otherwise the error that caused it to be skipped.
+        """
+        with self._write_lock, file_lock(self.storage.lock_path):
+            with self._lock:
+                self.refresh()
+                staged = _Staged(self)
+                results: list[Exception | None] = []
+                accepted: list[HostMutation] = []
+                for mutation in mutations:
+                    error = staged.apply(mutation)
+                    results.append(error)
+                    if error is None:
+                        accepted.append(mutation)
+                if not accepted:
+                    return results
+                self._committing = True
+            try:
+                self.storage.apply(accepted)
+                signature = self.storage.signature()
+            except BaseException:
+                with self._lock:
+                    self._committing = False
+                raise
+            with self._lock:
+                self._by_name = staged.by_name
+                self._by_mac = staged.by_mac
+                self._prepared = staged.prepared
+                self._by_tag = staged.by_tag
+                self._signature = signature
+                self._committing = False
+                self.version += 1
+                self._notify(accepted)
+            return results
+
+    def add(self, host: Host) -> None:
+        error = self.apply([{"op": "add", "host": host}])[0]
+        if error is not None:
+            raise error
+
+    def remove(self, name: str) -> bool:
+        return self.apply([{"op": "delete", "name": name}])[0] is None
+
+
+class HostWriteCoordinator:
+    """
+    Funnels host mutations from request handlers into group commits.
+
+    Mutations submitted within ``window`` seconds of each other are applied
+    as one registry batch, so a burst of API calls costs one fsync (or one
+    SQLite transaction). Batches are serialized by an asyncio lock and run in
+    a worker thread so the event loop never blocks on disk I/O.
+    """
+
+    def __init__(self, registry: HostRegistry, window: float = WRITE_BATCH_WINDOW):
+        self.registry = registry
+        self.window = window
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = asyncio.Lock()
+        self._pending: list[tuple[HostMutation, asyncio.Future]] = []
+        self._flusher: asyncio.Task | None = None
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # asyncio primitives belong to one loop; start fresh on a new one
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._pending = []
+            self._flusher = None
+        return loop
+
+    async def submit(self, mutation: HostMutation) -> None:
+        error = (await self.submit_many([mutation]))[0]
+        if error is not None:
+            raise error
+
+    async def submit_many(
+        self, mutations: list[HostMutation]
+    ) -> list[Exception | None]:
+        loop = self._bind_loop()
+        futures = [loop.create_future() for _ in mutations]
+        self._pending.extend(zip(mutations, futures))
+        if self._flusher is None:
+            self._flusher = loop.create_task(self._flush())
+        return list(await asyncio.gather(*futures))
+
+    async def _flush(self) -> None:
+        await asyncio.sleep(self.window)
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            # Anything submitted from here on waits for the next commit
+            self._flusher = None
+            try:
+                results = await asyncio.to_thread(
+                    self.registry.apply, [mutation for mutation, _ in batch]
+                )
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+registry = HostRegistry(open_storage(HOSTS_BACKEND, HOSTS_PATH))
+writer = HostWriteCoordinator(registry)
@@ -0,0 +1,432 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from collections.abc import Callable, Hashable
+from typing import List, Protocol, TypeVar
+
+from wol_service.env import SCHEDULE_MISFIRE_GRACE, SCHEDULES_PATH
+from wol_service.events import publish_wake
+from wol_service.models import PreparedHost, Schedule
+from wol_service.registry import HostRegistry, registry
+from wol_service.utils import atomic_write, file_lock, file_signature
+from wol_service.wol import wake_engine
+
+logger = logging.getLogger("wol_service")
+
+T = TypeVar("T")
+
+# Field name, lowest and highest value of the five cron fields
+_CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day of month", 1, 31),
+    ("month", 1, 12),
+    ("day of week", 0, 7),
+)
+_CRON_SEARCH_YEARS = 5
+
+
+def _parse_cron_field(text: str, name: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        base, _, step_text = part.partition("/")
+        try:
+            step = int(step_text) if step_text else 1
+            if base == "*":
+                start, end = low, high
+            elif "-" in base:
+                start, end = (int(v) for v in base.split("-", 1))
+            else:
+                start = int(base)
+                end = high if step_text else start
+        except ValueError:
+            raise ValueError(f"Invalid cron {name} field: {text!r}") from None
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Invalid cron {name} field: {text!r}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronExpression:
+    """
+    Standard five-field cron expression (minute hour day month weekday).
+
+    Supports ``*``, lists, ranges and steps. Like cron, when both the day of
+    month and the day of week are restricted a day matching either fires.
+    Times are local wall-clock times.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("Cron expression must have five fields")
+        parsed = [
+            _parse_cron_field(text, name, low, high)
+            for text, (name, low, high) in zip(fields, _CRON_FIELDS)
+        ]
+        self.expression = " ".join(fields)
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # Sunday is both 0 and 7; store Python weekdays (Monday is 0)
+        self.weekdays = frozenset((d - 1) % 7 for d in weekdays)
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+        if self.next_after(time.time()) is None:
+            raise ValueError("Cron expression never fires")
+
+    def _day_matches(self, dt: datetime) -> bool:
+        in_days = dt.day in self.days
+        in_weekdays = dt.weekday() in self.weekdays
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, timestamp: float) -> float | None:
+        """First matching minute strictly after ``timestamp``."""
+        dt = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0)
+        dt += timedelta(minutes=1)
+        limit = dt.year + _CRON_SEARCH_YEARS
+        # Skip whole months, days and hours that cannot match
+        while dt.year <= limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(
+                    day=1, hour=0, minute=0
+                )
+            elif not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        return None
+
+
+class _Sender(Protocol):
+    async def send_packets(
+        self, packets: list[tuple[bytes | memoryview, tuple[str, int]]]
+    ) -> None: ...
+
+
+class WakeScheduler:
+    """
+    Runs stored one-shot and cron wake jobs from a single timer task.
+
+    Upcoming runs sit in one min-heap keyed by due time; the task sleeps
+    until the earliest entry and is woken early whenever a schedule changes.
+    Superseded heap entries are skipped rather than removed.
+
+    A job's ``last_run`` is saved before its packet is sent, so a restart
+    never repeats a run. Runs missed while the service was down fire once on
+    startup if they are at most ``grace`` seconds late and are skipped
+    otherwise.
+
+    Several workers may share one schedules file. Every change, including
+    claiming due runs, is a read-modify-write under a lock file shared by
+    all of them, starting from the file whenever its signature changed: a
+    run claimed by one worker is not due anymore for the others, and no
+    worker saves over schedules it has not seen.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        hosts: HostRegistry,
+        engine: _Sender,
+        grace: float = SCHEDULE_MISFIRE_GRACE,
+    ):
+        self.path = path
+        self.hosts = hosts
+        self.engine = engine
+        self.grace = grace
+        self.lock_path = f"{path}.lock"
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._signature: Hashable = None
+        self._schedules: dict[str, Schedule] = {}
+        self._crons: dict[str, CronExpression] = {}
+        self._next: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def load(self) -> None:
+        with self._lock:
+            # Read the signature first: a write racing with the load only
+            # makes the next refresh() load again, never miss a change.
+            self._signature = file_signature(self.path)
+            items: list = []
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    items = json.load(f)
+            self._schedules = {}
+            self._crons = {}
+            self._next = {}
+            self._heap = []
+            now = time.time()
+            for item in items:
+                schedule = Schedule(
+                    id=str(item["id"]),
+                    host=str(item["host"]),
+                    cron=item.get("cron"),
+                    at=item.get("at"),
+                    enabled=bool(item.get("enabled", True)),
+                    created=float(item.get("created", now)),
+                    last_run=item.get("last_run"),
+                )
+                try:
+                    self._index(schedule, now)
+                except ValueError as e:
+                    logger.warning("Skipping schedule %s: %s", schedule["id"], e)
+            self._loaded = True
+
+    def refresh(self) -> None:
+        """Reload if the file was changed, for instance by another worker."""
+        with self._lock:
+            if self._loaded and file_signature(self.path) == self._signature:
+                return
+            self.load()
+        self._notify()
+
+    def _index(self, schedule: Schedule, now: float) -> None:
+        """Add or replace a schedule and queue its next run."""
+        sid = schedule["id"]
+        cron = CronExpression(schedule["cron"]) if schedule["cron"] else None
+        self._schedules[sid] = schedule
+        self._crons.pop(sid, None)
+        self._next.pop(sid, None)
+        if cron is not None:
+            self._crons[sid] = cron
+        if not schedule["enabled"]:
+            return
+        due = self._due_time(schedule, cron, now)
+        if due is not None:
+            self._next[sid] = due
+            heapq.heappush(self._heap, (due, sid))
+
+    def _due_time(
+        self, schedule: Schedule, cron: CronExpression | None, now: float
+    ) -> float | None:
+        if cron is None:
+            due = schedule["at"] if schedule["last_run"] is None else None
+        else:
+            base = schedule["last_run"]
+            due = cron.next_after(base if base is not None else schedule["created"])
+        if due is not None and due < now - self.grace:
+            logger.warning(
+                "Skipping wake of %s scheduled for %s; missed by more than %ss",
+                schedule["host"],
+                datetime.fromtimestamp(due).isoformat(timespec="seconds"),
+                int(self.grace),
+            )
+            due = cron.next_after(now) if cron is not None else None
+        return due
+
+    def _snapshot(self) -> List[Schedule]:
+        with self._lock:
+            return [Schedule(**s) for s in self._schedules.values()]
+
+    def _save(self) -> None:
+        # The lock orders concurrent saves so the newest state always wins
+        with self._lock:
+            atomic_write(self.path, self._snapshot())
+            self._signature = file_signature(self.path)
+
+    def _commit(self, change: Callable[[], T]) -> T:
+        """
+        Run ``change`` on the current schedules and save them if it returns
+        a true value, all under the lock shared with other workers.
+        """
+        with file_lock(self.lock_path):
+            self.refresh()
+            with self._lock:
+                result = change()
+            if result:
+                self._save()
+            return result
+
+    def _notify(self) -> None:
+        if self._wakeup is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def next_run(self, schedule_id: str) -> float | None:
+        with self._lock:
+            return self._next.get(schedule_id)
+
+    def list(self) -> List[Schedule]:
+        self.refresh()
+        return self._snapshot()
+
+    def get(self, schedule_id: str) -> Schedule | None:
+        self.refresh()
+        with self._lock:
+            schedule = self._schedules.get(schedule_id)
+            return Schedule(**schedule) if schedule is not None else None
+
+    async def create(
+        self,
+        host: str,
+        cron: str | None = None,
+        at: float | None = None,
+        enabled: bool = True,
+    ) -> Schedule:
+        schedule = Schedule(
+            id=secrets.token_hex(8),
+            host=host,
+            cron=cron,
+            at=at,
+            enabled=enabled,
+            created=time.time(),
+            last_run=None,
+        )
+
+        def add() -> bool:
+            self._index(schedule, schedule["created"])
+            return True
+
+        await asyncio.to_thread(self._commit, add)
+        self._notify()
+        return Schedule(**schedule)
+
+    async def update(
+        self,
+        schedule_id: str,
+        host: str,
+        cron: str | None = None,
+        at: float | None = None,
+        enabled: bool = True,
+    ) -> Schedule | None:
+        def change() -> Schedule | None:
+            current = self._schedules.get(schedule_id)
+            if current is None:
+                return None
+            schedule = Schedule(**current)
+            schedule["host"] = host
+            schedule["enabled"] = enabled
+            if (cron, at) != (current["cron"], current["at"]):
+                # A new timing starts over: count runs from now
+                schedule["cron"] = cron
+                schedule["at"] = at
+                schedule["created"] = time.time()
+                schedule["last_run"] = None
+            self._index(schedule, time.time())
+            return schedule
+
+        schedule = await asyncio.to_thread(self._commit, change)
+        if schedule is None:
+            return None
+        self._notify()
+        return Schedule(**schedule)
+
+    async def delete(self, schedule_id: str) -> bool:
+        def remove() -> bool:
+            if self._schedules.pop(schedule_id, None) is None:
+                return False
+            self._crons.pop(schedule_id, None)
+            self._next.pop(schedule_id, None)
+            return True
+
+        return await asyncio.to_thread(self._commit, remove)
+
+    def _pop_due(self, now: float) -> List[Schedule]:
+        """Take every due run off the heap and queue each job's next run."""
+        due: List[Schedule] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, sid = heapq.heappop(self._heap)
+                if self._next.get(sid) != when:
+                    continue  # superseded by an update or delete
+                schedule = self._schedules[sid]
+                schedule["last_run"] = now
+                cron = self._crons.get(sid)
+                following = cron.next_after(now) if cron is not None else None
+                if following is None:
+                    del self._next[sid]
+                else:
+                    self._next[sid] = following
+                    heapq.heappush(self._heap, (following, sid))
+                due.append(schedule)
+            if len(self._heap) > 2 * len(self._next) + 64:
+                self._heap = [(t, sid) for sid, t in self._next.items()]
+                heapq.heapify(self._heap)
+        return due
+
+    async def run_due(self, now: float | None = None) -> List[Schedule]:
+        """Fire every job due at ``now``; returns the jobs that ran."""
+        # Claim and record the runs before sending: at most once, even across
+        # a crash or with other workers due at the same time
+        due = await asyncio.to_thread(
+            self._commit, lambda: self._pop_due(time.time() if now is None else now)
+        )
+        if not due:
+            return due
+        packets: list[tuple[bytes | memoryview, tuple[str, int]]] = []
+        macs: list[bytes] = []
+        for schedule in due:
+            prepared: PreparedHost | None = self.hosts.prepared(schedule["host"])
+            if prepared is None:
+                logger.warning(
+                    "Scheduled wake %s: host %r not found",
+                    schedule["id"],
+                    schedule["host"],
+                )
+                continue
+            packets.append((prepared.packet, prepared.address))
+            macs.append(prepared.mac)
+        if packets:
+            await self.engine.send_packets(packets)
+            for mac in macs:
+                publish_wake(mac.hex(), "sent")
+        logger.info("Scheduled wake sent to %d host(s)", len(packets))
+        return due
+
+    def _delay(self) -> float | None:
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.time())
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            self._wakeup.clear()
+            delay = self._delay()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self.run_due()
+            except Exception:
+                logger.exception("Scheduled wake failed")
+
+    async def start(self) -> None:
+        self.refresh()
+        loop = asyncio.get_running_loop()
+        if self._task is not None and self._loop is loop and not self._task.done():
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        self._wakeup = None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+scheduler = WakeScheduler(SCHEDULES_PATH, registry, wake_engine)
@@ -1,9 +1,41 @@
 # src/storage.py
 import json
+import logging
 import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Hashable
 from typing import List
-from wol_service.models import Host
-from wol_service.utils import atomic_write
+
+from wol_service.env import JOURNAL_COMPACT_BYTES
+from wol_service.models import Host, HostMutation
+from wol_service.utils import (
+    atomic_write,
+    ensure_parent_dir,
+    file_lock,
+    file_signature,
+)
+from wol_service.validators import normalize_mac_address
+
+logger = logging.getLogger("wol_service")
+
+
+class HostConflictError(ValueError):
+    pass
+
+
+class HostNotFoundError(LookupError):
+    pass
+
+
+def _host_from_item(item) -> Host:
+    host = Host(name=item["name"], mac=item["mac"], ip=item["ip"], port=item["port"])
+    if item.get("tags"):
+        host["tags"] = list(item["tags"])
+    if item.get("probe_ip"):
+        host["probe_ip"] = item["probe_ip"]
+    return host
 
 
 def load_hosts(path: str) -> List[Host]:
@@ -12,12 +44,481 @@ def load_hosts(path: str) -> List[Host]:
     with open(path, "r", encoding="utf-8") as f:
         data = json.load(f)
     if isinstance(data, list):
-        return [
-            Host(name=item["name"], mac=item["mac"], ip=item["ip"], port=item["port"])
-            for item in data
-        ]
+        return [_host_from_item(item) for item in data]
     return []
 
 
 def save_hosts(path: str, hosts: List[Host]) -> None:
     atomic_write(path, [dict(h) for h in hosts])
+
+
+def _check_conflicts(hosts: List[Host], host: Host) -> None:
+    mac = normalize_mac_address(host["mac"])
+    for h in hosts:
+        if h["name"] == host["name"]:
+            raise HostConflictError("Host with this name already exists")
+        if normalize_mac_address(h["mac"]) == mac:
+            raise HostConflictError("Host with this MAC already exists")
+
+
+def _apply_record(hosts: dict[str, Host], record: HostMutation | dict) -> None:
+    # Records are "set"/"remove" of a single key, so replaying any prefix of
+    # the journal a second time leaves the state unchanged.
+    if record.get("op") == "add":
+        host = _host_from_item(record["host"])
+        hosts[host["name"]] = host
+    elif record.get("op") == "delete":
+        hosts.pop(record["name"], None)
+
+
+class HostStorage(ABC):
+    """Persistence backend for saved hosts."""
+
+    path: str
+
+    @property
+    def lock_path(self) -> str:
+        """Lock file that serializes writers across processes."""
+        return f"{self.path}.lock"
+
+    @abstractmethod
+    def load(self) -> List[Host]: ...
+
+    @abstractmethod
+    def save(self, hosts: List[Host]) -> None: ...
+
+    @abstractmethod
+    def get(self, name: str) -> Host | None: ...
+
+    @abstractmethod
+    def insert(self, host: Host) -> None:
+        """Store one host; raises HostConflictError on a duplicate name/MAC."""
+
+    @abstractmethod
+    def delete(self, name: str) -> bool: ...
+
+    @abstractmethod
+    def apply(self, mutations: List[HostMutation]) -> None:
+        """Durably apply already-validated mutations in a single write."""
+
+    @abstractmethod
+    def list(self, limit: int | None = None, offset: int = 0) -> List[Host]: ...
+
+    @abstractmethod
+    def signature(self) -> Hashable:
+        """Cheap token that changes whenever the stored hosts change."""
+
+
+class JsonHostStorage(HostStorage):
+    """The whole host list as one JSON document, rewritten on every change."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> List[Host]:
+        return load_hosts(self.path)
+
+    def save(self, hosts: List[Host]) -> None:
+        save_hosts(self.path, hosts)
+
+    def get(self, name: str) -> Host | None:
+        return next((h for h in self.load() if h["name"] == name), None)
+
+    def insert(self, host: Host) -> None:
+        hosts = self.load()
+        _check_conflicts(hosts, host)
+        self.save([*hosts, host])
+
+    def delete(self, name: str) -> bool:
+        hosts = self.load()
+        kept = [h for h in hosts if h["name"] != name]
+        if len(kept) == len(hosts):
+            return False
+        self.save(kept)
+        return True
+
+    def apply(self, mutations: List[HostMutation]) -> None:
+        hosts = {h["name"]: h for h in self.load()}
+        for mutation in mutations:
+            _apply_record(hosts, mutation)
+        self.save(list(hosts.values()))
+
+    def list(self, limit: int | None = None, offset: int = 0) -> List[Host]:
+        hosts = self.load()[offset:]
+        return hosts if limit is None else hosts[:limit]
+
+    def signature(self) -> Hashable:
+        return file_signature(self.path)
+
+
+class JournaledHostStorage(JsonHostStorage):
+    """
+    JSON snapshot plus an append-only journal of host mutations.
+
+    Inserts and deletes append one small JSON line to ``<path>.journal`` and
+    fsync it instead of rewriting the snapshot. Loading replays the journal on
+    top of the snapshot; a torn record at the tail is ignored and cut off by
+    the next append. Once the journal grows past ``compact_bytes`` it is
+    folded back into the snapshot on a background thread.
+    """
+
+    def __init__(self, path: str, compact_bytes: int = JOURNAL_COMPACT_BYTES):
+        super().__init__(path)
+        self.journal_path = f"{path}.journal"
+        self.compact_bytes = compact_bytes
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._hosts: dict[str, Host] = {}
+        self._seen: Hashable = object()
+        self._journal_end = 0
+        self._compactor: threading.Thread | None = None
+
+    def signature(self) -> Hashable:
+        return (file_signature(self.path), file_signature(self.journal_path))
+
+    def _read_journal(self) -> List[dict]:
+        try:
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        records = []
+        good = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            good += len(line)
+        self._journal_end = good
+        return records
+
+    def _sync(self) -> None:
+        while True:
+            snapshot = file_signature(self.path)
+            signature = (snapshot, file_signature(self.journal_path))
+            if signature == self._seen:
+                return
+            hosts = {h["name"]: h for h in load_hosts(self.path)}
+            for record in self._read_journal():
+                _apply_record(hosts, record)
+            # Compaction replaces the snapshot before trimming the journal; if
+            # the snapshot moved while we read, the journal may already be cut.
+            if file_signature(self.path) == snapshot:
+                break
+        self._hosts = hosts
+        self._seen = signature
+
+    def _append(self, records: List[HostMutation] | List[dict]) -> None:
+        data = "".join(
+            json.dumps(r, separators=(",", ":"), ensure_ascii=False) + "\n"
+            for r in records
+        ).encode("utf-8")
+        ensure_parent_dir(self.journal_path)
+        with open(self.journal_path, "ab") as f:
+            torn = f.seek(0, os.SEEK_END) - self._journal_end
+            if torn > 0:
+                logger.warning(
+                    "Discarding %d bytes of incomplete records at the end of %s",
+                    torn,
+                    self.journal_path,
+                )
+                f.truncate(self._journal_end)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            self._journal_end = f.tell()
+        for record in records:
+            _apply_record(self._hosts, record)
+        self._seen = self.signature()
+        if self._journal_end >= self.compact_bytes:
+            self._start_compaction()
+
+    def _start_compaction(self) -> None:
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(
+            target=self.compact, name="wol-journal-compaction", daemon=True
+        )
+        self._compactor.start()
+
+    def compact(self) -> None:
+        """Fold the journal into the snapshot."""
+        # The file lock keeps writers in other processes, and their own
+        # compactions, out from the sync to the trim: a snapshot and journal
+        # offset taken before someone else compacted would drop their records.
+        with self._compact_lock, file_lock(self.lock_path):
+            with self._lock:
+                self._sync()
+                if not os.path.exists(self.journal_path):
+                    return
+                hosts = list(self._hosts.values())
+                offset = self._journal_end
+            # Writing the snapshot is the slow part; readers in this process
+            # keep going. Replaying records already contained in a snapshot
+            # is harmless, so readers and a crash at any point see a
+            # consistent state.
+            save_hosts(self.path, hosts)
+            with self._lock:
+                with open(self.journal_path, "rb") as f:
+                    f.seek(offset)
+                    tail = f.read()
+                atomic_write(self.journal_path, tail)
+                # Force a re-read: other processes may have appended records
+                # this instance has not seen yet.
+                self._seen = object()
+
+    def load(self) -> List[Host]:
+        with self._lock:
+            self._sync()
+            return list(self._hosts.values())
+
+    def save(self, hosts: List[Host]) -> None:
+        with self._lock:
+            self._sync()
+            wanted = {h["name"]: h for h in hosts}
+            records: List[dict] = [
+                {"op": "delete", "name": name}
+                for name, host in self._hosts.items()
+                if wanted.get(name) != host
+            ]
+            records += [
+                {"op": "add", "host": dict(host)}
+                for name, host in wanted.items()
+                if self._hosts.get(name) != host
+            ]
+            if records:
+                self._append(records)
+        self.compact()
+
+    def get(self, name: str) -> Host | None:
+        with self._lock:
+            self._sync()
+            return self._hosts.get(name)
+
+    def insert(self, host: Host) -> None:
+        with self._lock:
+            self._sync()
+            _check_conflicts(list(self._hosts.values()), host)
+            self._append([{"op": "add", "host": dict(host)}])
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            self._sync()
+            if name not in self._hosts:
+                return False
+            self._append([{"op": "delete", "name": name}])
+            return True
+
+    def apply(self, mutations: List[HostMutation]) -> None:
+        with self._lock:
+            self._sync()
+            self._append(mutations)
+
+    def list(self, limit: int | None = None, offset: int = 0) -> List[Host]:
+        hosts = self.load()[offset:]
+        return hosts if limit is None else hosts[:limit]
+
+
+_SQLITE_HEADER = b"SQLite format 3\x00"
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    mac TEXT NOT NULL,
+    mac_norm TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    tags TEXT NOT NULL DEFAULT '[]',
+    probe_ip TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS hosts_name ON hosts(name);
+CREATE UNIQUE INDEX IF NOT EXISTS hosts_mac ON hosts(mac_norm);
+"""
+
+
+class SqliteHostStorage(HostStorage):
+    """
+    Hosts as rows in an SQLite database running in WAL mode.
+
+    Inserting or deleting a host touches a single row. Every write bumps
+    ``PRAGMA user_version`` inside the same transaction, which serves as the
+    change signature for readers in this and other processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _check_file(self) -> None:
+        # sqlite3 would only fail on the first query, with "file is not a
+        # database"; typically WOL_HOSTS_PATH still names the JSON file.
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb") as f:
+            header = f.read(len(_SQLITE_HEADER))
+        if header != _SQLITE_HEADER:
+            raise RuntimeError(
+                f"{self.path} is not an SQLite database. With WOL_HOSTS_BACKEND=sqlite,"
+                " set WOL_HOSTS_PATH to a new file such as hosts.db."
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            ensure_parent_dir(self.path)
+            self._check_file()
+            conn = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SQLITE_SCHEMA)
+            columns = [r[1] for r in conn.execute("PRAGMA table_info(hosts)")]
+            if "tags" not in columns:
+                # Databases created before hosts had tags
+                conn.execute(
+                    "ALTER TABLE hosts ADD COLUMN tags TEXT NOT NULL DEFAULT '[]'"
+                )
+            if "probe_ip" not in columns:
+                conn.execute("ALTER TABLE hosts ADD COLUMN probe_ip TEXT")
+            self._conn = conn
+        return self._conn
+
+    def _write(self, statements) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                statements(conn)
+                row = conn.execute("PRAGMA user_version").fetchone()
+                conn.execute(f"PRAGMA user_version = {int(row[0]) + 1}")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Host]:
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        return [
+            _host_from_item(
+                {
+                    "name": r[0],
+                    "mac": r[1],
+                    "ip": r[2],
+                    "port": r[3],
+                    "tags": json.loads(r[4]),
+                    "probe_ip": r[5],
+                }
+            )
+            for r in rows
+        ]
+
+    @staticmethod
+    def _row(host: Host) -> tuple:
+        return (
+            host["name"],
+            host["mac"],
+            normalize_mac_address(host["mac"]),
+            host["ip"],
+            int(host["port"]),
+            json.dumps(host.get("tags", [])),
+            host.get("probe_ip"),
+        )
+
+    def load(self) -> List[Host]:
+        return self.list()
+
+    def save(self, hosts: List[Host]) -> None:
+        def statements(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM hosts")
+            conn.executemany(
+                "INSERT INTO hosts (name, mac, mac_norm, ip, port, tags, probe_ip)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(h) for h in hosts],
+            )
+
+        self._write(statements)
+
+    def get(self, name: str) -> Host | None:
+        rows = self._query(
+            "SELECT name, mac, ip, port, tags, probe_ip FROM hosts WHERE name = ?",
+            (name,),
+        )
+        return rows[0] if rows else None
+
+    def insert(self, host: Host) -> None:
+        def statements(conn: sqlite3.Connection) -> None:
+            existing = conn.execute(
+                "SELECT name = ? FROM hosts WHERE name = ? OR mac_norm = ? LIMIT 1",
+                (host["name"], host["name"], normalize_mac_address(host["mac"])),
+            ).fetchone()
+            if existing is not None:
+                raise HostConflictError(
+                    "Host with this name already exists"
+                    if existing[0]
+                    else "Host with this MAC already exists"
+                )
+            conn.execute(
+                "INSERT INTO hosts (name, mac, mac_norm, ip, port, tags, probe_ip)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._row(host),
+            )
+
+        self._write(statements)
+
+    def delete(self, name: str) -> bool:
+        deleted = False
+
+        def statements(conn: sqlite3.Connection) -> None:
+            nonlocal deleted
+            cursor = conn.execute("DELETE FROM hosts WHERE name = ?", (name,))
+            deleted = cursor.rowcount > 0
+
+        self._write(statements)
+        return deleted
+
+    def apply(self, mutations: List[HostMutation]) -> None:
+        def statements(conn: sqlite3.Connection) -> None:
+            for mutation in mutations:
+                if mutation["op"] == "add":
+                    conn.execute(
+                        "INSERT INTO hosts (name, mac, mac_norm, ip, port, tags, probe_ip)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        self._row(mutation["host"]),
+                    )
+                elif mutation["op"] == "delete":
+                    conn.execute(
+                        "DELETE FROM hosts WHERE name = ?", (mutation["name"],)
+                    )
+
+        self._write(statements)
+
+    def list(self, limit: int | None = None, offset: int = 0) -> List[Host]:
+        return self._query(
+            "SELECT name, mac, ip, port, tags, probe_ip FROM hosts ORDER BY id LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        )
+
+    def signature(self) -> Hashable:
+        with self._lock:
+            row = self._connection().execute("PRAGMA user_version").fetchone()
+        return int(row[0])
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def open_storage(backend: str, path: str) -> HostStorage:
+    if backend == "sqlite":
+        return SqliteHostStorage(path)
+    if backend == "journal":
+        return JournaledHostStorage(path)
+    return JsonHostStorage(path)
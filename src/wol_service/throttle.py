@@ -0,0 +1,112 @@
+import time
+from collections import deque
+
+from wol_service.env import (
+    LOGIN_LOCKOUT,
+    LOGIN_MAX_FAILURES,
+    LOGIN_MAX_LOCKOUT,
+    LOGIN_WINDOW,
+)
+from wol_service.ratelimit import RateLimitedError
+
+# Idle keys are swept once this many are tracked
+_SWEEP_THRESHOLD = 4096
+
+
+class _Key:
+    __slots__ = ("failures", "strikes", "locked_until", "last_failure")
+
+    def __init__(self):
+        self.failures: deque[float] = deque()
+        self.strikes = 0  # lockouts so far; each one doubles the next
+        self.locked_until = 0.0
+        self.last_failure = 0.0
+
+
+class LoginThrottle:
+    """
+    Failed-login limits per client IP and per username.
+
+    A key (an IP or a username) may fail ``max_failures`` times within a
+    sliding ``window`` of seconds; the failure that reaches the limit locks
+    it out for ``lockout`` seconds, doubled for every earlier lockout up to
+    ``max_lockout``. A key's lockout count is forgotten after ``max_lockout``
+    seconds without failures. A successful login clears only the username:
+    the IP keeps its failures and lockout, or one valid account would let a
+    client reset its IP's limit between guesses. check() runs before any
+    password hashing, so a locked-out attempt costs almost nothing.
+    ``max_failures`` of 0 disables the throttle.
+    """
+
+    def __init__(
+        self,
+        max_failures: int = LOGIN_MAX_FAILURES,
+        window: float = LOGIN_WINDOW,
+        lockout: float = LOGIN_LOCKOUT,
+        max_lockout: float = LOGIN_MAX_LOCKOUT,
+    ):
+        self.max_failures = max_failures
+        self.window = window
+        self.lockout = lockout
+        self.max_lockout = max(lockout, max_lockout)
+        self._keys: dict[str, _Key] = {}
+
+    @staticmethod
+    def _names(ip: str | None, username: str) -> list[str]:
+        names = [f"user:{username}"]
+        if ip:
+            names.append(f"ip:{ip}")
+        return names
+
+    def check(self, ip: str | None, username: str, now: float | None = None) -> None:
+        """Raise RateLimitedError if the IP or the username is locked out."""
+        if self.max_failures <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        wait = 0.0
+        for name in self._names(ip, username):
+            key = self._keys.get(name)
+            if key is not None:
+                wait = max(wait, key.locked_until - now)
+        if wait > 0:
+            raise RateLimitedError(wait, "Too many failed logins; try again later")
+
+    def failure(self, ip: str | None, username: str, now: float | None = None) -> None:
+        if self.max_failures <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        self._sweep(now)
+        for name in self._names(ip, username):
+            key = self._keys.get(name)
+            if key is None:
+                key = self._keys[name] = _Key()
+            elif now - key.last_failure > self.max_lockout:
+                key.strikes = 0
+            key.last_failure = now
+            failures = key.failures
+            while failures and now - failures[0] >= self.window:
+                failures.popleft()
+            failures.append(now)
+            if len(failures) >= self.max_failures:
+                lockout = min(self.max_lockout, self.lockout * 2**key.strikes)
+                key.locked_until = now + lockout
+                key.strikes += 1
+                failures.clear()
+
+    def success(self, ip: str | None, username: str) -> None:
+        self._keys.pop(f"user:{username}", None)
+
+    def _sweep(self, now: float) -> None:
+        if len(self._keys) <= _SWEEP_THRESHOLD:
+            return
+        self._keys = {
+            name: key
+            for name, key in self._keys.items()
+            if now - key.last_failure <= max(self.window, self.max_lockout)
+        }
+
+    def reset(self) -> None:
+        self._keys = {}
+
+
+login_throttle = LoginThrottle()
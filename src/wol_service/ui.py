@@ -1,28 +1,39 @@
+import asyncio
 import logging
 import os
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from starlette.status import HTTP_401_UNAUTHORIZED
+from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_503_SERVICE_UNAVAILABLE
 
+from wol_service.api import enqueue_wake
+from wol_service.apikeys import require_wake
 from wol_service.auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    authenticate_user,
+    VerifierBusyError,
+    authenticate_user_async,
+    password_needs_rehash,
+    password_verifier,
     create_access_token,
     get_user_from_cookie,
     issue_csrf_token,
-    require_user_from_cookie,
+    token_cache,
     validate_csrf,
 )
-from wol_service.user_management import load_users
+from wol_service.jobs import JobTarget, WakeJob
+from wol_service.models import Host, User
+from wol_service.probe import parse_ports, probe_address, verify_stream, wake_and_verify
+from wol_service.ratelimit import RateLimitedError, wake_limiter
+from wol_service.throttle import login_throttle
+from wol_service.user_management import load_users, save_users
 from wol_service.validators import (
     validate_ip_address,
     validate_mac_address,
     validate_port,
 )
 from wol_service.utils import get_resource_path
-from wol_service.wol import wake_on_lan
+from wol_service.wol import DEFAULT_SEND_POLICY, prepare_host, wake_engine
 from wol_service.env import (
     COOKIE_SECURE,
     COOKIE_SAMESITE,
@@ -36,13 +47,36 @@ templates_path = get_resource_path("wol_service", "templates")
 templates = Jinja2Templates(directory=templates_path)
 logger = logging.getLogger("wol_service")
 
-# In-memory storage for users
-USERS = load_users()
-AUTH_ENABLED = bool(USERS)
+# In-memory storage for users, filled by load_auth() at startup
+USERS: dict[str, User] = {}
+AUTH_ENABLED = False
+_auth_loaded = False
+
+
+def load_auth() -> None:
+    """
+    Load users.json and bootstrap the admin from the environment.
+
+    Runs once, from the app lifespan; a request served without one (an app
+    mounted elsewhere, tests) loads the users on first use instead.
+    """
+    global AUTH_ENABLED, _auth_loaded
+    if _auth_loaded:
+        return
+    USERS.clear()
+    USERS.update(load_users())
+    AUTH_ENABLED = bool(USERS)
+    _auth_loaded = True
+
+
+def _auth_enabled() -> bool:
+    if not _auth_loaded:
+        load_auth()
+    return AUTH_ENABLED
 
 
 def _enforce_csrf(request: Request, csrf_token: str | None) -> None:
-    if not AUTH_ENABLED:
+    if not _auth_enabled():
         return
     header_token = request.headers.get("X-CSRF-Token")
     submitted_token = csrf_token or header_token
@@ -50,13 +84,13 @@ def _enforce_csrf(request: Request, csrf_token: str | None) -> None:
 
 
 async def _require_user(request: Request):
-    if not AUTH_ENABLED:
+    if not _auth_enabled():
         return "anonymous"
-    return await require_user_from_cookie(request)
+    return await require_wake(request)
 
 
 async def _optional_user(request: Request):
-    if not AUTH_ENABLED:
+    if not _auth_enabled():
         return "anonymous"
     return await get_user_from_cookie(request)
 
@@ -76,30 +110,66 @@ def _warn_if_ephemeral_storage():
 
 @router.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    if AUTH_ENABLED and await _optional_user(request) is None:
+    if _auth_enabled() and await _optional_user(request) is None:
         return RedirectResponse(url="/login", status_code=303)
     return templates.TemplateResponse(request=request, name="index.html")
 
 
 @router.get("/login", response_class=HTMLResponse)
 async def read_login(request: Request):
-    if not AUTH_ENABLED:
+    if not _auth_enabled():
         return RedirectResponse(url="/wake", status_code=303)
     return templates.TemplateResponse(request=request, name="login.html")
 
 
+async def _rehash(user: User, password: str) -> None:
+    """Move a user's hash to the current Argon2 parameters."""
+    try:
+        hashed = await password_verifier.hash(password)
+        USERS[user["username"]] = User(
+            username=user["username"], hashed_password=hashed
+        )
+        # The write fsyncs; keep it off the event loop like the hash itself
+        await asyncio.to_thread(save_users, dict(USERS))
+    except Exception:
+        logger.exception("Failed to rehash the password of %s", user["username"])
+    else:
+        logger.info("Rehashed the password of %s", user["username"])
+
+
 @router.post("/login")
-async def login(username: str = Form(...), password: str = Form(...)):
-    if not AUTH_ENABLED:
+async def login(request: Request, username: str = Form(...), password: str = Form(...)):
+    if not _auth_enabled():
         return RedirectResponse(url="/wake", status_code=303)
-    user = authenticate_user(USERS, username, password)
+    ip = request.client.host if request.client else None
+    try:
+        # Before any hashing: a locked-out attempt must cost next to nothing
+        login_throttle.check(ip, username)
+    except RateLimitedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header},
+        )
+    try:
+        user = await authenticate_user_async(USERS, username, password)
+    except VerifierBusyError as e:
+        raise HTTPException(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
     if not user:
+        login_throttle.failure(ip, username)
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Basic"},
         )
 
+    login_throttle.success(ip, username)
+    if password_needs_rehash(user["hashed_password"]):
+        await _rehash(user, password)
     access_token = create_access_token(data={"sub": user["username"]})
     response = RedirectResponse(url="/", status_code=303)
     response.set_cookie(
@@ -135,6 +205,10 @@ async def wake_device(
     ip_address: str = Form("255.255.255.255"),
     port_number: str = Form("9"),
     csrf_token: str | None = Form(None),
+    verify: bool = Form(False),
+    probe_ip: str | None = Form(None),
+    probe_ports: str | None = Form(None),
+    async_: bool = Form(False, alias="async"),
 ):
     _enforce_csrf(request, csrf_token)
     if not validate_mac_address(mac_address):
@@ -147,15 +221,53 @@ async def wake_device(
         raise HTTPException(status_code=400, detail="Port must be an integer")
     if not validate_port(port_value):
         raise HTTPException(status_code=400, detail="Invalid port number")
+    if verify:
+        try:
+            ip = probe_address(probe_ip, ip_address)
+            ports = parse_ports(probe_ports)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if async_:
+        prepared = prepare_host(
+            Host(name="", mac=mac_address, ip=ip_address, port=port_value)
+        )
+        result = {"mac": prepared.mac.hex(":"), "ip": ip_address, "port": port_value}
+        result["ok"] = None  # set by the job once the packet is sent
+        target = JobTarget(prepared, result, ip if verify else None)
+        return enqueue_wake(
+            WakeJob([result], [target], DEFAULT_SEND_POLICY, ports if verify else None)
+        )
+
+    async def send() -> None:
+        await wake_engine.send(mac_address, ip_address, port_value)
+
+    packets = DEFAULT_SEND_POLICY.packet_count((ip_address, port_value))
     try:
-        wake_on_lan(mac_address, ip_address, port_value)
-        return {"message": f"Magic packet sent to {mac_address}"}
+        coalesced = await wake_limiter.wake(mac_address, send, packets)
+    except RateLimitedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header},
+        )
     except Exception as e:
         return {"error": str(e)}
+    if verify:
+        return StreamingResponse(
+            verify_stream(wake_and_verify(send, ip, ports, already_sent=True)),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+    if coalesced:
+        return {"message": f"Wake for {mac_address} already sent", "coalesced": True}
+    return {"message": f"Magic packet sent to {mac_address}"}
 
 
 @router.get("/logout")
-async def logout():
+async def logout(request: Request):
+    token = request.cookies.get("access_token")
+    if token:
+        token_cache.discard(token)
     response = RedirectResponse(url="/login", status_code=303)
     response.delete_cookie("access_token")
     response.delete_cookie("csrf_token")
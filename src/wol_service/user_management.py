@@ -45,12 +45,15 @@ def _load_users_from_file(path: Path) -> Tuple[Dict[str, User], Dict[str, str]]:
     return {}, meta
 
 
-def _bootstrap_admin_from_env() -> Dict[str, User]:
+def _bootstrap_admin_from_env(existing: Dict[str, User]) -> Dict[str, User]:
     admin_username = os.getenv("ADMIN_USERNAME")
     admin_password = os.getenv("ADMIN_PASSWORD")
     if admin_username == "" and admin_password == "":
         return {"__DISABLE__": User(username="", hashed_password="")}
     if admin_username and admin_password:
+        if admin_username in existing:
+            # Persisted users win; don't spend an Argon2 hash on a discarded one
+            return {}
         return {
             admin_username: User(
                 username=admin_username,
@@ -69,6 +72,13 @@ def _clear_admin_env() -> None:
     os.environ.pop("ADMIN_USERNAME", None)
 
 
+def save_users(users: Dict[str, User]) -> None:
+    atomic_write(
+        USERS_PATH,
+        {"users": users, "_meta": {"secret_fingerprint": SECRET_FINGERPRINT}},
+    )
+
+
 def load_users() -> Dict[str, User]:
     disable_flag = (
         os.getenv("ADMIN_USERNAME") == "" and os.getenv("ADMIN_PASSWORD") == ""
@@ -77,23 +87,21 @@ def load_users() -> Dict[str, User]:
         users: dict[str, User] = {}
     else:
         users, meta = _load_users_from_file(USERS_PATH)
-        if SECRET_FINGERPRINT:
-            stored_fp = meta.get("secret_fingerprint")
-            if stored_fp and stored_fp != SECRET_FINGERPRINT:
-                print(
-                    "Warning: SECRET_KEY differs from the key used when users.json was written; existing sessions will be invalid."
-                )
-        env_users = _bootstrap_admin_from_env()
+        stored_fp = meta.get("secret_fingerprint")
+        if SECRET_FINGERPRINT and stored_fp and stored_fp != SECRET_FINGERPRINT:
+            print(
+                "Warning: SECRET_KEY differs from the key used when users.json was written; existing sessions will be invalid."
+            )
+        env_users = _bootstrap_admin_from_env(users)
         # Merge env bootstrap without overwriting persisted users
         for username, user in env_users.items():
             if username == "__DISABLE__":
                 continue
             users.setdefault(username, user)
-        if env_users and "__DISABLE__" not in env_users:
-            atomic_write(
-                USERS_PATH,
-                {"users": users, "_meta": {"secret_fingerprint": SECRET_FINGERPRINT}},
-            )
+        # Rewrite users.json only when the admin was added or the key changed
+        admin_from_env = bool(os.getenv("ADMIN_USERNAME"))
+        if env_users or (admin_from_env and stored_fp != SECRET_FINGERPRINT):
+            save_users(users)
     _clear_admin_env()
     if not users:
         print(
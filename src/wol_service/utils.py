@@ -1,9 +1,16 @@
 import json
 import os
 import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 import importlib.util
 
+try:
+    import fcntl
+except ImportError:  # Windows has no advisory file locks
+    fcntl = None  # type: ignore[assignment]
+
 
 def get_resource_path(package_name: str, resource_name: str) -> Path:
     """
@@ -24,17 +31,41 @@ def ensure_parent_dir(path: str | Path) -> None:
         parent_dir.mkdir(parents=True, exist_ok=True)
 
 
-def atomic_write(path: str | Path, data: str | dict | list) -> None:
+def atomic_write(path: str | Path, data: str | bytes | dict | list) -> None:
     """Atomically writes data to a file."""
     ensure_parent_dir(path)
     path = Path(path)
     d = path.parent if path.parent != Path("") else Path(".")
     fd, tmp = tempfile.mkstemp(dir=d, prefix=".tmp-", suffix=path.suffix)
-    with os.fdopen(fd, "w", encoding="utf-8") as f:
-        if isinstance(data, (dict, list)):
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        else:
-            f.write(data)
+    if isinstance(data, (dict, list)):
+        data = json.dumps(data, indent=2, ensure_ascii=False)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
         f.flush()
         os.fsync(f.fileno())
     os.replace(tmp, path)
+
+
+def file_signature(path: str | Path) -> tuple[int, int, int] | None:
+    """Cheap token that changes whenever the file is replaced or rewritten."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@contextmanager
+def file_lock(path: str | Path) -> Iterator[None]:
+    """Holds an exclusive advisory lock on a lock file shared between processes."""
+    ensure_parent_dir(path)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
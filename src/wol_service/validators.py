@@ -39,3 +39,36 @@ def validate_port(port: int) -> bool:
     except (TypeError, ValueError):
         return False
     return 1 <= port <= 65535
+
+
+def normalize_mac_address(mac_address: str) -> str:
+    """Return the MAC as 12 lowercase hex digits, without separators."""
+    return mac_address.strip().replace(":", "").replace("-", "").lower()
+
+
+_TAG = re.compile(r"^[a-z0-9][a-z0-9_.-]{0,63}$")
+
+
+def normalize_tags(tags) -> list[str]:
+    """
+    Parse host tags from a list or a comma-separated string.
+
+    Tags are lowercased and de-duplicated; raises ValueError for a tag that
+    is not 1-64 letters, digits, ``_``, ``.`` or ``-``.
+    """
+    if tags is None:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    if not isinstance(tags, list):
+        raise ValueError("Tags must be a list or a comma-separated string")
+    result: list[str] = []
+    for tag in tags:
+        tag = str(tag).strip().lower()
+        if not tag:
+            continue
+        if not _TAG.match(tag):
+            raise ValueError(f"Invalid tag: {tag!r}")
+        if tag not in result:
+            result.append(tag)
+    return result
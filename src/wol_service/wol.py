@@ -1,11 +1,38 @@
+import asyncio
+import logging
 import socket
+from collections.abc import Sequence
+from typing import NamedTuple
 
+try:
+    import numpy as np  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # optional; only speeds up build_magic_packets()
+    np = None  # type: ignore[assignment, unused-ignore]
+
+from wol_service.env import WAKE_BROADCASTS, WAKE_INTERVAL, WAKE_REPEAT
+from wol_service.models import Host, PreparedHost
 from wol_service.validators import (
     validate_ip_address,
     validate_mac_address,
     validate_port,
 )
 
+logger = logging.getLogger("wol_service")
+
+PACKET_SIZE = 102
+_MAC_SEPARATORS = str.maketrans("", "", ":-")
+
+
+def _validate_target(mac_address: str, ip_address: str, port: int) -> int:
+    if not validate_mac_address(mac_address):
+        raise ValueError("Invalid MAC address format")
+    if not validate_ip_address(ip_address):
+        raise ValueError("Invalid IP address or broadcast address")
+    port = int(port)
+    if not validate_port(port):
+        raise ValueError("Invalid port number")
+    return port
+
 
 def wake_on_lan(mac_address: str, ip_address: str, port: int = 9):
     """
@@ -20,13 +47,7 @@ def wake_on_lan(mac_address: str, ip_address: str, port: int = 9):
         bool: True if successful, False otherwise
     """
 
-    if not validate_mac_address(mac_address):
-        raise ValueError("Invalid MAC address format")
-    if not validate_ip_address(ip_address):
-        raise ValueError("Invalid IP address or broadcast address")
-    port = int(port)
-    if not validate_port(port):
-        raise ValueError("Invalid port number")
+    port = _validate_target(mac_address, ip_address, port)
 
     magic_packet = create_magic_packet(mac_address)
 
@@ -54,12 +75,224 @@ def create_magic_packet(valid_mac_address: str) -> bytes:
     Returns:
         bytes: The magic packet
     """
+    return build_magic_packet(mac_to_bytes(valid_mac_address))
+
+
+def mac_to_bytes(valid_mac_address: str) -> bytes:
+    """Convert a validated MAC address string to its canonical 6 bytes."""
     # Remove any separators from MAC address
-    valid_mac_address = valid_mac_address.replace(":", "").replace("-", "")
+    return bytes.fromhex(valid_mac_address.replace(":", "").replace("-", ""))
+
+
+def build_magic_packet(mac_bytes: bytes) -> bytes:
+    """Build the 102-byte payload: 6 x 0xFF followed by the MAC 16 times."""
+    return b"\xff" * 6 + mac_bytes * 16
+
+
+def macs_to_bytes(valid_mac_addresses: Sequence[str]) -> bytes:
+    """
+    Convert many validated MAC strings to one run of canonical 6-byte MACs.
+
+    Raises ValueError if any MAC is not 12 hex digits: a short one followed
+    by a long one would otherwise shift every later MAC in the run.
+    """
+    # One join, translate and split for the lot; split() also drops the
+    # whitespace around each MAC
+    digits = "\n".join(valid_mac_addresses).translate(_MAC_SEPARATORS).split()
+    if len(digits) != len(valid_mac_addresses) or set(map(len, digits)) - {12}:
+        raise ValueError("Invalid MAC address format")
+    return bytes.fromhex("".join(digits))
+
+
+def build_magic_packets(macs: bytes) -> memoryview:
+    """
+    Build the packets for a run of canonical 6-byte MACs in one buffer.
+
+    Packet ``i`` is ``buffer[i * PACKET_SIZE : (i + 1) * PACKET_SIZE]``, so
+    each one can be sent as a zero-copy slice. With NumPy installed the
+    buffer is filled by tiling; otherwise each of the 102 byte positions is
+    written for all packets at once with a strided slice assignment.
+    """
+    count, rest = divmod(len(macs), 6)
+    if rest:
+        raise ValueError("MACs must be 6 bytes each")
+    if np is not None:
+        grid = np.empty((count, 17, 6), dtype=np.uint8)
+        grid[:, 0] = 0xFF
+        grid[:, 1:] = np.frombuffer(macs, dtype=np.uint8).reshape(count, 1, 6)
+        return memoryview(grid.reshape(-1))
+    buffer = bytearray(PACKET_SIZE * count)
+    sync = b"\xff" * count
+    for i in range(6):
+        buffer[i::PACKET_SIZE] = sync
+    for i in range(6):
+        column = macs[i::6]
+        for offset in range(6 + i, PACKET_SIZE, 6):
+            buffer[offset::PACKET_SIZE] = column
+    return memoryview(buffer)
+
+
+def prepare_host(host: Host) -> PreparedHost:
+    """Precompute everything needed to wake a saved (already validated) host."""
+    mac = mac_to_bytes(host["mac"].strip())
+    return PreparedHost(
+        mac=mac,
+        packet=build_magic_packet(mac),
+        address=(host["ip"], int(host["port"])),
+    )
+
+
+def prepare_hosts(hosts: Sequence[Host]) -> list[PreparedHost]:
+    """
+    prepare_host() for many hosts, with every packet built in one buffer.
+
+    Raises ValueError or TypeError if any host has an invalid MAC or port.
+    """
+    macs = macs_to_bytes([h["mac"] for h in hosts])
+    packets = build_magic_packets(macs)
+    return [
+        PreparedHost(
+            mac=macs[6 * i : 6 * i + 6],
+            packet=packets[PACKET_SIZE * i : PACKET_SIZE * (i + 1)],
+            address=(h["ip"], int(h["port"])),
+        )
+        for i, h in enumerate(hosts)
+    ]
+
+
+class SendPolicy(NamedTuple):
+    """How many times, how far apart and where each magic packet is sent."""
+
+    repeat: int = 1
+    interval: float = 0.0  # seconds between repeats
+    broadcasts: tuple[str, ...] = ()  # sent in addition to the target address
+
+    def destinations(self, address: tuple[str, int]) -> list[tuple[str, int]]:
+        ip, port = address
+        return [address] + [(b, port) for b in self.broadcasts if b != ip]
+
+    def packet_count(self, address: tuple[str, int]) -> int:
+        return self.repeat * len(self.destinations(address))
+
+
+DEFAULT_SEND_POLICY = SendPolicy(WAKE_REPEAT, WAKE_INTERVAL, WAKE_BROADCASTS)
+
+
+class _WakeProtocol(asyncio.DatagramProtocol):
+    def error_received(self, exc: Exception) -> None:
+        logger.warning("Failed to send magic packet: %s", exc)
+
+
+class WakeEngine:
+    """
+    Sends magic packets from the event loop over one persistent UDP socket.
+
+    The broadcast-enabled socket is opened once (in the app lifespan, or
+    lazily on first use) and reused for every send. Datagrams are handed to
+    the loop's transport, so a send never blocks other requests; delivery
+    errors are reported asynchronously and logged.
+    """
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._transport: asyncio.DatagramTransport | None = None
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if (
+            self._transport is not None
+            and self._loop is loop
+            and not self._transport.is_closing()
+        ):
+            return
+        self.close()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            _WakeProtocol, family=socket.AF_INET, allow_broadcast=True
+        )
+        self._loop = loop
+
+    def close(self) -> None:
+        if self._transport is not None:
+            try:
+                self._transport.close()
+            except RuntimeError:
+                # Transport of an event loop that is already closed
+                pass
+        self._transport = None
+        self._loop = None
+
+    async def send_packets(
+        self,
+        packets: Sequence[tuple[bytes | memoryview, tuple[str, int]]],
+        policy: SendPolicy | None = None,
+    ) -> None:
+        """
+        Send prebuilt packets back to back over the shared socket.
+
+        Packets may be memoryview slices of one buffer (see
+        build_magic_packets()); they are handed to the socket without a copy.
+
+        The policy may fan each packet out to extra broadcast addresses and
+        repeat the whole round; later rounds are scheduled with loop timers,
+        so a burst costs no thread and no blocking sleep.
+        """
+        policy = policy or DEFAULT_SEND_POLICY
+        await self.start()
+        assert self._loop is not None and self._transport is not None
+        sendto = self._transport.sendto
+        datagrams = [
+            (packet, destination)
+            for packet, address in packets
+            for destination in policy.destinations(address)
+        ]
+        done = self._loop.create_future()
+
+        def send_round(last: bool) -> None:
+            for packet, destination in datagrams:
+                sendto(packet, destination)
+            if last and not done.done():
+                done.set_result(None)
+
+        send_round(policy.repeat <= 1)
+        timers = [
+            self._loop.call_later(
+                i * policy.interval, send_round, i == policy.repeat - 1
+            )
+            for i in range(1, policy.repeat)
+        ]
+        try:
+            await done
+        finally:
+            for timer in timers:
+                timer.cancel()
+
+    async def send_packet(
+        self,
+        packet: bytes | memoryview,
+        address: tuple[str, int],
+        policy: SendPolicy | None = None,
+    ) -> None:
+        await self.send_packets([(packet, address)], policy)
+
+    async def send_prepared(
+        self, prepared: PreparedHost, policy: SendPolicy | None = None
+    ) -> None:
+        """Fast path for saved hosts: no parsing or validation, one sendto."""
+        await self.send_packets([(prepared.packet, prepared.address)], policy)
+
+    async def send(
+        self,
+        mac_address: str,
+        ip_address: str,
+        port: int = 9,
+        policy: SendPolicy | None = None,
+    ) -> bool:
+        """Async counterpart of wake_on_lan(); same validation and errors."""
+        port = _validate_target(mac_address, ip_address, port)
+        await self.send_packet(
+            create_magic_packet(mac_address), (ip_address, port), policy
+        )
+        return True
 
-    # Convert MAC address to bytes
-    mac_bytes = bytes.fromhex(valid_mac_address)
 
-    # Create magic packet
-    magic_packet = b"\xff" * 6 + mac_bytes * 16
-    return magic_packet
+wake_engine = WakeEngine()
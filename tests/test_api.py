@@ -1,8 +1,12 @@
 import asyncio
+import csv
+import io
+import json
 
 import httpx
 
 from wol_service import app
+from wol_service.wol import create_magic_packet
 
 ADMIN_USER = "test_admin"
 ADMIN_PASS = "test_password"
@@ -38,3 +42,829 @@ def test_add_host_validates_input():
             assert response.status_code == 400
 
     asyncio.run(_run())
+
+
+def test_add_list_delete_host():
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            host = {
+                "name": "api-host",
+                "mac": "AA:BB:CC:DD:EE:01",
+                "ip": "192.168.1.255",
+                "port": 9,
+            }
+            response = await client.post(
+                "/api/hosts", data={**host, "csrf_token": csrf_token}
+            )
+            assert response.status_code == 200
+            response = await client.post(
+                "/api/hosts",
+                data={**host, "name": "dup-mac", "csrf_token": csrf_token},
+            )
+            assert response.status_code == 400
+            response = await client.get("/api/hosts")
+            assert host in response.json()
+            response = await client.request(
+                "DELETE",
+                "/api/hosts",
+                data={"name": "api-host", "csrf_token": csrf_token},
+            )
+            assert response.status_code == 200
+            response = await client.get("/api/hosts")
+            assert host not in response.json()
+
+    asyncio.run(_run())
+
+
+def test_bulk_import_ndjson_and_csv_with_row_errors():
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            ndjson = "\n".join(
+                [
+                    json.dumps(
+                        {"name": "bulk-1", "mac": "10:00:00:00:00:01", "ip": "10.0.0.1"}
+                    ),
+                    json.dumps(
+                        {"name": "bulk-2", "mac": "bad", "ip": "10.0.0.2", "port": 9}
+                    ),
+                    "not json",
+                    json.dumps(
+                        {"name": "bulk-1", "mac": "10:00:00:00:00:03", "ip": "10.0.0.3"}
+                    ),
+                    json.dumps(
+                        {
+                            "name": "bulk-3",
+                            "mac": "10:00:00:00:00:04",
+                            "ip": "10.0.0.4",
+                            "port": 9.7,
+                        }
+                    ),
+                    json.dumps(
+                        {
+                            "name": "bulk-4",
+                            "mac": "10:00:00:00:00:05",
+                            "ip": "10.0.0.5",
+                            "port": True,
+                        }
+                    ),
+                ]
+            )
+            response = await client.post(
+                "/api/hosts/bulk",
+                content=ndjson,
+                headers={
+                    "Content-Type": "application/x-ndjson",
+                    "X-CSRF-Token": csrf_token,
+                },
+            )
+            assert response.status_code == 200
+            body = response.json()
+            assert body["added"] == 1
+            assert [e["line"] for e in body["errors"]] == [2, 3, 4, 5, 6]
+            assert body["errors"][3]["error"] == "Port must be an integer"
+
+            csv_body = (
+                "name,mac,ip,port\n"
+                "bulk-csv-1,10:00:00:00:01:01,10.0.0.255,7\n"
+                "bulk-csv-2,10:00:00:00:01:02,10.0.0.255,\n"
+                "bulk-csv-3,10:00:00:00:01:03,10.0.0.255,99999\n"
+                "bulk-csv-4,10:00:00:00:01:04,10.0.0.255,9.5\n"
+            )
+            response = await client.post(
+                "/api/hosts/bulk",
+                content=csv_body,
+                headers={"Content-Type": "text/csv", "X-CSRF-Token": csrf_token},
+            )
+            body = response.json()
+            assert body["added"] == 2
+            assert body["errors"] == [
+                {"line": 4, "error": "Invalid port number"},
+                {"line": 5, "error": "Port must be an integer"},
+            ]
+
+            hosts = {h["name"]: h for h in (await client.get("/api/hosts")).json()}
+            assert hosts["bulk-csv-1"]["port"] == 7
+            assert hosts["bulk-csv-2"]["port"] == 9
+
+    asyncio.run(_run())
+
+
+def test_bulk_import_requires_csrf():
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            await login_and_get_csrf(client)
+            response = await client.post(
+                "/api/hosts/bulk",
+                content="{}",
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+            assert response.status_code == 403
+
+    asyncio.run(_run())
+
+
+def test_export_streams_all_hosts():
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            await login_and_get_csrf(client)
+            hosts = (await client.get("/api/hosts")).json()
+            response = await client.get("/api/hosts/export")
+            assert response.headers["content-type"].startswith("application/x-ndjson")
+            exported = [json.loads(line) for line in response.text.splitlines()]
+            assert exported == hosts
+            response = await client.get("/api/hosts/export", params={"format": "csv"})
+            rows = list(csv.DictReader(io.StringIO(response.text)))
+            assert [r["name"] for r in rows] == [h["name"] for h in hosts]
+            assert [int(r["port"]) for r in rows] == [h["port"] for h in hosts]
+
+    asyncio.run(_run())
+
+
+def test_list_hosts_pagination_filters_and_fields():
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            body = "".join(
+                json.dumps(
+                    {
+                        "name": f"page-{i}",
+                        "mac": f"20:00:00:00:00:{i:02x}",
+                        "ip": f"172.16.{i % 2}.255",
+                    }
+                )
+                + "\n"
+                for i in range(10)
+            )
+            await client.post(
+                "/api/hosts/bulk",
+                content=body,
+                headers={
+                    "Content-Type": "application/x-ndjson",
+                    "X-CSRF-Token": csrf_token,
+                },
+            )
+            response = await client.get(
+                "/api/hosts", params={"name": "page-", "limit": 3, "offset": 2}
+            )
+            assert response.headers["X-Total-Count"] == "10"
+            assert [h["name"] for h in response.json()] == [
+                "page-2",
+                "page-3",
+                "page-4",
+            ]
+            response = await client.get(
+                "/api/hosts", params={"ip": "172.16.1.", "mac": "2000000000"}
+            )
+            assert len(response.json()) == 5
+            response = await client.get(
+                "/api/hosts", params={"mac": "20-00-00-00-00-01", "fields": "name,ip"}
+            )
+            assert response.json() == [{"name": "page-1", "ip": "172.16.1.255"}]
+            response = await client.get(
+                "/api/hosts", params={"mac": "20:00:00:00:00:09", "fields": "name"}
+            )
+            assert response.json() == [{"name": "page-9"}]
+            response = await client.get("/api/hosts", params={"fields": "secret"})
+            assert response.status_code == 400
+
+    asyncio.run(_run())
+
+
+def test_list_hosts_etag_and_not_modified():
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            first = await client.get("/api/hosts")
+            etag = first.headers["ETag"]
+            cached = await client.get("/api/hosts", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.content == b""
+            other_query = await client.get(
+                "/api/hosts", params={"limit": 1}, headers={"If-None-Match": etag}
+            )
+            assert other_query.status_code == 200
+            await client.post(
+                "/api/hosts",
+                data={
+                    "name": "etag-host",
+                    "mac": "30:00:00:00:00:01",
+                    "ip": "10.1.1.255",
+                    "port": 9,
+                    "csrf_token": csrf_token,
+                },
+            )
+            changed = await client.get("/api/hosts", headers={"If-None-Match": etag})
+            assert changed.status_code == 200
+            assert changed.headers["ETag"] != etag
+
+    asyncio.run(_run())
+
+
+def test_wake_batch_resolves_saved_and_manual_targets(monkeypatch):
+    sent = []
+
+    async def fake_send_packets(packets, policy=None):
+        sent.extend(packets)
+
+    monkeypatch.setattr("wol_service.wol.wake_engine.send_packets", fake_send_packets)
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            await client.post(
+                "/api/hosts",
+                data={
+                    "name": "batch-saved",
+                    "mac": "40:00:00:00:00:01",
+                    "ip": "10.2.0.255",
+                    "port": 7,
+                    "csrf_token": csrf_token,
+                },
+            )
+            response = await client.post(
+                "/api/wake/batch",
+                json={
+                    "targets": [
+                        {"name": "batch-saved"},
+                        {"name": "batch-missing"},
+                        {"mac": "40:00:00:00:00:02", "ip": "10.2.0.2"},
+                        {"mac": "nope"},
+                    ]
+                },
+                headers={"X-CSRF-Token": csrf_token},
+            )
+            assert response.status_code == 200
+            body = response.json()
+            assert body["sent"] == 2
+            assert [r["ok"] for r in body["results"]] == [True, False, True, False]
+            assert body["results"][1]["error"] == "Host not found"
+
+    asyncio.run(_run())
+    assert sent == [
+        (create_magic_packet("40:00:00:00:00:01"), ("10.2.0.255", 7)),
+        (create_magic_packet("40:00:00:00:00:02"), ("10.2.0.2", 9)),
+    ]
+
+
+def test_wake_saved_host_by_name_and_mac(monkeypatch):
+    sent = []
+
+    async def fake_send_prepared(prepared, policy=None):
+        sent.append(prepared)
+
+    monkeypatch.setattr("wol_service.wol.wake_engine.send_prepared", fake_send_prepared)
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            await client.post(
+                "/api/hosts",
+                data={
+                    "name": "by name",
+                    "mac": "50:00:00:00:00:01",
+                    "ip": "10.3.0.255",
+                    "port": 9,
+                    "csrf_token": csrf_token,
+                },
+            )
+            headers = {"X-CSRF-Token": csrf_token}
+            response = await client.post("/api/hosts/by name/wake", headers=headers)
+            assert response.status_code == 200
+            response = await client.post(
+                "/api/hosts/by-mac/50-00-00-00-00-01/wake", headers=headers
+            )
+            assert response.status_code == 200
+            # Same MAC again right away: coalesced into the first wake
+            assert response.json()["coalesced"] is True
+            response = await client.post("/api/hosts/nobody/wake", headers=headers)
+            assert response.status_code == 404
+            response = await client.post("/api/hosts/by name/wake")
+            assert response.status_code == 403
+
+            # Names may contain "/", as the dashboard's encoded URLs do
+            await client.post(
+                "/api/hosts",
+                data={
+                    "name": "rack1/pc",
+                    "mac": "50:00:00:00:00:02",
+                    "ip": "10.3.1.255",
+                    "csrf_token": csrf_token,
+                },
+            )
+            response = await client.post("/api/hosts/rack1%2Fpc/wake", headers=headers)
+            assert response.status_code == 200
+            response = await client.put(
+                "/api/hosts/rack1%2Fpc/tags", json={"tags": ["rack1"]}, headers=headers
+            )
+            assert response.status_code == 200
+            assert response.json()["name"] == "rack1/pc"
+
+    asyncio.run(_run())
+    assert [p.address for p in sent] == [("10.3.0.255", 9), ("10.3.1.255", 9)]
+    assert sent[0].packet == create_magic_packet("50:00:00:00:00:01")
+
+
+def test_wake_send_policy_overrides(monkeypatch):
+    policies = []
+
+    async def fake_send_prepared(prepared, policy=None):
+        policies.append(policy)
+
+    monkeypatch.setattr("wol_service.wol.wake_engine.send_prepared", fake_send_prepared)
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            await client.post(
+                "/api/hosts",
+                data={
+                    "name": "burst",
+                    "mac": "60:00:00:00:00:01",
+                    "ip": "10.4.0.255",
+                    "port": 9,
+                    "csrf_token": csrf_token,
+                },
+            )
+            headers = {"X-CSRF-Token": csrf_token}
+            response = await client.post(
+                "/api/hosts/burst/wake",
+                params={
+                    "repeat": 3,
+                    "interval_ms": 50,
+                    "broadcast": ["10.5.0.255", "255.255.255.255"],
+                },
+                headers=headers,
+            )
+            assert response.status_code == 200
+            for params in ({"repeat": 0}, {"interval_ms": -1}, {"broadcast": "x"}):
+                response = await client.post(
+                    "/api/hosts/burst/wake", params=params, headers=headers
+                )
+                assert response.status_code == 400
+
+    asyncio.run(_run())
+    assert len(policies) == 1
+    assert policies[0].repeat == 3
+    assert policies[0].interval == 0.05
+    assert policies[0].broadcasts == ("10.5.0.255", "255.255.255.255")
+
+
+def test_async_wake_returns_a_job(monkeypatch):
+    sent = []
+
+    async def fake_send_packets(packets, policy=None):
+        sent.extend(packets)
+
+    monkeypatch.setattr("wol_service.wol.wake_engine.send_packets", fake_send_packets)
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            headers = {"X-CSRF-Token": csrf_token}
+            await client.post(
+                "/api/hosts",
+                data={
+                    "name": "queued",
+                    "mac": "b0:00:00:00:00:01",
+                    "ip": "10.9.0.255",
+                    "port": 9,
+                    "csrf_token": csrf_token,
+                },
+            )
+            response = await client.post(
+                "/api/hosts/queued/wake", params={"async": True}, headers=headers
+            )
+            assert response.status_code == 202
+            assert response.headers["Location"] == response.json()["url"]
+            single = response.json()["url"]
+            response = await client.post(
+                "/api/wake/batch",
+                params={"async": True},
+                json={"targets": [{"mac": "b0:00:00:00:00:02"}, {"mac": "nope"}]},
+                headers=headers,
+            )
+            assert response.status_code == 202
+            batch = response.json()["url"]
+            response = await client.post(
+                "/api/wake/batch",
+                json={"targets": [{"name": "queued"}], "verify": True},
+                headers=headers,
+            )
+            assert response.status_code == 400
+
+            for _ in range(50):
+                job = (await client.get(batch)).json()
+                if job["state"] == "done":
+                    break
+                await asyncio.sleep(0.01)
+            assert job["state"] == "done"
+            assert [r["ok"] for r in job["results"]] == [True, False]
+            assert job["results"][0]["status"] == "sent"
+            job = (await client.get(single)).json()
+            assert job["state"] == "done"
+            assert job["results"][0]["name"] == "queued"
+            assert job["results"][0]["status"] == "sent"
+            assert job["results"][0]["ok"] is True
+            assert (await client.get("/api/jobs/unknown")).status_code == 404
+
+    asyncio.run(_run())
+    assert sent == [
+        (create_magic_packet("b0:00:00:00:00:01"), ("10.9.0.255", 9)),
+        (create_magic_packet("b0:00:00:00:00:02"), ("255.255.255.255", 9)),
+    ]
+
+
+def test_schedule_crud():
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            headers = {"X-CSRF-Token": csrf_token}
+            await client.post(
+                "/api/hosts",
+                data={
+                    "name": "scheduled",
+                    "mac": "70:00:00:00:00:01",
+                    "ip": "10.6.0.255",
+                    "port": 9,
+                    "csrf_token": csrf_token,
+                },
+            )
+            for body in (
+                {"host": "scheduled"},
+                {"host": "scheduled", "cron": "0 7 * * *", "at": 4102444800},
+                {"host": "scheduled", "cron": "61 * * * *"},
+                {"host": "scheduled", "at": 1},
+                {"host": "nobody", "cron": "0 7 * * *"},
+            ):
+                response = await client.post(
+                    "/api/schedules", json=body, headers=headers
+                )
+                assert response.status_code == 400, body
+
+            response = await client.post(
+                "/api/schedules",
+                json={"host": "scheduled", "cron": "0 7 * * 1-5"},
+                headers=headers,
+            )
+            assert response.status_code == 201
+            created = response.json()
+            assert created["next_run"] is not None
+            url = f"/api/schedules/{created['id']}"
+
+            response = await client.put(
+                url,
+                json={"host": "scheduled", "cron": "0 7 * * 1-5", "enabled": False},
+                headers=headers,
+            )
+            assert response.status_code == 200
+            assert response.json()["enabled"] is False
+            assert response.json()["next_run"] is None
+
+            response = await client.get("/api/schedules")
+            assert created["id"] in [s["id"] for s in response.json()]
+            assert (await client.get(url)).status_code == 200
+            assert (await client.delete(url)).status_code == 403
+            assert (await client.delete(url, headers=headers)).status_code == 200
+            assert (await client.get(url)).status_code == 404
+
+    asyncio.run(_run())
+
+
+def test_wake_and_verify_streams_progress(monkeypatch):
+    async def fake_send_prepared(prepared, policy=None):
+        pass
+
+    monkeypatch.setattr("wol_service.wol.wake_engine.send_prepared", fake_send_prepared)
+
+    async def _run():
+        server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            headers = {"X-CSRF-Token": csrf_token}
+            await client.post(
+                "/api/hosts",
+                data={
+                    "name": "verified",
+                    "mac": "80:00:00:00:00:01",
+                    "ip": "255.255.255.255",
+                    "port": 9,
+                    "csrf_token": csrf_token,
+                },
+            )
+            response = await client.post(
+                "/api/hosts/verified/wake", params={"verify": True}, headers=headers
+            )
+            assert response.status_code == 400
+            response = await client.post(
+                "/api/hosts/verified/wake",
+                params={"verify": True, "probe_ip": "127.0.0.1", "probe_ports": port},
+                headers=headers,
+            )
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = [
+                line.split(": ", 1)[1]
+                for line in response.text.splitlines()
+                if line.startswith("event: ")
+            ]
+            assert events == ["sent", "up"]
+
+            # A probe address saved with the host is used when none is given
+            response = await client.post(
+                "/api/hosts",
+                data={
+                    "name": "probed",
+                    "mac": "80:00:00:00:00:02",
+                    "ip": "192.168.1.255",
+                    "probe_ip": "127.0.0.1",
+                    "csrf_token": csrf_token,
+                },
+            )
+            assert response.status_code == 200
+            response = await client.get(
+                "/api/hosts", params={"name": "probed", "fields": "name,probe_ip"}
+            )
+            assert response.json() == [{"name": "probed", "probe_ip": "127.0.0.1"}]
+            response = await client.post(
+                "/api/hosts/probed/wake",
+                params={"verify": True, "probe_ports": port},
+                headers=headers,
+            )
+            assert response.status_code == 200
+            assert "event: up" in response.text
+            response = await client.post(
+                "/api/hosts",
+                data={
+                    "name": "bad-probe",
+                    "mac": "80:00:00:00:00:03",
+                    "ip": "192.168.1.255",
+                    "probe_ip": "255.255.255.255",
+                    "csrf_token": csrf_token,
+                },
+            )
+            assert response.status_code == 400
+            # In a /23, an address ending in .255 can be an ordinary host
+            response = await client.post(
+                "/api/hosts",
+                data={
+                    "name": "wide-subnet",
+                    "mac": "80:00:00:00:00:04",
+                    "ip": "10.0.1.255",
+                    "probe_ip": "10.0.1.255",
+                    "csrf_token": csrf_token,
+                },
+            )
+            assert response.status_code == 200
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(_run())
+
+
+def test_host_tags_and_group_wake(monkeypatch):
+    sent = []
+
+    async def fake_send_prepared(prepared, policy=None):
+        sent.append(prepared.mac.hex(":"))
+
+    monkeypatch.setattr("wol_service.wol.wake_engine.send_prepared", fake_send_prepared)
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            headers = {"X-CSRF-Token": csrf_token}
+            for i in range(3):
+                response = await client.post(
+                    "/api/hosts",
+                    data={
+                        "name": f"lab-{i}",
+                        "mac": f"90:00:00:00:00:0{i}",
+                        "ip": "10.7.0.255",
+                        "tags": "Lab, floor2" if i < 2 else "",
+                        "csrf_token": csrf_token,
+                    },
+                )
+                assert response.status_code == 200
+            response = await client.post(
+                "/api/hosts",
+                data={
+                    "name": "bad-tag",
+                    "mac": "90:00:00:00:00:09",
+                    "ip": "10.7.0.255",
+                    "tags": "no spaces",
+                    "csrf_token": csrf_token,
+                },
+            )
+            assert response.status_code == 400
+
+            response = await client.put(
+                "/api/hosts/lab-2/tags", json={"tags": ["lab"]}, headers=headers
+            )
+            assert response.status_code == 200
+            assert response.json()["tags"] == ["lab"]
+            response = await client.put(
+                "/api/hosts/nobody/tags", json={"tags": ["lab"]}, headers=headers
+            )
+            assert response.status_code == 404
+
+            groups = (await client.get("/api/groups")).json()
+            assert groups["lab"] == 3 and groups["floor2"] == 2
+            response = await client.get("/api/hosts", params={"tag": "floor2"})
+            assert [h["name"] for h in response.json()] == ["lab-0", "lab-1"]
+            response = await client.get("/api/groups/nothing")
+            assert response.status_code == 404
+
+            response = await client.post(
+                "/api/groups/lab/wake",
+                params={"concurrency": 2, "stagger_ms": 10},
+                headers=headers,
+            )
+            assert response.status_code == 200
+            assert response.headers["x-run-id"]
+            events = [
+                line.split(": ", 1)[1]
+                for line in response.text.splitlines()
+                if line.startswith("event: ")
+            ]
+            assert events[0] == "started"
+            assert events[-1] == "done"
+            assert events.count("host") == 6
+            response = await client.post(
+                "/api/groups/lab/wake", params={"concurrency": 0}, headers=headers
+            )
+            assert response.status_code == 400
+            response = await client.delete("/api/group-wakes/unknown", headers=headers)
+            assert response.status_code == 404
+
+    asyncio.run(_run())
+    assert sorted(sent) == [f"90:00:00:00:00:0{i}" for i in range(3)]
+
+
+def test_list_hosts_with_cached_status(monkeypatch):
+    from wol_service.models import HostStatus
+    from wol_service.monitor import monitor
+
+    monkeypatch.setattr(
+        monitor, "_status", {"status-up": HostStatus(True, 1700000000.0, 22)}
+    )
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            for i, name in enumerate(["status-up", "status-unknown"]):
+                await client.post(
+                    "/api/hosts",
+                    data={
+                        "name": name,
+                        "mac": f"a0:00:00:00:00:0{i}",
+                        "ip": "10.8.0.1",
+                        "csrf_token": csrf_token,
+                    },
+                )
+            response = await client.get(
+                "/api/hosts", params={"name": "status-", "status": True}
+            )
+            rows = {h["name"]: h["status"] for h in response.json()}
+            assert rows["status-up"] == {
+                "up": True,
+                "checked": 1700000000.0,
+                "port": 22,
+            }
+            assert rows["status-unknown"] is None
+            etag = response.headers["ETag"]
+            response = await client.get(
+                "/api/hosts",
+                params={"name": "status-up", "fields": "mac", "status": True},
+            )
+            assert response.status_code == 200
+            assert response.json() == [
+                {"mac": "a0:00:00:00:00:00", "status": rows["status-up"]}
+            ]
+            response = await client.get("/api/hosts", params={"name": "status-"})
+            assert "status" not in response.json()[0]
+
+            monkeypatch.setattr(monitor, "content_version", monitor.content_version + 1)
+            response = await client.get(
+                "/api/hosts",
+                params={"name": "status-", "status": True},
+                headers={"If-None-Match": etag},
+            )
+            assert response.status_code == 200
+
+            response = await client.get("/api/hosts/status")
+            assert response.json()["status-up"]["up"] is True
+
+    asyncio.run(_run())
+
+
+def test_api_keys_authenticate_machine_clients(monkeypatch):
+    sent = []
+
+    async def fake_send_packets(packets, policy=None):
+        sent.extend(packets)
+
+    monkeypatch.setattr("wol_service.wol.wake_engine.send_packets", fake_send_packets)
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            headers = {"X-CSRF-Token": csrf_token}
+            response = await client.post(
+                "/api/keys",
+                json={"name": "ci", "scopes": ["read", "admin"]},
+                headers=headers,
+            )
+            assert response.status_code == 400
+            response = await client.post(
+                "/api/keys", json={"name": "ci", "scopes": ["read", "wake"]}
+            )
+            assert response.status_code == 403
+            response = await client.post(
+                "/api/keys",
+                json={"name": "ci", "scopes": ["read", "wake"]},
+                headers=headers,
+            )
+            assert response.status_code == 201
+            created = response.json()
+            listed = (await client.get("/api/keys")).json()
+            assert {k["id"]: k["scopes"] for k in listed}[created["id"]] == [
+                "read",
+                "wake",
+            ]
+            assert all("key" not in k and "digest" not in k for k in listed)
+
+            # No cookies and no CSRF token: the bearer key is enough
+            bearer = {"Authorization": f"Bearer {created['key']}"}
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://testserver", headers=bearer
+            ) as machine:
+                assert (await machine.get("/api/hosts")).status_code == 200
+                response = await machine.post(
+                    "/api/wake/batch", json={"targets": [{"mac": "b1:00:00:00:00:01"}]}
+                )
+                assert response.status_code == 200
+                assert response.json()["results"][0]["ok"] is True
+                response = await machine.post(
+                    "/api/hosts",
+                    data={"name": "k", "mac": "b1:00:00:00:00:02", "ip": "10.0.0.255"},
+                )
+                assert response.status_code == 403
+                # Keys cannot manage keys
+                assert (await machine.get("/api/keys")).status_code == 401
+
+                response = await client.delete(
+                    f"/api/keys/{created['id']}", headers=headers
+                )
+                assert response.status_code == 200
+                assert (await machine.get("/api/hosts")).status_code == 401
+
+    asyncio.run(_run())
+    assert len(sent) == 1
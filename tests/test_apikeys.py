@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from wol_service.apikeys import ApiKeyStore
+
+
+def test_only_digests_are_stored_and_reloaded(tmp_path):
+    path = str(tmp_path / "api_keys.json")
+
+    async def _run():
+        store = ApiKeyStore(path, "secret")
+        key, secret = await store.create("ci", ["write", "read", "bogus"])
+        assert key["scopes"] == ["read", "write"]
+        assert store.verify(secret)["id"] == key["id"]
+        assert store.verify(secret + "x") is None
+        return key, secret
+
+    key, secret = asyncio.run(_run())
+    stored = (tmp_path / "api_keys.json").read_text(encoding="utf-8")
+    assert secret not in stored
+    assert json.loads(stored)[0]["digest"] == key["digest"]
+
+    assert ApiKeyStore(path, "secret").verify(secret)["name"] == "ci"
+    # Digests are keyed by SECRET_KEY; a new key invalidates them all
+    assert ApiKeyStore(path, "other").verify(secret) is None
+
+
+def test_revoked_keys_stop_verifying(tmp_path):
+    path = str(tmp_path / "api_keys.json")
+
+    async def _run():
+        store = ApiKeyStore(path, "secret")
+        kept, kept_secret = await store.create("kept", ["read"])
+        revoked, revoked_secret = await store.create("revoked", ["wake"])
+        assert await store.revoke(revoked["id"]) is True
+        assert await store.revoke(revoked["id"]) is False
+        assert store.verify(revoked_secret) is None
+        assert [k["name"] for k in store.list()] == ["kept"]
+        return revoked_secret
+
+    revoked_secret = asyncio.run(_run())
+    assert ApiKeyStore(path, "secret").verify(revoked_secret) is None
+
+
+def test_workers_share_creates_and_revocations(tmp_path):
+    path = str(tmp_path / "api_keys.json")
+    first = ApiKeyStore(path, "secret")
+    second = ApiKeyStore(path, "secret")
+
+    async def _run():
+        key, secret = await first.create("ci", ["read"])
+        assert second.verify(secret)["id"] == key["id"]
+        # Each worker's write starts from the file, not from its own copy
+        await second.create("backup", ["wake"])
+        await first.create("deploy", ["write"])
+        assert sorted(k["name"] for k in second.list()) == ["backup", "ci", "deploy"]
+        assert await second.revoke(key["id"]) is True
+        assert first.verify(secret) is None
+
+    asyncio.run(_run())
@@ -1,4 +1,23 @@
-from wol_service.auth import get_password_hash, verify_password
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException, Request
+from jose import jwt
+from passlib.context import CryptContext
+
+from wol_service import auth
+from wol_service.auth import (
+    PasswordVerifier,
+    TokenCache,
+    VerifierBusyError,
+    create_access_token,
+    get_password_hash,
+    password_needs_rehash,
+    require_user_from_cookie,
+    verify_password,
+)
 
 
 def test_password_hashing():
@@ -6,3 +25,104 @@ def test_password_hashing():
     hashed = get_password_hash(password)
     assert verify_password(password, hashed) is True
     assert verify_password("wrong_password", hashed) is False
+
+
+def test_dummy_hash_is_prepared_once(monkeypatch):
+    monkeypatch.setattr(auth, "_dummy_hash", None)
+    auth.prepare_dummy_hash()
+    prepared = auth._dummy_hash
+    assert prepared is not None
+
+    def no_hashing(password):
+        raise AssertionError("the dummy hash was built again")
+
+    monkeypatch.setattr(auth, "get_password_hash", no_hashing)
+    auth.prepare_dummy_hash()
+    assert auth.authenticate_user({}, "nobody", "secret") is None
+    assert auth._dummy_hash == prepared
+
+
+def _request_with(token: str) -> Request:
+    cookie = f"access_token={token}".encode()
+    return Request({"type": "http", "headers": [(b"cookie", cookie)]})
+
+
+def test_verified_tokens_are_cached(monkeypatch):
+    decodes = []
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decodes.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    monkeypatch.setattr(auth, "token_cache", TokenCache(size=2))
+    token = create_access_token({"sub": "alice"})
+
+    async def _run():
+        for _ in range(3):
+            assert await require_user_from_cookie(_request_with(token)) == "alice"
+        assert len(decodes) == 1
+        assert (auth.token_cache.hits, auth.token_cache.misses) == (2, 1)
+        # A new key empties the cache, and the old token no longer verifies
+        monkeypatch.setattr(auth, "SECRET_KEY", "another-key")
+        with pytest.raises(HTTPException):
+            await require_user_from_cookie(_request_with(token))
+        assert len(decodes) == 2
+
+    asyncio.run(_run())
+
+
+def test_token_cache_expiry_and_bound():
+    cache = TokenCache(size=2)
+    now = time.time()
+    cache.put("a", "alice", now + 60)
+    cache.put("b", "bob", now - 1)
+    assert cache.get("a", "key") is None  # first use of a key starts empty
+    cache.put("a", "alice", now + 60)
+    cache.put("b", "bob", now - 1)
+    assert cache.get("a", "key") == "alice"
+    assert cache.get("b", "key") is None  # expired
+    cache.put("c", "carol", now + 60)
+    cache.put("d", "dave", now + 60)
+    assert cache.get("a", "key") is None  # least recently used, evicted
+    cache.discard("d")
+    assert cache.get("d", "key") is None
+    assert cache.get("c", "key") == "carol"
+
+
+def test_password_verifier_keeps_loop_free_and_fails_fast(monkeypatch):
+    release = threading.Event()
+
+    def slow_verify(plain_password, hashed_password):
+        release.wait(1)
+        return plain_password == hashed_password
+
+    monkeypatch.setattr(auth, "verify_password", slow_verify)
+    verifier = PasswordVerifier(workers=1, queue=1)
+
+    async def _run():
+        first = asyncio.create_task(verifier.verify("pw", "pw"))
+        second = asyncio.create_task(verifier.verify("pw", "other"))
+        await asyncio.sleep(0.05)
+        # The loop keeps running while both verifies are pending
+        assert not first.done() and verifier.in_flight == 2
+        with pytest.raises(VerifierBusyError):
+            await verifier.verify("pw", "pw")
+        release.set()
+        assert await first is True
+        assert await second is False
+        assert verifier.in_flight == 0
+
+    try:
+        asyncio.run(_run())
+    finally:
+        verifier.close()
+
+
+def test_hashes_with_other_parameters_need_rehash():
+    cheap = CryptContext(
+        schemes=["argon2"], argon2__rounds=1, argon2__memory_cost=1024
+    ).hash("pw")
+    assert password_needs_rehash(cheap) is True
+    assert password_needs_rehash(get_password_hash("pw")) is False
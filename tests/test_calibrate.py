@@ -0,0 +1,18 @@
+from wol_service.calibrate import calibrate, main
+
+
+def test_calibrate_suggests_setting_within_target():
+    results, best = calibrate(0.05, 1, memory_costs=(2048, 1024), runs=1)
+    assert [r.memory_cost for r in results][:2] == [1024, 2048]
+    assert best is not None
+    assert best.seconds <= 0.05
+    assert best.time_cost >= 1 and best.parallelism == 1
+    # Nothing fits an impossible target
+    assert calibrate(1e-9, 1, memory_costs=(1024,), runs=1)[1] is None
+
+
+def test_calibrate_prints_env_settings(capsys, monkeypatch):
+    monkeypatch.setattr("wol_service.calibrate.MEMORY_COSTS", (1024,))
+    main(["--target-ms", "50", "--parallelism", "1", "--runs", "1"])
+    out = capsys.readouterr().out
+    assert "WOL_ARGON2_MEMORY_KIB=1024" in out
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+
+from wol_service import events
+from wol_service.events import EventHub, event_stream, hub
+from wol_service.models import Host
+from wol_service.ratelimit import WakeLimiter
+from wol_service.registry import HostRegistry
+from wol_service.storage import JsonHostStorage
+
+
+def _parse(chunk: str) -> tuple[str, dict]:
+    event, data = chunk.strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+def test_hub_delivers_events_from_other_threads():
+    async def _run():
+        local = EventHub()
+        subscriber = local.subscribe()
+        thread = threading.Thread(target=local.publish, args=("ping", {"n": 1}))
+        thread.start()
+        thread.join()
+        assert await asyncio.wait_for(subscriber.queue.get(), 1) == ("ping", {"n": 1})
+        local.unsubscribe(subscriber)
+        assert local.subscribers == 0
+
+    asyncio.run(_run())
+
+
+def test_slow_subscriber_gets_a_fresh_snapshot(monkeypatch):
+    monkeypatch.setattr(hub, "queue_size", 4)
+    snapshots = 0
+
+    def snapshot():
+        nonlocal snapshots
+        snapshots += 1
+        return "snapshot", {"n": snapshots}
+
+    async def _run():
+        stream = event_stream(snapshot, keepalive=0.05)
+        assert _parse(await stream.__anext__()) == ("snapshot", {"n": 1})
+        for i in range(10):
+            hub.publish("tick", {"i": i})
+        await asyncio.sleep(0)
+        # The backlog overflowed and was replaced by a resync
+        assert _parse(await stream.__anext__()) == ("snapshot", {"n": 2})
+        # Only what was published after the last overflow is still queued
+        assert _parse(await stream.__anext__()) == ("tick", {"i": 9})
+        assert await stream.__anext__() == ": keepalive\n\n"
+        await stream.aclose()
+        assert hub.subscribers == 0
+
+    asyncio.run(_run())
+
+
+def test_stream_pushes_host_diffs_and_wake_results(tmp_path):
+    registry = HostRegistry(JsonHostStorage(str(tmp_path / "hosts.json")))
+    registry.add_listener(events._publish_host_changes)
+    limiter = WakeLimiter(mac_rate=0, max_pps=0)
+    limiter.add_listener(events.publish_wake)
+
+    async def _run():
+        stream = event_stream(lambda: ("snapshot", {"hosts": registry.hosts()}))
+        assert _parse(await stream.__anext__()) == ("snapshot", {"hosts": []})
+
+        host = Host(name="pc", mac="00-11-22-33-44-55", ip="10.0.0.255", port=9)
+        # Commits happen in a worker thread in the app
+        await asyncio.to_thread(registry.add, host)
+        event, data = _parse(await stream.__anext__())
+        assert event == "hosts"
+        assert data == {"changes": [{"op": "add", "host": dict(host)}]}
+
+        async def send():
+            pass
+
+        await limiter.wake("00-11-22-33-44-55", send)
+        await limiter.wake("00-11-22-33-44-55", send)
+        assert _parse(await stream.__anext__()) == (
+            "wake",
+            {"mac": "00:11:22:33:44:55", "status": "sent"},
+        )
+        assert _parse(await stream.__anext__())[1]["status"] == "coalesced"
+        await stream.aclose()
+
+    asyncio.run(_run())
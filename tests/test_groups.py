@@ -0,0 +1,100 @@
+import asyncio
+
+from wol_service import groups
+from wol_service.groups import GroupWake
+from wol_service.models import Host
+from wol_service.ratelimit import WakeLimiter
+from wol_service.wol import SendPolicy, prepare_host
+
+
+def _targets(count: int):
+    return [
+        (
+            f"pc-{i}",
+            prepare_host(
+                Host(
+                    name=f"pc-{i}",
+                    mac=f"00:00:00:00:01:{i:02x}",
+                    ip="10.0.0.255",
+                    port=9,
+                )
+            ),
+        )
+        for i in range(count)
+    ]
+
+
+def _patch_sender(monkeypatch, sent, delay=0.0):
+    async def fake_send_prepared(prepared, policy=None):
+        sent.append((asyncio.get_running_loop().time(), prepared.mac.hex()))
+        await asyncio.sleep(delay)
+
+    monkeypatch.setattr(groups.wake_engine, "send_prepared", fake_send_prepared)
+    monkeypatch.setattr(groups, "wake_limiter", WakeLimiter(max_pps=0, mac_rate=0))
+
+
+def test_group_wake_staggers_hosts(monkeypatch):
+    sent: list = []
+    _patch_sender(monkeypatch, sent)
+
+    async def _run():
+        run = GroupWake("lab", _targets(4), 10, 0.05, SendPolicy())
+        run.start()
+        events = [e async for e in run.events()]
+        assert events[0]["event"] == "started"
+        assert events[0]["hosts"] == 4
+        assert events[-1] == {
+            "event": "done",
+            "sent": 4,
+            "coalesced": 0,
+            "failed": 0,
+            "up": 0,
+            "timeout": 0,
+        }
+        statuses = [(e["host"], e["status"]) for e in events if e["event"] == "host"]
+        assert ("pc-3", "sent") in statuses
+        gaps = [b[0] - a[0] for a, b in zip(sent, sent[1:])]
+        assert all(gap >= 0.045 for gap in gaps)
+
+    asyncio.run(_run())
+
+
+def test_group_wake_limits_concurrency(monkeypatch):
+    sent: list = []
+    # Each host stays in progress for 0.1 s; two slots, no stagger
+    _patch_sender(monkeypatch, sent, delay=0.1)
+
+    async def _run():
+        run = GroupWake("lab", _targets(6), 2, 0, SendPolicy())
+        run.start()
+        [e async for e in run.events()]
+        starts = [t - sent[0][0] for t, _ in sent]
+        # Three waves of two
+        assert max(starts[:2]) < 0.05
+        assert 0.09 <= min(starts[2:4]) and max(starts[2:4]) < 0.15
+        assert 0.19 <= min(starts[4:])
+
+    asyncio.run(_run())
+
+
+def test_group_wake_can_be_cancelled(monkeypatch):
+    sent: list = []
+    _patch_sender(monkeypatch, sent)
+
+    async def _run():
+        run = GroupWake("lab", _targets(10), 1, 0.1, SendPolicy())
+        run.start()
+        assert groups.get_run(run.id) is run
+        events = []
+        async for event in run.events():
+            events.append(event)
+            if event.get("status") == "sent" and event["host"] == "pc-1":
+                assert run.cancel()
+        assert events[-1]["event"] == "cancelled"
+        assert events[-1]["sent"] == 2
+        assert events[-1]["skipped"] == 8
+        assert len(sent) == 2
+        assert groups.get_run(run.id) is None
+        assert not run.cancel()
+
+    asyncio.run(_run())
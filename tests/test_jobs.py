@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from wol_service import jobs as jobs_module
+from wol_service.jobs import JobQueue, JobQueueFullError, JobTarget, WakeJob
+from wol_service.models import Host
+from wol_service.ratelimit import WakeLimiter
+from wol_service.wol import SendPolicy, prepare_host
+
+
+def _job(*macs: str) -> WakeJob:
+    targets = []
+    for mac in macs:
+        prepared = prepare_host(Host(name="", mac=mac, ip="10.0.0.255", port=9))
+        targets.append(JobTarget(prepared, {"mac": mac, "ok": None}))
+    return WakeJob([t.result for t in targets], targets, SendPolicy())
+
+
+def _patch_sender(monkeypatch, sent, delay=0.0):
+    async def fake_send_packets(packets, policy=None):
+        await asyncio.sleep(delay)
+        sent.extend(packets)
+
+    monkeypatch.setattr(jobs_module.wake_engine, "send_packets", fake_send_packets)
+    monkeypatch.setattr(jobs_module, "wake_limiter", WakeLimiter(max_pps=0, mac_rate=0))
+
+
+def test_jobs_run_on_the_worker_pool(monkeypatch):
+    sent: list = []
+    _patch_sender(monkeypatch, sent)
+
+    async def _run():
+        queue = JobQueue(workers=2, size=8, history=8)
+        job = queue.submit(_job("00:00:00:00:02:01", "00:00:00:00:02:02"))
+        assert job.state == "queued"
+        assert queue.get(job.id) is job
+        assert [r["ok"] for r in job.to_dict()["results"]] == [None, None]
+        await queue.join()
+        assert job.state == "done"
+        assert [r["ok"] for r in job.results] == [True, True]
+        assert job.started is not None and job.finished >= job.started
+        assert [r["status"] for r in job.results] == ["sent", "sent"]
+        assert all(r["elapsed"] >= 0 for r in job.results)
+        await queue.close()
+
+    asyncio.run(_run())
+    assert len(sent) == 2
+
+
+def test_queue_is_bounded(monkeypatch):
+    sent: list = []
+    _patch_sender(monkeypatch, sent, delay=0.05)
+
+    async def _run():
+        queue = JobQueue(workers=1, size=2, history=8)
+        queue.submit(_job("00:00:00:00:03:01"))
+        await asyncio.sleep(0)
+        # One job is running; two more wait and fill the queue
+        queue.submit(_job("00:00:00:00:03:02"))
+        queue.submit(_job("00:00:00:00:03:03"))
+        with pytest.raises(JobQueueFullError):
+            queue.submit(_job("00:00:00:00:03:04"))
+        await queue.join()
+        await queue.close()
+
+    asyncio.run(_run())
+    assert len(sent) == 3
+
+
+def test_finished_jobs_are_kept_in_an_lru(monkeypatch):
+    _patch_sender(monkeypatch, [])
+
+    async def _run():
+        queue = JobQueue(workers=1, size=8, history=2)
+        first = queue.submit(_job("00:00:00:00:04:01"))
+        second = queue.submit(_job("00:00:00:00:04:02"))
+        await queue.join()
+        # Reading the first job makes the second the least recently used
+        assert queue.get(first.id) is first
+        third = queue.submit(_job("00:00:00:00:04:03"))
+        await queue.join()
+        assert queue.get(second.id) is None
+        assert queue.get(first.id) is first
+        assert queue.get(third.id).to_dict()["state"] == "done"
+        await queue.close()
+
+    asyncio.run(_run())
+
+
+def test_failed_job_marks_every_target_not_ok(monkeypatch):
+    _patch_sender(monkeypatch, [])
+
+    async def broken_send_packets(packets, policy=None):
+        raise OSError("network is unreachable")
+
+    monkeypatch.setattr(jobs_module.wake_engine, "send_packets", broken_send_packets)
+
+    async def _run():
+        queue = JobQueue(workers=1, size=8, history=8)
+        job = queue.submit(_job("00:00:00:00:05:01", "00:00:00:00:05:02"))
+        await queue.join()
+        assert job.state == "failed"
+        assert job.error == "network is unreachable"
+        assert [r["ok"] for r in job.results] == [False, False]
+        await queue.close()
+
+    asyncio.run(_run())
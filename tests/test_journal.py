@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+
+from wol_service.models import Host
+from wol_service.registry import HostRegistry
+from wol_service import storage as storage_module
+from wol_service.storage import JournaledHostStorage, load_hosts, open_storage
+
+
+def _host(i: int) -> Host:
+    return Host(
+        name=f"host-{i}",
+        mac=f"00:11:22:33:{i // 256:02x}:{i % 256:02x}",
+        ip="10.0.0.255",
+        port=9,
+    )
+
+
+def test_open_storage_selects_journal(tmp_path):
+    storage = open_storage("journal", str(tmp_path / "hosts.json"))
+    assert isinstance(storage, JournaledHostStorage)
+
+
+def test_mutations_append_to_journal_only(tmp_path):
+    path = tmp_path / "hosts.json"
+    storage = JournaledHostStorage(str(path))
+    storage.insert(_host(1))
+    storage.insert(_host(2))
+    storage.delete("host-1")
+    assert not path.exists()
+    lines = (tmp_path / "hosts.json.journal").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["op"] for line in lines] == ["add", "add", "delete"]
+    assert JournaledHostStorage(str(path)).load() == [_host(2)]
+
+
+def test_truncated_record_is_discarded_on_recovery(tmp_path):
+    path = tmp_path / "hosts.json"
+    journal = tmp_path / "hosts.json.journal"
+    storage = JournaledHostStorage(str(path))
+    storage.insert(_host(1))
+    storage.insert(_host(2))
+    good_size = journal.stat().st_size
+    # Simulate a crash halfway through appending the third record
+    record = json.dumps({"op": "add", "host": dict(_host(3))}).encode("utf-8")
+    with open(journal, "ab") as f:
+        f.write(record[: len(record) // 2])
+
+    recovered = JournaledHostStorage(str(path))
+    assert recovered.load() == [_host(1), _host(2)]
+    # The torn bytes are cut off before the next record is appended
+    recovered.insert(_host(3))
+    with open(journal, "rb") as f:
+        f.seek(good_size)
+        assert json.loads(f.readline())["host"]["name"] == "host-3"
+    assert JournaledHostStorage(str(path)).load() == [_host(1), _host(2), _host(3)]
+
+
+def test_background_compaction_folds_journal_into_snapshot(tmp_path):
+    path = tmp_path / "hosts.json"
+    journal = tmp_path / "hosts.json.journal"
+    storage = JournaledHostStorage(str(path), compact_bytes=2048)
+    for i in range(50):
+        storage.insert(_host(i))
+    if storage._compactor is not None:
+        storage._compactor.join(timeout=5)
+    assert path.exists()
+    assert journal.stat().st_size < 2048
+    expected = [_host(i) for i in range(50)]
+    assert JournaledHostStorage(str(path)).load() == expected
+    storage.compact()
+    assert journal.stat().st_size == 0
+    assert load_hosts(str(path)) == expected
+
+
+def test_replaying_an_already_compacted_journal_is_harmless(tmp_path):
+    path = tmp_path / "hosts.json"
+    journal = tmp_path / "hosts.json.journal"
+    storage = JournaledHostStorage(str(path))
+    storage.insert(_host(1))
+    storage.insert(_host(2))
+    storage.delete("host-1")
+    stale_journal = journal.read_bytes()
+    storage.compact()
+    # Crash after the snapshot was replaced but before the journal was trimmed
+    journal.write_bytes(stale_journal)
+    assert JournaledHostStorage(str(path)).load() == [_host(2)]
+
+
+def test_concurrent_compactions_keep_every_record(tmp_path, monkeypatch):
+    path = str(tmp_path / "hosts.json")
+    first = JournaledHostStorage(path)
+    second = JournaledHostStorage(path)
+    first.insert(_host(1))
+    paused, resume = threading.Event(), threading.Event()
+    real_save_hosts = storage_module.save_hosts
+
+    def slow_save_hosts(path, hosts):
+        if threading.current_thread().name == "first":
+            paused.set()
+            resume.wait(5)
+        real_save_hosts(path, hosts)
+
+    monkeypatch.setattr(storage_module, "save_hosts", slow_save_hosts)
+    # The first compaction stops before writing its snapshot...
+    compacting = threading.Thread(target=first.compact, name="first")
+    compacting.start()
+    assert paused.wait(5)
+    # ...while another worker commits a host and compacts too
+    second.insert(_host(9))
+    other = threading.Thread(target=second.compact)
+    other.start()
+    # Give it time to finish, which it may only do after the first one
+    other.join(0.5)
+    resume.set()
+    compacting.join(5)
+    other.join(5)
+    assert JournaledHostStorage(path).load() == [_host(1), _host(9)]
+
+
+def test_save_replaces_state(tmp_path):
+    path = tmp_path / "hosts.json"
+    storage = JournaledHostStorage(str(path))
+    storage.insert(_host(1))
+    storage.save([_host(2), _host(3)])
+    assert os.path.getsize(tmp_path / "hosts.json.journal") == 0
+    assert JournaledHostStorage(str(path)).load() == [_host(2), _host(3)]
+
+
+def test_registry_on_journal_sees_other_writers(tmp_path):
+    path = str(tmp_path / "hosts.json")
+    registry = HostRegistry(JournaledHostStorage(path))
+    registry.add(_host(1))
+    JournaledHostStorage(path).insert(_host(2))
+    assert [h["name"] for h in registry.hosts()] == ["host-1", "host-2"]
@@ -0,0 +1,59 @@
+import asyncio
+
+from wol_service.models import Host
+from wol_service.monitor import LivenessMonitor
+from wol_service.registry import HostRegistry
+from wol_service.storage import JsonHostStorage
+
+
+def test_monitor_caches_probe_results(tmp_path):
+    async def _run():
+        server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        registry = HostRegistry(JsonHostStorage(str(tmp_path / "hosts.json")))
+        registry.add(Host(name="up", mac="00:00:00:00:00:01", ip="127.0.0.1", port=9))
+        registry.add(Host(name="down", mac="00:00:00:00:00:02", ip="127.0.0.2", port=9))
+        registry.add(
+            Host(name="bcast", mac="00:00:00:00:00:03", ip="255.255.255.255", port=9)
+        )
+        registry.add(
+            Host(
+                name="subnet",
+                mac="00:00:00:00:00:04",
+                ip="192.168.1.255",
+                port=9,
+                probe_ip="127.0.0.1",
+            )
+        )
+        registry.add(
+            Host(name="directed", mac="00:00:00:00:00:05", ip="10.0.0.255", port=9)
+        )
+        # The listener is bound to 127.0.0.1 only, so 127.0.0.2 refuses
+        monitor = LivenessMonitor(registry, interval=0.05, ports=[port])
+        try:
+            await monitor.run_once()
+            assert monitor.status("up").up is True
+            assert monitor.status("up").port == port
+            assert monitor.status("down").up is False
+            assert monitor.status("bcast").up is None
+            assert monitor.status("directed").up is None
+            assert monitor.status("subnet").up is True
+            version = monitor.version
+            content_version = monitor.content_version
+            await monitor.run_once()
+            # Unchanged liveness is not re-published, but the table is new
+            assert monitor.version == version
+            assert monitor.content_version > content_version
+
+            registry.remove("up")
+            await monitor.start()
+            await asyncio.sleep(0.2)
+            assert monitor.status("up") is None
+            assert monitor.version > version
+            assert set(monitor.snapshot()) == {"down", "bcast", "subnet", "directed"}
+        finally:
+            await monitor.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(_run())
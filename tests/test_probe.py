@@ -0,0 +1,109 @@
+import asyncio
+import socket
+
+import pytest
+
+from wol_service.probe import Prober, parse_ports, probe_address, wake_and_verify
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def test_parse_ports_and_probe_address():
+    assert parse_ports("22, 3389") == (22, 3389)
+    assert parse_ports("") == parse_ports(None)
+    with pytest.raises(ValueError):
+        parse_ports("22,x")
+    with pytest.raises(ValueError):
+        parse_ports("0")
+    assert probe_address(None, "10.0.0.5") == "10.0.0.5"
+    assert probe_address("10.0.0.6", "255.255.255.255") == "10.0.0.6"
+    with pytest.raises(ValueError):
+        probe_address(None, "255.255.255.255")
+    with pytest.raises(ValueError):
+        probe_address(None, "192.168.1.255")
+    assert probe_address("10.0.1.255", "10.0.1.255") == "10.0.1.255"
+    with pytest.raises(ValueError):
+        probe_address("255.255.255.255", "10.0.1.255")
+    assert probe_address(" ", "10.0.0.5") == "10.0.0.5"
+
+
+def test_prober_finds_first_open_port():
+    async def _run():
+        server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        prober = Prober(limit=2, timeout=0.5)
+        try:
+            assert await prober.first_open("127.0.0.1", [_closed_port(), port]) == port
+            assert await prober.first_open("127.0.0.1", [_closed_port()]) is None
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(_run())
+
+
+def test_wake_and_verify_reports_host_coming_up():
+    async def _run():
+        sends = []
+        port = _closed_port()
+        servers = []
+
+        async def send():
+            sends.append(asyncio.get_running_loop().time())
+            if len(sends) == 2:
+                # The "machine" boots after the second packet
+                servers.append(
+                    await asyncio.start_server(
+                        lambda r, w: w.close(), "127.0.0.1", port
+                    )
+                )
+
+        events = [
+            e
+            async for e in wake_and_verify(
+                send, "127.0.0.1", [port], timeout=5, resend_after=0.1, interval=0.05
+            )
+        ]
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+        kinds = [e["event"] for e in events]
+        assert kinds[0] == "sent"
+        assert kinds.count("sent") == 2
+        assert "waiting" in kinds
+        assert events[-1]["event"] == "up"
+        assert events[-1]["port"] == port
+        assert events[-1]["attempts"] == 2
+
+    asyncio.run(_run())
+
+
+def test_wake_and_verify_times_out_with_backoff():
+    async def _run():
+        sends = 0
+
+        async def send():
+            nonlocal sends
+            sends += 1
+
+        events = [
+            e
+            async for e in wake_and_verify(
+                send,
+                "127.0.0.1",
+                [_closed_port()],
+                timeout=0.7,
+                resend_after=0.1,
+                interval=0.02,
+            )
+        ]
+        assert events[-1]["event"] == "timeout"
+        # Re-sent at ~0.1 s, ~0.3 s and ~0.7 s at most: the gap doubles
+        assert 3 <= sends <= 4
+        assert events[-1]["attempts"] == sends
+
+    asyncio.run(_run())
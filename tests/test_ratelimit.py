@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from wol_service.ratelimit import RateLimitedError, TokenBucket, WakeLimiter
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(rate=2, capacity=3, now=0)
+    for _ in range(3):
+        assert bucket.wait_time(1, now=0) == 0
+        bucket.consume(1)
+    assert bucket.wait_time(1, now=0) == pytest.approx(0.5)
+    assert bucket.wait_time(1, now=0.5) == 0
+    # Refill stops at capacity
+    assert bucket.wait_time(3, now=100) == 0
+    bucket.consume(3)
+    assert bucket.wait_time(1, now=100) == pytest.approx(0.5)
+
+
+def test_concurrent_duplicates_share_one_send():
+    async def _run():
+        limiter = WakeLimiter(window=1, mac_rate=0, max_pps=0)
+        sends = 0
+
+        async def send():
+            nonlocal sends
+            sends += 1
+            await asyncio.sleep(0.05)
+
+        results = await asyncio.gather(
+            limiter.wake("00:11:22:33:44:55", send),
+            *(limiter.wake("00-11-22-33-44-55", send) for _ in range(50)),
+        )
+        assert sends == 1
+        assert results == [False] + [True] * 50
+        # Still within the window after it finished
+        assert await limiter.wake("001122334455", send) is True
+        assert sends == 1
+
+    asyncio.run(_run())
+
+
+def test_window_expiry_and_failures_are_not_cached():
+    async def _run():
+        limiter = WakeLimiter(window=0.05, mac_rate=0, max_pps=0)
+        calls = 0
+
+        async def failing_send():
+            nonlocal calls
+            calls += 1
+            raise OSError("network down")
+
+        with pytest.raises(OSError):
+            await limiter.wake("00:11:22:33:44:55", failing_send)
+        with pytest.raises(OSError):
+            await limiter.wake("00:11:22:33:44:55", failing_send)
+        assert calls == 2
+
+        async def send():
+            pass
+
+        assert await limiter.wake("00:11:22:33:44:55", send) is False
+        await asyncio.sleep(0.06)
+        assert await limiter.wake("00:11:22:33:44:55", send) is False
+
+    asyncio.run(_run())
+
+
+def test_per_mac_bucket_rejects_bursts():
+    async def _run():
+        limiter = WakeLimiter(window=0, mac_rate=0.5, mac_burst=2, max_pps=0)
+
+        async def send():
+            pass
+
+        await limiter.wake("00:11:22:33:44:55", send)
+        await limiter.wake("00:11:22:33:44:55", send)
+        with pytest.raises(RateLimitedError) as excinfo:
+            await limiter.wake("00:11:22:33:44:55", send)
+        assert excinfo.value.retry_after == pytest.approx(2, abs=0.1)
+        assert excinfo.value.retry_after_header == "2"
+        # Other MACs have their own bucket
+        assert await limiter.wake("66:77:88:99:aa:bb", send) is False
+
+    asyncio.run(_run())
+
+
+def test_global_packet_cap_applies_across_macs():
+    async def _run():
+        limiter = WakeLimiter(window=0, mac_rate=0, max_pps=10)
+        sent: list[int] = []
+
+        async def send(admitted):
+            sent.extend(admitted)
+
+        macs = [f"00:00:00:00:00:{i:02x}" for i in range(8)]
+        statuses = await limiter.wake_many(macs, send, [3] * len(macs))
+        # 10 packets per second: three wakes of three packets fit
+        assert sent == [0, 1, 2]
+        assert statuses[:3] == [None] * 3
+        assert all(isinstance(s, RateLimitedError) for s in statuses[3:])
+
+    asyncio.run(_run())
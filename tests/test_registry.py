@@ -0,0 +1,266 @@
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from wol_service.models import Host
+from wol_service.registry import (
+    HostConflictError,
+    HostNotFoundError,
+    HostRegistry,
+    HostWriteCoordinator,
+)
+from wol_service.storage import JsonHostStorage, SqliteHostStorage, open_storage
+from wol_service.wol import create_magic_packet
+
+
+def _host(name="pc", mac="00:11:22:33:44:55", ip="192.168.1.255", port=9) -> Host:
+    return Host(name=name, mac=mac, ip=ip, port=port)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def make_storage(request, tmp_path):
+    if request.param == "sqlite":
+        return lambda: SqliteHostStorage(str(tmp_path / "hosts.db"))
+    return lambda: JsonHostStorage(str(tmp_path / "hosts.json"))
+
+
+def test_registry_indexes_by_name_and_normalized_mac(make_storage):
+    registry = HostRegistry(make_storage())
+    registry.add(_host())
+    assert registry.get("pc") is not None
+    assert registry.get_by_mac("00-11-22-33-44-55")["name"] == "pc"
+    assert registry.get_by_mac("001122334455")["name"] == "pc"
+    assert registry.get_by_mac("66:77:88:99:aa:bb") is None
+
+
+def test_registry_rejects_duplicates(make_storage):
+    registry = HostRegistry(make_storage())
+    registry.add(_host())
+    with pytest.raises(HostConflictError, match="name"):
+        registry.add(_host(mac="66:77:88:99:aa:bb"))
+    with pytest.raises(HostConflictError, match="MAC"):
+        registry.add(_host(name="other", mac="00-11-22-33-44-55"))
+
+
+def test_registry_persists_and_removes(make_storage):
+    registry = HostRegistry(make_storage())
+    registry.add(_host())
+    assert HostRegistry(make_storage()).get("pc") == _host()
+    assert registry.remove("pc") is True
+    assert registry.remove("pc") is False
+    assert registry.hosts() == []
+    assert HostRegistry(make_storage()).hosts() == []
+
+
+def test_registry_picks_up_changes_from_other_writers(make_storage):
+    registry = HostRegistry(make_storage())
+    registry.load()
+    assert registry.hosts() == []
+    version = registry.version
+    make_storage().insert(_host(name="external"))
+    assert [h["name"] for h in registry.hosts()] == ["external"]
+    assert registry.version > version
+    # No change in storage means no reload
+    version = registry.version
+    registry.hosts()
+    assert registry.version == version
+
+
+def test_registry_picks_up_hand_edited_json(tmp_path):
+    path = tmp_path / "hosts.json"
+    registry = HostRegistry(JsonHostStorage(str(path)))
+    assert registry.hosts() == []
+    path.write_text(json.dumps([dict(_host(name="edited"))]), encoding="utf-8")
+    assert [h["name"] for h in registry.hosts()] == ["edited"]
+
+
+def test_apply_reports_per_mutation_errors(make_storage):
+    registry = HostRegistry(make_storage())
+    results = registry.apply(
+        [
+            {"op": "add", "host": _host(name="a", mac="00:00:00:00:00:01")},
+            {"op": "add", "host": _host(name="a", mac="00:00:00:00:00:02")},
+            {"op": "add", "host": _host(name="b", mac="00-00-00-00-00-01")},
+            {"op": "delete", "name": "missing"},
+            {"op": "add", "host": _host(name="c", mac="00:00:00:00:00:03")},
+        ]
+    )
+    assert results[0] is None
+    assert isinstance(results[1], HostConflictError)
+    assert isinstance(results[2], HostConflictError)
+    assert isinstance(results[3], HostNotFoundError)
+    assert results[4] is None
+    assert [h["name"] for h in HostRegistry(make_storage()).hosts()] == ["a", "c"]
+
+
+def test_coordinator_group_commits_concurrent_writes(make_storage, monkeypatch):
+    storage = make_storage()
+    registry = HostRegistry(storage)
+    coordinator = HostWriteCoordinator(registry, window=0.01)
+    commits = []
+    original_apply = storage.apply
+    monkeypatch.setattr(
+        storage,
+        "apply",
+        lambda mutations: commits.append(len(mutations)) or original_apply(mutations),
+    )
+
+    async def _run():
+        hosts = [_host(name=f"h{i}", mac=f"00:00:00:00:01:{i:02x}") for i in range(50)]
+        await asyncio.gather(
+            *(coordinator.submit({"op": "add", "host": h}) for h in hosts)
+        )
+        with pytest.raises(HostConflictError):
+            await coordinator.submit({"op": "add", "host": hosts[0]})
+
+    asyncio.run(_run())
+    assert commits == [50]
+    assert len(HostRegistry(make_storage()).hosts()) == 50
+
+
+def test_readers_do_not_wait_for_a_slow_commit(make_storage, monkeypatch):
+    storage = make_storage()
+    registry = HostRegistry(storage)
+    registry.add(_host())
+    writing, done = threading.Event(), threading.Event()
+    original_apply = storage.apply
+
+    def slow_apply(mutations):
+        writing.set()
+        done.wait(5)
+        original_apply(mutations)
+
+    monkeypatch.setattr(storage, "apply", slow_apply)
+    commit = threading.Thread(
+        target=registry.add, args=(_host(name="new", mac="66:77:88:99:aa:bb"),)
+    )
+    commit.start()
+    assert writing.wait(5)
+    start = time.perf_counter()
+    # The previous view is served while the write is in flight
+    assert registry.get("pc") is not None
+    assert registry.get("new") is None
+    assert time.perf_counter() - start < 0.5
+    done.set()
+    commit.join(5)
+    assert registry.get("new") is not None
+    assert registry.prepared_by_mac("66:77:88:99:aa:bb") is not None
+
+
+def _add_hosts_in_process(backend: str, path: str, worker: int) -> None:
+    registry = HostRegistry(open_storage(backend, path))
+    for i in range(20):
+        registry.add(
+            _host(name=f"w{worker}-{i}", mac=f"00:00:00:00:{worker:02x}:{i:02x}")
+        )
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite"])
+def test_concurrent_processes_do_not_lose_updates(tmp_path, backend):
+    path = str(tmp_path / "hosts.data")
+    ctx = multiprocessing.get_context("spawn")
+    workers = [
+        ctx.Process(target=_add_hosts_in_process, args=(backend, path, w))
+        for w in range(4)
+    ]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+    assert len(HostRegistry(open_storage(backend, path)).hosts()) == 80
+
+
+def test_fingerprint_tracks_content(make_storage):
+    registry = HostRegistry(make_storage())
+    empty = registry.fingerprint()
+    registry.add(_host())
+    assert registry.fingerprint() != empty
+    assert HostRegistry(make_storage()).fingerprint() == registry.fingerprint()
+    registry.remove("pc")
+    assert registry.fingerprint() == empty
+
+
+def test_registry_keeps_prebuilt_packets(make_storage):
+    registry = HostRegistry(make_storage())
+    registry.add(_host(mac="00-11-22-33-44-55", ip="10.0.0.255", port=7))
+    prepared = registry.prepared("pc")
+    assert prepared is not None
+    assert prepared.packet == create_magic_packet("001122334455")
+    assert prepared.address == ("10.0.0.255", 7)
+    assert registry.prepared_by_mac("00:11:22:33:44:55") is prepared
+    assert HostRegistry(make_storage()).prepared("pc") == prepared
+    registry.remove("pc")
+    assert registry.prepared("pc") is None
+
+
+def test_registry_tolerates_hand_edited_invalid_mac(tmp_path):
+    path = tmp_path / "hosts.json"
+    path.write_text(
+        json.dumps(
+            [
+                dict(_host(mac="not-a-mac")),
+                dict(_host(name="ok", mac="aa:bb:cc:dd:ee:ff")),
+            ]
+        ),
+        encoding="utf-8",
+    )
+    registry = HostRegistry(JsonHostStorage(str(path)))
+    assert len(registry.hosts()) == 2
+    assert registry.prepared("pc") is None
+    assert registry.prepared("ok") is not None
+
+
+def test_registry_indexes_tags(make_storage):
+    registry = HostRegistry(make_storage())
+    for i, tags in enumerate([["lab"], ["lab", "gpu"], []]):
+        host = _host(name=f"pc-{i}", mac=f"00:11:22:33:44:{i:02x}")
+        if tags:
+            host["tags"] = tags
+        registry.add(host)
+    assert registry.groups() == {"gpu": 1, "lab": 2}
+    assert [h["name"] for h in registry.group("lab")] == ["pc-0", "pc-1"]
+    assert [n for n, _ in registry.prepared_group("gpu")] == ["pc-1"]
+    assert registry.query(tag="lab", name="pc-1")[0] == 1
+    registry.remove("pc-1")
+    assert registry.groups() == {"lab": 1}
+    # Rebuilt the same way from storage
+    reloaded = HostRegistry(registry.storage)
+    assert reloaded.groups() == {"lab": 1}
+
+
+def test_registry_reports_changes_to_listeners(tmp_path):
+    path = tmp_path / "hosts.json"
+    registry = HostRegistry(JsonHostStorage(str(path)))
+    seen: list = []
+    registry.add_listener(seen.append)
+    registry.add(_host())
+    registry.remove("pc")
+    assert seen == [
+        [{"op": "add", "host": _host()}],
+        [{"op": "delete", "name": "pc"}],
+    ]
+    seen.clear()
+    # Edits by hand or by another process are reported as a diff on reload
+    registry.add(_host(name="kept", mac="00:00:00:00:00:01"))
+    registry.add(_host(name="edited", mac="00:00:00:00:00:02"))
+    seen.clear()
+    data = json.loads(path.read_text())
+    data[1]["port"] = 7
+    data.append(_host(name="new", mac="00:00:00:00:00:03"))
+    path.write_text(json.dumps(data))
+    registry.hosts()
+    assert seen == [
+        [
+            {"op": "delete", "name": "edited"},
+            {
+                "op": "add",
+                "host": _host(name="edited", mac="00:00:00:00:00:02", port=7),
+            },
+            {"op": "add", "host": _host(name="new", mac="00:00:00:00:00:03")},
+        ]
+    ]
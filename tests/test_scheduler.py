@@ -0,0 +1,195 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from wol_service.models import Host
+from wol_service.registry import HostRegistry
+from wol_service.scheduler import CronExpression, WakeScheduler
+from wol_service.storage import JsonHostStorage
+from wol_service.wol import create_magic_packet
+
+
+class FakeEngine:
+    def __init__(self):
+        self.sent = []
+
+    async def send_packets(self, packets):
+        self.sent.extend(packets)
+
+
+def _ts(*args) -> float:
+    return datetime(*args).timestamp()
+
+
+@pytest.fixture
+def hosts(tmp_path):
+    registry = HostRegistry(JsonHostStorage(str(tmp_path / "hosts.json")))
+    registry.add(Host(name="nas", mac="00:11:22:33:44:55", ip="10.0.0.255", port=9))
+    return registry
+
+
+def test_cron_next_after():
+    weekday_morning = CronExpression("30 6 * * 1-5")
+    # Friday 2024-03-01 07:00 -> Monday 06:30
+    assert weekday_morning.next_after(_ts(2024, 3, 1, 7, 0)) == _ts(2024, 3, 4, 6, 30)
+    assert weekday_morning.next_after(_ts(2024, 3, 4, 6, 29, 59)) == _ts(
+        2024, 3, 4, 6, 30
+    )
+    every_15 = CronExpression("*/15 * * * *")
+    assert every_15.next_after(_ts(2024, 3, 1, 23, 50)) == _ts(2024, 3, 2, 0, 0)
+    # Day of month or Sunday, as in cron
+    either = CronExpression("0 0 13 * 7")
+    assert either.next_after(_ts(2024, 3, 1)) == _ts(2024, 3, 3)
+    assert CronExpression("0 0 29 2 *").next_after(_ts(2024, 3, 1)) == _ts(2028, 2, 29)
+
+
+@pytest.mark.parametrize(
+    "expression", ["* * * *", "60 * * * *", "* * 0 * *", "*/0 * * * *", "0 0 30 2 *"]
+)
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_one_shot_fires_once_from_timer_loop(tmp_path, hosts):
+    async def _run():
+        engine = FakeEngine()
+        scheduler = WakeScheduler(str(tmp_path / "schedules.json"), hosts, engine)
+        await scheduler.start()
+        try:
+            schedule = await scheduler.create("nas", at=time.time() + 0.1)
+            assert scheduler.next_run(schedule["id"]) is not None
+            await asyncio.sleep(0.4)
+        finally:
+            await scheduler.close()
+        assert engine.sent == [
+            (create_magic_packet("00:11:22:33:44:55"), ("10.0.0.255", 9))
+        ]
+        assert scheduler.next_run(schedule["id"]) is None
+        assert scheduler.get(schedule["id"])["last_run"] is not None
+
+    asyncio.run(_run())
+
+
+def test_thousands_of_schedules_share_one_heap(tmp_path, hosts):
+    async def _run():
+        now = time.time()
+        path = tmp_path / "schedules.json"
+        path.write_text(
+            json.dumps(
+                [
+                    {
+                        "id": str(i),
+                        "host": "nas",
+                        "cron": f"{i % 60} * * * *",
+                        "at": None,
+                        "enabled": True,
+                        "created": now,
+                        "last_run": None,
+                    }
+                    for i in range(2000)
+                ]
+            )
+        )
+        engine = FakeEngine()
+        scheduler = WakeScheduler(str(path), hosts, engine)
+        due = await scheduler.run_due(now + 3600)
+        assert len(due) == 2000
+        assert len(engine.sent) == 2000
+        # Every job moved on to its next hour; nothing is due again yet
+        assert await scheduler.run_due(now + 3600) == []
+        assert all(scheduler.next_run(s["id"]) > now + 3600 for s in scheduler.list())
+
+    asyncio.run(_run())
+
+
+def test_restart_does_not_repeat_runs(tmp_path, hosts):
+    path = str(tmp_path / "schedules.json")
+
+    async def _run():
+        engine = FakeEngine()
+        scheduler = WakeScheduler(path, hosts, engine)
+        schedule = await scheduler.create("nas", cron="* * * * *")
+        await scheduler.run_due(time.time() + 60)
+        assert len(engine.sent) == 1
+
+        restarted = WakeScheduler(path, hosts, engine)
+        assert restarted.get(schedule["id"])["last_run"] is not None
+        assert await restarted.run_due(time.time() + 60) == []
+        assert len(engine.sent) == 1
+
+    asyncio.run(_run())
+
+
+def test_workers_sharing_a_file_fire_each_run_once(tmp_path, hosts):
+    path = str(tmp_path / "schedules.json")
+
+    async def _run():
+        engine = FakeEngine()
+        first = WakeScheduler(path, hosts, engine)
+        second = WakeScheduler(path, hosts, engine)
+        first.load()
+        second.load()
+        created = await first.create("nas", cron="* * * * *")
+        # Saving starts from the file, so neither worker drops the other's jobs
+        other = await second.create("nas", at=time.time() + 3600)
+        assert {s["id"] for s in first.list()} == {created["id"], other["id"]}
+
+        now = time.time() + 60
+        ran = await first.run_due(now) + await second.run_due(now)
+        assert [s["id"] for s in ran] == [created["id"]]
+        assert len(engine.sent) == 1
+
+    asyncio.run(_run())
+
+
+def test_missed_runs_fire_once_within_grace(tmp_path, hosts):
+    path = tmp_path / "schedules.json"
+    now = time.time()
+    base = {"host": "nas", "at": None, "enabled": True, "created": now - 7200}
+    path.write_text(
+        json.dumps(
+            [
+                # Missed many minutes: catches up with a single run
+                {**base, "id": "recent", "cron": "* * * * *", "last_run": now - 600},
+                # Missed by more than the grace period: skipped
+                {
+                    **base,
+                    "id": "stale",
+                    "cron": None,
+                    "at": now - 7000,
+                    "last_run": None,
+                },
+            ]
+        )
+    )
+
+    async def _run():
+        engine = FakeEngine()
+        scheduler = WakeScheduler(str(path), hosts, engine, grace=3600)
+        assert scheduler.next_run("stale") is None
+        due = await scheduler.run_due()
+        assert [s["id"] for s in due] == ["recent"]
+        assert await scheduler.run_due() == []
+        assert scheduler.next_run("recent") > time.time()
+
+    asyncio.run(_run())
+
+
+def test_update_and_delete_supersede_heap_entries(tmp_path, hosts):
+    async def _run():
+        engine = FakeEngine()
+        scheduler = WakeScheduler(str(tmp_path / "schedules.json"), hosts, engine)
+        soon = time.time() + 60
+        kept = await scheduler.create("nas", at=soon)
+        deleted = await scheduler.create("nas", at=soon)
+        await scheduler.update(kept["id"], "nas", at=soon + 3600)
+        assert await scheduler.delete(deleted["id"])
+        assert await scheduler.run_due(soon + 1) == []
+        assert [s["id"] for s in await scheduler.run_due(soon + 3601)] == [kept["id"]]
+        assert len(engine.sent) == 1
+
+    asyncio.run(_run())
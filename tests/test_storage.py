@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from wol_service.models import Host
+from wol_service.storage import (
+    HostConflictError,
+    JsonHostStorage,
+    SqliteHostStorage,
+    open_storage,
+)
+
+
+def _hosts(count: int) -> list[Host]:
+    return [
+        Host(name=f"host-{i}", mac=f"00:11:22:33:44:{i:02x}", ip="10.0.0.255", port=9)
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    return open_storage(request.param, str(tmp_path / f"hosts.{request.param}"))
+
+
+def test_open_storage_selects_backend(tmp_path):
+    assert isinstance(open_storage("json", str(tmp_path / "a")), JsonHostStorage)
+    assert isinstance(open_storage("sqlite", str(tmp_path / "b")), SqliteHostStorage)
+
+
+def test_sqlite_refuses_a_json_hosts_file(tmp_path):
+    path = tmp_path / "hosts.json"
+    JsonHostStorage(str(path)).save(_hosts(2))
+    storage = open_storage("sqlite", str(path))
+    with pytest.raises(RuntimeError, match="not an SQLite database"):
+        storage.load()
+    # The JSON file is left as it was
+    assert JsonHostStorage(str(path)).load() == _hosts(2)
+
+
+def test_storage_row_operations(storage):
+    assert storage.load() == []
+    storage.save(_hosts(5))
+    assert storage.load() == _hosts(5)
+    assert storage.get("host-3") == _hosts(5)[3]
+    assert storage.get("missing") is None
+    assert storage.list(limit=2, offset=1) == _hosts(5)[1:3]
+    assert storage.list(offset=4) == _hosts(5)[4:]
+    extra = Host(name="extra", mac="AA-BB-CC-DD-EE-FF", ip="10.0.0.1", port=7)
+    storage.insert(extra)
+    assert storage.load()[-1] == extra
+    assert storage.delete("host-0") is True
+    assert storage.delete("host-0") is False
+    assert [h["name"] for h in storage.load()] == [
+        "host-1",
+        "host-2",
+        "host-3",
+        "host-4",
+        "extra",
+    ]
+
+
+def test_storage_insert_rejects_duplicates(storage):
+    storage.save(_hosts(1))
+    with pytest.raises(HostConflictError, match="name"):
+        storage.insert(Host(name="host-0", mac="aabbccddeeff", ip="10.0.0.1", port=9))
+    with pytest.raises(HostConflictError, match="MAC"):
+        storage.insert(Host(name="other", mac="001122334400", ip="10.0.0.1", port=9))
+    assert storage.load() == _hosts(1)
+
+
+def test_storage_signature_changes_on_write(storage):
+    before = storage.signature()
+    storage.insert(_hosts(1)[0])
+    assert storage.signature() != before
+
+
+def test_sqlite_uses_wal(tmp_path):
+    storage = SqliteHostStorage(str(tmp_path / "hosts.db"))
+    storage.save(_hosts(1))
+    mode = storage._connection().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+    storage.close()
+
+
+def test_json_storage_keeps_file_format(tmp_path):
+    path = tmp_path / "hosts.json"
+    JsonHostStorage(str(path)).save(_hosts(2))
+    assert json.loads(path.read_text(encoding="utf-8")) == [dict(h) for h in _hosts(2)]
+
+
+def test_storage_round_trips_tags_and_probe_ip(storage):
+    tagged = Host(name="lab-1", mac="00:11:22:33:44:55", ip="10.0.0.255", port=9)
+    tagged["tags"] = ["lab", "gpu"]
+    tagged["probe_ip"] = "10.0.0.21"
+    storage.insert(tagged)
+    storage.insert(_hosts(1)[0])
+    assert storage.get("lab-1") == tagged
+    # Hosts without tags or a probe address keep the original shape
+    assert storage.get("host-0") == _hosts(1)[0]
+
+
+def test_sqlite_adds_tags_column_to_old_databases(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE hosts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,"
+        " mac TEXT NOT NULL, mac_norm TEXT NOT NULL, ip TEXT NOT NULL,"
+        " port INTEGER NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO hosts (name, mac, mac_norm, ip, port)"
+        " VALUES ('old', '00:11:22:33:44:55', '001122334455', '10.0.0.255', 9)"
+    )
+    conn.commit()
+    conn.close()
+    storage = SqliteHostStorage(path)
+    assert storage.load() == [
+        Host(name="old", mac="00:11:22:33:44:55", ip="10.0.0.255", port=9)
+    ]
+    storage.close()
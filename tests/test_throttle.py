@@ -0,0 +1,59 @@
+import pytest
+
+from wol_service.ratelimit import RateLimitedError
+from wol_service.throttle import LoginThrottle
+
+
+def test_failures_lock_out_with_exponential_backoff():
+    throttle = LoginThrottle(max_failures=3, window=60, lockout=10, max_lockout=25)
+    for now in (0, 1):
+        throttle.failure("10.0.0.1", "alice", now=now)
+        throttle.check("10.0.0.1", "alice", now=now)
+    throttle.failure("10.0.0.1", "alice", now=2)
+    with pytest.raises(RateLimitedError) as excinfo:
+        throttle.check("10.0.0.1", "alice", now=2)
+    assert excinfo.value.retry_after == pytest.approx(10)
+    # Locked by username from any IP, and by IP for any username
+    with pytest.raises(RateLimitedError):
+        throttle.check("10.0.0.2", "alice", now=5)
+    with pytest.raises(RateLimitedError):
+        throttle.check("10.0.0.1", "bob", now=5)
+    throttle.check("10.0.0.2", "bob", now=5)
+    throttle.check("10.0.0.1", "alice", now=12)
+
+    # The second lockout doubles, the third is capped
+    for now in (12, 13, 14):
+        throttle.failure("10.0.0.1", "alice", now=now)
+    with pytest.raises(RateLimitedError) as excinfo:
+        throttle.check(None, "alice", now=14)
+    assert excinfo.value.retry_after == pytest.approx(20)
+    for now in (34, 35, 36):
+        throttle.failure("10.0.0.1", "alice", now=now)
+    with pytest.raises(RateLimitedError) as excinfo:
+        throttle.check(None, "alice", now=36)
+    assert excinfo.value.retry_after == pytest.approx(25)
+
+
+def test_window_slides_and_success_resets():
+    throttle = LoginThrottle(max_failures=2, window=10, lockout=5)
+    throttle.failure("10.0.0.1", "alice", now=0)
+    throttle.failure("10.0.0.1", "alice", now=11)
+    throttle.check("10.0.0.1", "alice", now=11)
+    throttle.success("10.0.0.1", "alice")
+    throttle.failure("10.0.0.2", "alice", now=12)
+    throttle.check("10.0.0.2", "alice", now=12)
+    assert LoginThrottle(max_failures=0).check("10.0.0.1", "alice") is None
+
+
+def test_success_does_not_reset_the_ip():
+    throttle = LoginThrottle(max_failures=5, window=60, lockout=10)
+    # Guessing other accounts, then logging in to a known one
+    for now in range(4):
+        throttle.failure("10.0.0.1", f"victim{now}", now=now)
+    throttle.success("10.0.0.1", "mallory")
+    throttle.check("10.0.0.1", "victim4", now=4)
+    throttle.failure("10.0.0.1", "victim4", now=4)
+    with pytest.raises(RateLimitedError):
+        throttle.check("10.0.0.1", "victim5", now=5)
+    # The account that logged in is not held back from other IPs
+    throttle.check("10.0.0.2", "mallory", now=5)
@@ -1,14 +1,25 @@
 import asyncio
 import importlib
+import json
+import os
+import subprocess
+import sys
 
 import httpx
+from passlib.context import CryptContext
 
-from wol_service import app, ui
+from wol_service import app, auth, ui, user_management
+from wol_service.models import User
+from wol_service.throttle import LoginThrottle
 
 ADMIN_USER = "test_admin"
 ADMIN_PASS = "test_password"
 
 
+async def _fake_send(*args, **kwargs):
+    return True
+
+
 async def login_and_get_csrf(client: httpx.AsyncClient):
     resp = await client.post(
         "/login",
@@ -45,6 +56,66 @@ def test_login_sets_cookies():
     asyncio.run(_run())
 
 
+def test_failed_logins_are_throttled_before_hashing(monkeypatch):
+    verifies = []
+    real_verify = auth.password_verifier.verify
+
+    async def counting_verify(plain_password, hashed_password):
+        verifies.append(hashed_password)
+        return await real_verify(plain_password, hashed_password)
+
+    monkeypatch.setattr(auth.password_verifier, "verify", counting_verify)
+    monkeypatch.setattr(ui, "login_throttle", LoginThrottle(max_failures=2))
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            for username in (ADMIN_USER, "nobody"):
+                response = await client.post(
+                    "/login", data={"username": username, "password": "wrong"}
+                )
+                assert response.status_code == 401
+            # Unknown users still cost one (dummy) verify
+            assert len(verifies) == 2 and verifies[1] is None
+            response = await client.post(
+                "/login", data={"username": ADMIN_USER, "password": ADMIN_PASS}
+            )
+            assert response.status_code == 429
+            assert int(response.headers["Retry-After"]) >= 1
+            assert len(verifies) == 2
+
+    asyncio.run(_run())
+
+
+def test_login_rehashes_outdated_password_hash(monkeypatch, tmp_path):
+    users_path = tmp_path / "users.json"
+    monkeypatch.setattr(user_management, "USERS_PATH", users_path)
+    ui.load_auth()
+    cheap = CryptContext(
+        schemes=["argon2"], argon2__rounds=1, argon2__memory_cost=1024
+    ).hash(ADMIN_PASS)
+    monkeypatch.setitem(
+        ui.USERS, ADMIN_USER, User(username=ADMIN_USER, hashed_password=cheap)
+    )
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            await login_and_get_csrf(client)
+
+    asyncio.run(_run())
+    rehashed = ui.USERS[ADMIN_USER]["hashed_password"]
+    assert rehashed != cheap
+    assert not auth.password_needs_rehash(rehashed)
+    assert auth.verify_password(ADMIN_PASS, rehashed)
+    saved = json.loads(users_path.read_text(encoding="utf-8"))
+    assert saved["users"][ADMIN_USER]["hashed_password"] == rehashed
+
+
 def test_wake_requires_csrf(monkeypatch):
     async def _run():
         transport = httpx.ASGITransport(app=app.app)
@@ -52,9 +123,7 @@ def test_wake_requires_csrf(monkeypatch):
             transport=transport, base_url="http://testserver"
         ) as client:
             await login_and_get_csrf(client)
-            monkeypatch.setattr(
-                "wol_service.wol.wake_on_lan", lambda *args, **kwargs: True
-            )
+            monkeypatch.setattr("wol_service.wol.wake_engine.send", _fake_send)
             response = await client.post(
                 "/wake",
                 data={
@@ -76,9 +145,7 @@ def test_wake_with_csrf(monkeypatch):
             transport=transport, base_url="http://testserver"
         ) as client:
             csrf_token = await login_and_get_csrf(client)
-            monkeypatch.setattr(
-                "wol_service.wol.wake_on_lan", lambda *args, **kwargs: True
-            )
+            monkeypatch.setattr("wol_service.wol.wake_engine.send", _fake_send)
             response = await client.post(
                 "/wake",
                 data={
@@ -94,6 +161,45 @@ def test_wake_with_csrf(monkeypatch):
     asyncio.run(_run())
 
 
+def test_repeated_wake_is_coalesced_then_rate_limited(monkeypatch):
+    sends = 0
+
+    async def counting_send(*args, **kwargs):
+        nonlocal sends
+        sends += 1
+        return True
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            csrf_token = await login_and_get_csrf(client)
+            monkeypatch.setattr("wol_service.wol.wake_engine.send", counting_send)
+            data = {
+                "mac_address": "00:11:22:33:44:56",
+                "ip_address": "255.255.255.255",
+                "port_number": "9",
+                "csrf_token": csrf_token,
+            }
+            responses = [await client.post("/wake", data=data) for _ in range(20)]
+            assert [r.status_code for r in responses] == [200] * 20
+            assert sends == 1
+            assert all(r.json()["coalesced"] for r in responses[1:])
+
+            monkeypatch.setattr(ui.wake_limiter, "window", 0)
+            statuses = [
+                (await client.post("/wake", data=data)).status_code for _ in range(10)
+            ]
+            assert 429 in statuses
+            limited = await client.post("/wake", data=data)
+            assert limited.status_code == 429
+            assert int(limited.headers["Retry-After"]) >= 1
+            assert sends == ui.wake_limiter.mac_burst
+
+    asyncio.run(_run())
+
+
 def test_no_auth_allows_direct_access(tmp_path, monkeypatch):
     import wol_service.user_management as um
 
@@ -107,7 +213,7 @@ def test_no_auth_allows_direct_access(tmp_path, monkeypatch):
     app_mod = importlib.reload(app)
     ui_mod = importlib.reload(ui)
 
-    monkeypatch.setattr(ui_mod, "wake_on_lan", lambda *args, **kwargs: True)
+    monkeypatch.setattr(ui_mod.wake_engine, "send", _fake_send)
 
     async def _run():
         transport = httpx.ASGITransport(app=app_mod.app)
@@ -151,3 +257,23 @@ def test_warn_if_data_not_mounted(monkeypatch, caplog):
     caplog.set_level("WARNING")
     app_mod._warn_if_ephemeral_storage()
     assert any("not a mounted volume" in rec.message for rec in caplog.records)
+
+
+def test_auth_stack_is_not_imported_when_auth_is_disabled(tmp_path):
+    code = (
+        "import sys, wol_service.app\n"
+        "wol_service.ui.load_auth()\n"
+        "print(sorted(m for m in ('jose', 'passlib') if m in sys.modules))"
+    )
+    env = {
+        **os.environ,
+        "ADMIN_USERNAME": "",
+        "ADMIN_PASSWORD": "",
+        "USERS_PATH": str(tmp_path / "users.json"),
+        "PYTHONPATH": os.pathsep.join(sys.path),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == "[]"
@@ -70,3 +70,23 @@ def test_secret_mismatch_warns(monkeypatch, tmp_path, capsys):
     um.load_users()
     captured = capsys.readouterr()
     assert "SECRET_KEY differs" in captured.out
+
+
+def test_existing_admin_is_not_rehashed_or_rewritten(monkeypatch, tmp_path):
+    users_path = tmp_path / "users.json"
+    monkeypatch.setenv("USERS_PATH", str(users_path))
+    monkeypatch.setenv("ADMIN_USERNAME", "admin")
+    monkeypatch.setenv("ADMIN_PASSWORD", "password")
+    importlib.reload(um)
+    um.save_users({"admin": {"username": "admin", "hashed_password": "hash"}})
+    before = users_path.stat().st_mtime_ns
+
+    def unexpected(*args):
+        raise AssertionError("the admin already exists")
+
+    monkeypatch.setattr(um, "get_password_hash", unexpected)
+    monkeypatch.setattr(um, "save_users", unexpected)
+    users = um.load_users()
+    assert users["admin"]["hashed_password"] == "hash"
+    assert users_path.stat().st_mtime_ns == before
+    assert os.environ.get("ADMIN_PASSWORD") is None
@@ -1,4 +1,21 @@
-from wol_service.wol import wake_on_lan, create_magic_packet
+import asyncio
+import time
+
+import pytest
+
+from wol_service import wol
+from wol_service.models import Host
+from wol_service.wol import (
+    PACKET_SIZE,
+    SendPolicy,
+    WakeEngine,
+    build_magic_packets,
+    create_magic_packet,
+    macs_to_bytes,
+    prepare_host,
+    prepare_hosts,
+    wake_on_lan,
+)
 
 
 def test_wake_on_lan_functionality():
@@ -17,3 +34,175 @@ def test_create_magic_packet():
     packet = create_magic_packet(mac_address)
     assert isinstance(packet, bytes)
     assert answer == packet
+
+
+def test_wake_engine_reuses_one_socket():
+    async def _run():
+        loop = asyncio.get_running_loop()
+        received: asyncio.Queue = asyncio.Queue()
+
+        class Listener(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                received.put_nowait((data, addr))
+
+        listener, _ = await loop.create_datagram_endpoint(
+            Listener, local_addr=("127.0.0.1", 0)
+        )
+        port = listener.get_extra_info("sockname")[1]
+        engine = WakeEngine()
+        try:
+            await engine.start()
+            transport = engine._transport
+            assert await engine.send("00:11:22:33:44:55", "127.0.0.1", port)
+            assert await engine.send("66-77-88-99-AA-BB", "127.0.0.1", port)
+            assert engine._transport is transport
+            first, addr_1 = await asyncio.wait_for(received.get(), 1)
+            second, addr_2 = await asyncio.wait_for(received.get(), 1)
+            assert first == create_magic_packet("00:11:22:33:44:55")
+            assert second == create_magic_packet("66-77-88-99-AA-BB")
+            assert addr_1 == addr_2
+        finally:
+            engine.close()
+            listener.close()
+
+    asyncio.run(_run())
+
+
+def test_wake_engine_validates_like_wake_on_lan():
+    async def _run():
+        engine = WakeEngine()
+        with pytest.raises(ValueError, match="MAC"):
+            await engine.send("nope", "127.0.0.1", 9)
+        with pytest.raises(ValueError, match="port"):
+            await engine.send("00:11:22:33:44:55", "127.0.0.1", 0)
+        assert engine._transport is None
+
+    asyncio.run(_run())
+
+
+def test_prepare_host_precomputes_packet():
+    host = Host(name="pc", mac="00-11-22-33-44-55", ip="10.0.0.255", port=7)
+    prepared = prepare_host(host)
+    assert prepared.mac == bytes.fromhex("001122334455")
+    assert prepared.packet == create_magic_packet("00:11:22:33:44:55")
+    assert len(prepared.packet) == 102
+    assert prepared.address == ("10.0.0.255", 7)
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_build_magic_packets_matches_single_builder(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(wol, "np", None)
+    elif wol.np is None:
+        pytest.skip("NumPy is not installed")
+    macs = [
+        "00:11:22:33:44:55",
+        "66-77-88-99-AA-BB",
+        " ffeeddccbbaa",
+        "0a:0b:0c:0d:0e:0f",
+    ]
+    buffer = build_magic_packets(macs_to_bytes(macs))
+    assert len(buffer) == PACKET_SIZE * len(macs)
+    for i, mac in enumerate(macs):
+        packet = buffer[PACKET_SIZE * i : PACKET_SIZE * (i + 1)]
+        assert packet == create_magic_packet(mac.strip())
+    assert len(build_magic_packets(b"")) == 0
+    with pytest.raises(ValueError):
+        build_magic_packets(b"\x00" * 7)
+
+
+def test_prepare_hosts_shares_one_buffer():
+    hosts = [
+        Host(name="a", mac="00-11-22-33-44-55", ip="10.0.0.255", port=7),
+        Host(name="b", mac="66:77:88:99:aa:bb", ip="10.0.0.2", port=9),
+    ]
+    prepared = prepare_hosts(hosts)
+    assert prepared == [prepare_host(h) for h in hosts]
+    assert isinstance(prepared[0].packet, memoryview)
+    assert prepared[0].packet.obj is prepared[1].packet.obj
+    with pytest.raises(ValueError):
+        prepare_hosts(hosts + [Host(name="c", mac="00:11", ip="10.0.0.3", port=9)])
+    # Lengths that add up to whole MACs must not shift the hosts after them
+    with pytest.raises(ValueError):
+        macs_to_bytes(["00:11:22:33:44", "55:66:77:88:99:aa:bb", "00:11:22:33:44:55"])
+
+
+class _RecordingTransport:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((time.monotonic(), data, addr))
+
+    def is_closing(self):
+        return False
+
+    def close(self):
+        pass
+
+
+def _engine_with(transport: _RecordingTransport) -> WakeEngine:
+    engine = WakeEngine()
+    engine._loop = asyncio.get_running_loop()
+    engine._transport = transport  # type: ignore[assignment]
+    return engine
+
+
+def test_burst_repeats_are_timer_driven():
+    async def _run():
+        transport = _RecordingTransport()
+        engine = _engine_with(transport)
+        packets = [
+            (
+                create_magic_packet(f"00:00:00:00:{i // 256:02x}:{i % 256:02x}"),
+                ("10.0.0.255", 9),
+            )
+            for i in range(200)
+        ]
+        start = time.monotonic()
+        await engine.send_packets(packets, SendPolicy(repeat=5, interval=0.1))
+        elapsed = time.monotonic() - start
+        assert len(transport.sent) == 1000
+        # Five rounds 100 ms apart: roughly 0.4 s in total, not 200 x 0.4 s
+        assert 0.35 <= elapsed < 1.0
+        rounds = [transport.sent[i * 200][0] - start for i in range(5)]
+        assert rounds[0] < 0.05
+        assert all(b - a >= 0.09 for a, b in zip(rounds, rounds[1:]))
+
+    asyncio.run(_run())
+
+
+def test_burst_fans_out_to_extra_broadcasts():
+    async def _run():
+        transport = _RecordingTransport()
+        engine = _engine_with(transport)
+        packet = create_magic_packet("00:11:22:33:44:55")
+        policy = SendPolicy(
+            broadcasts=("10.1.255.255", "10.0.0.255", "255.255.255.255")
+        )
+        await engine.send_packet(packet, ("10.0.0.255", 7), policy)
+        assert [addr for _, _, addr in transport.sent] == [
+            ("10.0.0.255", 7),
+            ("10.1.255.255", 7),
+            ("255.255.255.255", 7),
+        ]
+
+    asyncio.run(_run())
+
+
+def test_cancelled_burst_stops_sending():
+    async def _run():
+        transport = _RecordingTransport()
+        engine = _engine_with(transport)
+        packet = create_magic_packet("00:11:22:33:44:55")
+        task = asyncio.create_task(
+            engine.send_packet(packet, ("10.0.0.255", 9), SendPolicy(3, 0.2))
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.3)
+        assert len(transport.sent) == 1
+
+    asyncio.run(_run())